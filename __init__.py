@@ -8,17 +8,62 @@ bl_info = {
     "category": "Import-Export",
 }
 
+# Modules imported by iqm_export_pipeline.export_iqm_collection, in the order they depend on each other.
+EXPORT_STAGE_MODULES: tuple[str, ...] = (
+    "iqm_format",
+    "iqm_transform",
+    "animation_compression",
+    "vertex_welding",
+    "vertex_cache",
+    "compact_format",
+    "iqm_diff",
+    "pose_sampler",
+)
+
 # Import / reload local modules (Required when using the "Reload Scripts" (bpy.ops.scripts.reload()) operator in Blender
 if "bpy" in locals():
     import importlib
 
+    importlib.reload(output_staging)
+    importlib.reload(pk3_packaging)
+    importlib.reload(live_link)
+    importlib.reload(profiling)
+    importlib.reload(lod_export)
+    importlib.reload(validation_cache)
+    importlib.reload(action_index)
+    importlib.reload(session_cache)
+    importlib.reload(export_cache)
+    importlib.reload(export_validation)
+
+    # The export stages are imported on the first export instead of when the add-on is registered, since they use
+    # NumPy. Only the ones that were imported are reloaded.
+    for module_name in EXPORT_STAGE_MODULES:
+        if module_name in locals():
+            importlib.reload(locals()[module_name])
+
     importlib.reload(iqm_export_pipeline)
     importlib.reload(action_items_ui_list)
     importlib.reload(pipeline_presets)
+    importlib.reload(batch_export)
+    importlib.reload(background_export)
+    importlib.reload(watch_mode)
 else:
+    from . import output_staging
+    from . import pk3_packaging
+    from . import live_link
+    from . import profiling
+    from . import lod_export
+    from . import validation_cache
+    from . import action_index
+    from . import session_cache
+    from . import export_cache
+    from . import export_validation
     from . import iqm_export_pipeline
     from . import action_items_ui_list
     from . import pipeline_presets
+    from . import batch_export
+    from . import background_export
+    from . import watch_mode
 
 import bpy
 
@@ -27,9 +72,15 @@ def register():
     iqm_export_pipeline.register()
     action_items_ui_list.register()
     pipeline_presets.register()
+    batch_export.register()
+    background_export.register()
+    watch_mode.register()
 
 
 def unregister():
+    watch_mode.unregister()
+    background_export.unregister()
+    batch_export.unregister()
     iqm_export_pipeline.unregister()
     action_items_ui_list.unregister()
     pipeline_presets.unregister()
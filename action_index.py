@@ -0,0 +1,138 @@
+import re
+import bpy
+from bpy.app.handlers import persistent
+
+# Matches the bone name of an fcurve data path such as 'pose.bones["Upper Arm.L"].rotation_quaternion'.
+BONE_DATA_PATH_PATTERN = re.compile(r'pose\.bones\["((?:[^"\\]|\\.)*)"\]')
+
+# The bone names targeted by each action, keyed by action.name_full. Built lazily, then kept up to date incrementally.
+_bones_by_action: dict[str, frozenset[str]] = {}
+
+# The actions targeting each bone name, the inverse of _bones_by_action.
+_actions_by_bone: dict[str, set[str]] = {}
+
+# Actions edited since they were last indexed.
+_dirty_actions: set[str] = set()
+
+
+def iter_action_fcurves(action):
+    """Iterate the fcurves of action, including the layered actions of Blender 4.4 and later."""
+
+    layers = getattr(action, "layers", None)
+    if not layers:
+        yield from action.fcurves
+        return
+
+    for layer in layers:
+        for strip in layer.strips:
+            for channelbag in getattr(strip, "channelbags", ()):
+                yield from channelbag.fcurves
+
+
+def get_action_bone_names(action) -> frozenset[str]:
+    """The names of the bones targeted by the fcurves of action."""
+
+    bone_names = set()
+    for fcurve in iter_action_fcurves(action):
+        match = BONE_DATA_PATH_PATTERN.match(fcurve.data_path)
+        if match:
+            bone_names.add(bpy.utils.unescape_identifier(match.group(1)))
+
+    return frozenset(bone_names)
+
+
+def _remove_from_index(action_name: str):
+    for bone_name in _bones_by_action.pop(action_name, ()):
+        actions = _actions_by_bone.get(bone_name)
+        if actions is not None:
+            actions.discard(action_name)
+            if not actions:
+                del _actions_by_bone[bone_name]
+
+
+def _add_to_index(action):
+    bone_names = get_action_bone_names(action)
+    _bones_by_action[action.name_full] = bone_names
+    for bone_name in bone_names:
+        _actions_by_bone.setdefault(bone_name, set()).add(action.name_full)
+
+
+def refresh() -> dict:
+    """Bring the index up to date: index new and edited actions, and forget removed or renamed ones.
+    Only the edited actions have their fcurves read again. Returns every action keyed by name_full.
+    """
+
+    actions = {action.name_full: action for action in bpy.data.actions}
+
+    for action_name in _bones_by_action.keys() - actions.keys():
+        _remove_from_index(action_name)
+
+    for action_name, action in actions.items():
+        if action_name in _dirty_actions or action_name not in _bones_by_action:
+            _remove_from_index(action_name)
+            _add_to_index(action)
+
+    _dirty_actions.clear()
+    return actions
+
+
+def find_compatible_actions(armature) -> list:
+    """Find the actions that only animate bones of armature (an armature object), sorted by name.
+    Actions that don't animate any bones are left out.
+    """
+
+    actions = refresh()
+    armature_bone_names = set(armature.data.bones.keys())
+
+    # Count how many of each action's bones exist in the armature, only visiting the actions that target its bones.
+    matching_bone_counts: dict[str, int] = {}
+    for bone_name in armature_bone_names:
+        for action_name in _actions_by_bone.get(bone_name, ()):
+            matching_bone_counts[action_name] = matching_bone_counts.get(action_name, 0) + 1
+
+    compatible_names = sorted(
+        action_name
+        for action_name, matching_bone_count in matching_bone_counts.items()
+        if matching_bone_count == len(_bones_by_action[action_name])
+    )
+    return [actions[action_name] for action_name in compatible_names]
+
+
+@persistent
+def _depsgraph_update_post(scene, depsgraph):
+    if not depsgraph.id_type_updated("ACTION"):
+        return
+
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Action):
+            _dirty_actions.add(update.id.original.name_full)
+
+
+@persistent
+def _clear(*args):
+    """Forget the whole index, e.g. after loading a file. It's rebuilt the next time it's used."""
+
+    _bones_by_action.clear()
+    _actions_by_bone.clear()
+    _dirty_actions.clear()
+
+
+handlers = [
+    (bpy.app.handlers.depsgraph_update_post, _depsgraph_update_post),
+    (bpy.app.handlers.load_post, _clear),
+    (bpy.app.handlers.undo_post, _clear),
+    (bpy.app.handlers.redo_post, _clear),
+]
+
+
+def register():
+    for handler_list, handler in handlers:
+        handler_list.append(handler)
+
+
+def unregister():
+    for handler_list, handler in handlers:
+        if handler in handler_list:
+            handler_list.remove(handler)
+
+    _clear()
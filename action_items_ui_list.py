@@ -1,11 +1,74 @@
 # Custom UI List : https://blender.stackexchange.com/questions/248440/is-it-possible-to-use-custom-class-for-uilist
 
+from dataclasses import dataclass
+import fnmatch
+from functools import lru_cache
+import re
+from typing import Optional
 import bpy
 from bpy.types import Action, Collection, Operator, PropertyGroup, UIList
-from bpy.props import BoolProperty, CollectionProperty, FloatProperty, IntProperty, PointerProperty
+from bpy.props import BoolProperty, CollectionProperty, EnumProperty, FloatProperty, IntProperty, PointerProperty
+from . import action_index
+from . import validation_cache
 
 SPLIT_FACTOR: float = 0.4
 
+# The orders the action list can be sorted in, as (identifier, name, description) items.
+SORT_ORDERS: list[tuple[str, str, str]] = [
+    ("INDEX", "List Order", "Keep the order of the list, which is the order actions are exported in"),
+    ("NAME", "Name", "Sort by action name"),
+    ("FRAMES", "Frame Count", "Sort by the number of frames between the start and end frame"),
+    ("FPS", "FPS", "Sort by frames per second"),
+]
+
+
+@dataclass
+class AnimationSpec:
+    """A single entry of an animation list, see ACTIONITEMS_ActionItemProp.__str__ for the format.
+    Parameters that were left empty are None, and fall back to the exporter's defaults.
+    """
+
+    name: str
+    frame_start: Optional[int] = None
+    frame_end: Optional[int] = None
+    fps: Optional[float] = None
+    looping: bool = False
+
+    def __str__(self) -> str:
+        params = (self.frame_start, self.frame_end, self.fps)
+        return ":".join([self.name, *("" if param is None else str(param) for param in params), "1" if self.looping else "0"])
+
+
+def parse_animation_specs(animspecs: str) -> list[AnimationSpec]:
+    """Parse a comma (",") separated animation list into AnimationSpecs. Raises ValueError when a frame, fps or looping
+    parameter isn't a number.
+    """
+
+    specs: list[AnimationSpec] = []
+
+    for animspec in animspecs.split(","):
+        params = [param.strip() for param in animspec.split(":")]
+        if not params[0]:
+            continue
+
+        # Pad the parameters so that omitted trailing parameters read as empty.
+        params += [""] * (5 - len(params))
+
+        try:
+            specs.append(
+                AnimationSpec(
+                    name=params[0],
+                    frame_start=int(params[1]) if params[1] else None,
+                    frame_end=int(params[2]) if params[2] else None,
+                    fps=float(params[3]) if params[3] else None,
+                    looping=params[4] == "1",
+                )
+            )
+        except ValueError:
+            raise ValueError(f"Can't read the animation '{animspec.strip()}', expected name:start:end:fps:looping") from None
+
+    return specs
+
 
 def set_action_item_props(action_item, context):
 
@@ -49,18 +112,135 @@ class ACTIONITEMS_ActionItemProp(PropertyGroup):
         return f"{name}:{start}:{end}:{fps}:{looping}"
 
 
+@lru_cache(maxsize=32)
+def compile_name_filter(pattern: str, use_regex: bool) -> Optional[re.Pattern]:
+    """The case-insensitive regular expression that matches the action names shown for pattern, or None if pattern
+    isn't a valid regular expression. Without use_regex, pattern uses wildcards (* and ?) and matches anywhere in the
+    name, like the other lists of Blender.
+    """
+
+    if not use_regex:
+        pattern = fnmatch.translate(f"*{pattern}*")
+
+    try:
+        return re.compile(pattern, re.IGNORECASE)
+    except re.error:
+        return None
+
+
+def filter_action_items(names: list[str], frame_counts: list[int], fps: list[float], name_filter: Optional[re.Pattern], sort_by: str, reverse: bool) -> tuple[list[bool], list[int]]:
+    """Whether each action item is shown, and the position of each item in the sorted list (empty to keep the list
+    order). Items are given as parallel lists of their action names, frame counts and fps.
+    """
+
+    if name_filter is None:
+        shown = [True] * len(names)
+    else:
+        search = name_filter.search
+        shown = [search(name) is not None for name in names]
+
+    if sort_by == "INDEX" and not reverse:
+        return shown, []
+
+    sort_keys = {"INDEX": None, "NAME": [name.casefold() for name in names], "FRAMES": frame_counts, "FPS": fps}[sort_by]
+    indexes = list(range(len(names)))
+    if sort_keys is not None:
+        # Sorting is stable, so items that sort equal stay in list order.
+        indexes.sort(key=sort_keys.__getitem__)
+    if reverse:
+        indexes.reverse()
+
+    new_order = [0] * len(names)
+    for position, index in enumerate(indexes):
+        new_order[index] = position
+
+    return shown, new_order
+
+
+# The filtered and sorted order of each drawn list. Drawing asks for it on every redraw, so it's only computed again
+# when the list or its filter options change, or validation_cache is invalidated (which any edit to the action items
+# does).
+_order_cache: dict[tuple, tuple[list[int], list[int]]] = {}
+MAX_CACHED_ORDERS: int = 64
+_order_cache_generation: int = -1
+
+
 class ACTIONITEMS_UL_ActionItemList(UIList):
     """UIList containing ActionItems"""
 
     bl_idname = "UI_UL_ActionItemList"
     layout_type = "DEFAULT"
 
+    use_filter_regex: BoolProperty(
+        name="Regular Expression",
+        description="Match action names with a regular expression instead of wildcards",
+        default=False,
+    )
+    sort_by: EnumProperty(name="Sort By", description="Order the list is shown in", items=SORT_ORDERS, default="INDEX")
+    use_sort_reverse: BoolProperty(name="Reverse", description="Reverse the sort order", default=False)
+
+    def draw_filter(self, context, layout):
+        row = layout.row(align=True)
+        # Highlight regular expressions that don't compile, which show every item.
+        row.alert = bool(self.filter_name) and compile_name_filter(self.filter_name, self.use_filter_regex) is None
+        row.prop(self, "filter_name", text="")
+        row.prop(self, "use_filter_regex", text="", icon="SORTBYEXT")
+
+        row = layout.row(align=True)
+        row.prop(self, "sort_by", text="")
+        row.prop(self, "use_sort_reverse", text="", icon="SORT_DESC" if self.use_sort_reverse else "SORT_ASC")
+
+    def filter_items(self, context, data, propname):
+        global _order_cache_generation
+
+        action_items = getattr(data, propname)
+        generation = validation_cache.get_generation()
+        if generation != _order_cache_generation:
+            _order_cache.clear()
+            _order_cache_generation = generation
+
+        key = (
+            data.as_pointer(),
+            propname,
+            len(action_items),
+            self.filter_name,
+            self.use_filter_regex,
+            self.sort_by,
+            self.use_sort_reverse,
+        )
+        cached = _order_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Typing a filter adds an entry per keystroke, so don't let them pile up between edits.
+        if len(_order_cache) >= MAX_CACHED_ORDERS:
+            _order_cache.clear()
+
+        name_filter = compile_name_filter(self.filter_name, self.use_filter_regex) if self.filter_name else None
+        names = [action_item.action.name if action_item.action else "" for action_item in action_items]
+
+        # Read the numeric properties of every item at once, instead of one item at a time.
+        item_count = len(action_items)
+        frame_starts, frame_ends, fps = [0] * item_count, [0] * item_count, [0.0] * item_count
+        action_items.foreach_get("frame_start", frame_starts)
+        action_items.foreach_get("frame_end", frame_ends)
+        action_items.foreach_get("fps", fps)
+        frame_counts = [end - start + 1 for start, end in zip(frame_starts, frame_ends)]
+
+        shown, new_order = filter_action_items(names, frame_counts, fps, name_filter, self.sort_by, self.use_sort_reverse)
+        flags = [self.bitflag_filter_item if is_shown else 0 for is_shown in shown]
+
+        cached = _order_cache[key] = (flags, new_order)
+        return cached
+
     def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index, flt_flag):
         if self.layout_type in {"DEFAULT", "COMPACT"}:
             row = layout.row()
             action_prop_split = row.split(factor=SPLIT_FACTOR)
 
             action_side = action_prop_split.row()
+            # Highlight items that would stop the collection from being exported.
+            action_side.alert = item.action is None
             action_side.label(icon="ARMATURE_DATA")
             action_side.prop(data=item, property="action", text="")
 
@@ -91,6 +271,40 @@ class ACTIONITEMS_OT_List_Add(Operator):
         settings = context.scene.iqm_export_pipeline_settings
         export_collection = settings.export_collection
         export_collection.action_items.add()
+        validation_cache.invalidate()
+        return {"FINISHED"}
+
+
+class ACTIONITEMS_OT_List_Populate(Operator):
+    """Add every action that animates the export collection's armature to the ActionItemList"""
+
+    bl_idname = "action_items.list_populate"
+    bl_label = "Populate from Armature"
+    bl_description = "Add every action that only animates bones of the collection's armature, and isn't in the list yet."
+
+    @classmethod
+    def poll(cls, context):
+        settings = context.scene.iqm_export_pipeline_settings
+        return settings.export_collection
+
+    def execute(self, context):
+        settings = context.scene.iqm_export_pipeline_settings
+        export_collection = settings.export_collection
+
+        armature = next((obj for obj in export_collection.all_objects if obj.type == "ARMATURE"), None)
+        if armature is None:
+            self.report({"WARNING"}, f"The collection '{export_collection.name}' has no armature")
+            return {"CANCELLED"}
+
+        listed_actions = {action_item.action for action_item in export_collection.action_items if action_item.action}
+        new_actions = [action for action in action_index.find_compatible_actions(armature) if action not in listed_actions]
+
+        for action in new_actions:
+            # Assigning the action fills in its frame range and fps, see set_action_item_props.
+            export_collection.action_items.add().action = action
+
+        validation_cache.invalidate()
+        self.report({"INFO"}, f"Added {len(new_actions)} actions that animate '{armature.name}'")
         return {"FINISHED"}
 
 
@@ -103,10 +317,9 @@ class ACTIONITEMS_OT_List_Remove(Operator):
 
     @classmethod
     def poll(cls, context):
-        settings = context.scene.iqm_export_pipeline_settings
-        export_collection = settings.export_collection
         # Check if an armature source has been selected, and if it has at least one action_item in the action_items list.
-        return export_collection and hasattr(export_collection, "action_items") and export_collection.action_items
+        settings = context.scene.iqm_export_pipeline_settings
+        return validation_cache.get_validation(settings).action_item_count > 0
 
     def execute(self, context):
         settings = context.scene.iqm_export_pipeline_settings
@@ -114,28 +327,58 @@ class ACTIONITEMS_OT_List_Remove(Operator):
         index = export_collection.active_action_item_index
         export_collection.action_items.remove(index)
         export_collection.active_action_item_index = min(max(0, index - 1), len(export_collection.action_items) - 1)
+        validation_cache.invalidate()
         return {"FINISHED"}
 
 
-classes = [
+# Classes that store data. These are registered on their own by the headless command-line build (see cli.py).
+property_classes = [
     ACTIONITEMS_ActionItemProp,
+]
+
+classes = [
     ACTIONITEMS_UL_ActionItemList,
     ACTIONITEMS_OT_List_Add,
     ACTIONITEMS_OT_List_Remove,
+    ACTIONITEMS_OT_List_Populate,
 ]
 
 
-def register():
-    for class_to_register in classes:
+def register_properties():
+    for class_to_register in property_classes:
         bpy.utils.register_class(class_to_register)
 
     Collection.active_action_item_index = IntProperty(name="Index for action_items", default=0)
     Collection.action_items = CollectionProperty(type=ACTIONITEMS_ActionItemProp)
 
 
-def unregister():
-    for class_to_unregister in classes:
+def unregister_properties():
+    for class_to_unregister in property_classes:
         bpy.utils.unregister_class(class_to_unregister)
 
     del Collection.active_action_item_index
     del Collection.action_items
+
+
+def register():
+    register_properties()
+
+    for class_to_register in classes:
+        bpy.utils.register_class(class_to_register)
+
+    # Assigning or clearing an item's action changes whether its collection can be exported. It and the other
+    # properties also change the order of a sorted action list.
+    validation_cache.subscribe_rna((ACTIONITEMS_ActionItemProp, "action"))
+    for property_name in ("frame_start", "frame_end", "fps"):
+        validation_cache.subscribe_rna((ACTIONITEMS_ActionItemProp, property_name))
+    action_index.register()
+
+
+def unregister():
+    action_index.unregister()
+    _order_cache.clear()
+
+    for class_to_unregister in classes:
+        bpy.utils.unregister_class(class_to_unregister)
+
+    unregister_properties()
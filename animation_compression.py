@@ -0,0 +1,134 @@
+# Animation compression stage that shrinks the frame data of an exported IQM file.
+#
+# IQM stores every frame of every animation, so keys can't be dropped individually. Instead:
+# - Channels that stay within tolerance of a constant for the whole file are stored once as a constant, which removes
+#   their column from every frame.
+# - Animations that can be rebuilt from every Nth frame within tolerance keep only those frames, and have their
+#   framerate divided by N, so they play back at the same speed.
+# The remaining channels are re-quantized to 16 bits over their new range.
+#
+# This module doesn't depend on bpy, so it can also be used by tools that run outside of Blender.
+
+from dataclasses import dataclass
+
+import numpy as np
+
+if __package__:
+    from .iqm_format import IQM_LOOP, IQMModel, decode_frames, encode_frames
+else:
+    from iqm_format import IQM_LOOP, IQMModel, decode_frames, encode_frames
+
+# Frame data is stored as 16-bit values.
+BYTES_PER_CHANNEL: int = 2
+
+# The largest number of frames merged into one.
+MAX_FRAME_STEP: int = 8
+
+
+@dataclass
+class AnimationSavings:
+    name: str
+    frames_before: int
+    frames_after: int
+    bytes_before: int
+    bytes_after: int
+
+    def __str__(self) -> str:
+        saved = 1.0 - self.bytes_after / self.bytes_before if self.bytes_before else 0.0
+        return f"{self.name}: {self.frames_before} -> {self.frames_after} frames, {self.bytes_before:,} -> {self.bytes_after:,} bytes ({saved:.0%} smaller)"
+
+
+def channel_tolerances(translation: float, rotation: float, scale: float) -> np.ndarray:
+    """Per-channel tolerances of a pose: translation in exported units, rotation in quaternion components, and scale."""
+
+    return np.array([translation] * 3 + [rotation] * 4 + [scale] * 3)
+
+
+def _snap_constant_channels(values: np.ndarray, tolerances: np.ndarray):
+    """Replace the channels of values (frames, poses, POSE_CHANNELS) that stay within tolerance of their midpoint by
+    that midpoint, so they're stored as constants.
+    """
+
+    minimums = values.min(axis=0)
+    maximums = values.max(axis=0)
+    midpoints = (minimums + maximums) / 2.0
+    constant = (maximums - minimums) / 2.0 <= tolerances
+
+    values[:] = np.where(constant, midpoints, values)
+
+
+def _reconstruct(kept_values: np.ndarray, step: int, frame_count: int, looping: bool) -> np.ndarray:
+    """Linearly interpolate frame_count frames from every step-th frame, as an engine would when playing them back.
+    Looping animations interpolate from the last kept frame back to the first, others hold the last kept frame.
+    """
+
+    positions = np.arange(frame_count) / step
+    lower = np.floor(positions).astype(int)
+    upper = lower + 1
+    upper = upper % len(kept_values) if looping else np.minimum(upper, len(kept_values) - 1)
+    weights = (positions - lower)[:, np.newaxis, np.newaxis]
+
+    return kept_values[lower] * (1.0 - weights) + kept_values[upper] * weights
+
+
+def find_frame_step(values: np.ndarray, looping: bool, tolerances: np.ndarray, max_step: int = MAX_FRAME_STEP) -> int:
+    """The largest step such that every step-th frame of values (frames, poses, POSE_CHANNELS) rebuilds all frames
+    within tolerance. The step has to divide the frame count of looping animations, so they keep their duration, and
+    the frame count - 1 of other animations, so they keep their last frame.
+    """
+
+    frame_count = len(values)
+    interval_count = frame_count if looping else frame_count - 1
+
+    for step in range(min(max_step, interval_count), 1, -1):
+        if interval_count % step:
+            continue
+
+        reconstructed = _reconstruct(values[::step], step, frame_count, looping)
+        if np.all(np.abs(reconstructed - values) <= tolerances):
+            return step
+
+    return 1
+
+
+def compress_animations(model: IQMModel, tolerances: np.ndarray, max_step: int = MAX_FRAME_STEP) -> list[AnimationSavings]:
+    """Compress the animations of model in place, and return the savings of each animation."""
+
+    if not len(model.frames) or not len(model.anims):
+        return []
+
+    values = decode_frames(model)
+    channels_before = model.frames.shape[1]
+    _snap_constant_channels(values, tolerances)
+
+    kept_frames: list[np.ndarray] = []
+    frame_counts: list[int] = []
+    first_frame = 0
+
+    for anim in model.anims:
+        anim_frames = np.arange(anim["first_frame"], anim["first_frame"] + anim["num_frames"])
+        step = find_frame_step(values[anim_frames], bool(anim["flags"] & IQM_LOOP), tolerances, max_step)
+
+        kept_frames.append(anim_frames[::step])
+        frame_counts.append(len(anim_frames))
+        anim["first_frame"] = first_frame
+        anim["num_frames"] = len(kept_frames[-1])
+        anim["framerate"] = anim["framerate"] / step
+        first_frame += anim["num_frames"]
+
+    kept = np.concatenate(kept_frames)
+    encode_frames(model, values[kept])
+    if model.bounds is not None and len(model.bounds):
+        model.bounds = model.bounds[kept]
+
+    channels_after = model.frames.shape[1]
+    return [
+        AnimationSavings(
+            name=model.get_string(int(anim["name"])),
+            frames_before=frame_count,
+            frames_after=len(anim_kept),
+            bytes_before=frame_count * channels_before * BYTES_PER_CHANNEL,
+            bytes_after=len(anim_kept) * channels_after * BYTES_PER_CHANNEL,
+        )
+        for anim, anim_kept, frame_count in zip(model.anims, kept_frames, frame_counts)
+    ]
@@ -0,0 +1,158 @@
+import os
+import tempfile
+import bpy
+from bpy.types import Operator
+from . import output_staging
+from . import validation_cache
+from .action_items_ui_list import parse_animation_specs
+from .batch_export import WorkerProcess, resolve_worker_count, save_snapshot, skip_up_to_date_jobs
+from .iqm_export_pipeline import ExportJob, build_export_jobs, find_limit_problems, finish_export, report_limit_problems
+
+# How often the modal operator checks on its workers, in seconds.
+POLL_INTERVAL: float = 0.1
+
+
+class IQM_EXPORT_PIPELINE_OT_BackgroundExport(Operator):
+    """Export in background Blender processes so you can keep working. Press Esc to cancel"""
+
+    bl_idname = "export.iqm_pipeline_background"
+    bl_label = "Export IQM in the background"
+
+    @classmethod
+    def poll(cls, context):
+        # Ensure the scene contains an instance of the iqm_export_pipeline_settings PropertyGroup.
+        if not hasattr(context.scene, "iqm_export_pipeline_settings"):
+            return False
+
+        settings = context.scene.iqm_export_pipeline_settings
+        return validation_cache.get_validation(settings).exportable
+
+    def execute(self, context):
+        # Without an event loop to poll the workers (e.g. when called from a script), export synchronously instead.
+        return bpy.ops.export.iqm_pipeline()
+
+    def invoke(self, context, event):
+        settings = context.scene.iqm_export_pipeline_settings
+
+        self.jobs = build_export_jobs(settings, settings.export_collection)
+
+        # Fail before starting any workers if the collection is over the engine limits.
+        problems = find_limit_problems(settings, settings.export_collection, self.jobs)
+        if problems:
+            return report_limit_problems(self, settings.export_collection, problems)
+
+        self.results, self.pending_jobs = skip_up_to_date_jobs(self.jobs)
+        if not self.pending_jobs:
+            return finish_export(self, settings, self.jobs, self.results)
+
+        # Workers read a snapshot of the file, so edits made while exporting don't end up in the exported files.
+        self.snapshot_directory = tempfile.TemporaryDirectory(prefix="iqm_export_pipeline_")
+        self.snapshot_filepath = save_snapshot(self.snapshot_directory.name)
+
+        self.worker_count = resolve_worker_count(settings.batch_worker_count, len(self.pending_jobs))
+        self.workers: dict[WorkerProcess, str] = {}  # The latest progress message of each running worker.
+        self.sampled_actions: dict[str, int] = {}  # The number of animations sampled so far, per output file.
+        self.start_workers()
+
+        window_manager = context.window_manager
+        self.timer = window_manager.event_timer_add(POLL_INTERVAL, window=context.window)
+        window_manager.modal_handler_add(self)
+        window_manager.progress_begin(0, len(self.jobs))
+        self.update_status(context)
+
+        return {"RUNNING_MODAL"}
+
+    def start_workers(self):
+        """Start a worker for each pending job, one job per worker, until worker_count workers are running."""
+
+        while self.pending_jobs and len(self.workers) < self.worker_count:
+            job = self.pending_jobs.pop(0)
+            self.workers[WorkerProcess(self.snapshot_filepath, [job])] = f"{os.path.basename(job.filepath)}: starting"
+
+    def describe_progress(self, job: ExportJob, progress: dict) -> str:
+        file_name = os.path.basename(job.filepath)
+
+        if progress["stage"] != "sample animation":
+            return f"{file_name}: {progress['stage']}"
+
+        action_count = len(parse_animation_specs(job.animspecs))
+        sampled_count = self.sampled_actions.get(job.filepath, 0) + 1
+        self.sampled_actions[job.filepath] = sampled_count
+        return f"{file_name}: sampling {progress['action']} ({sampled_count}/{action_count})"
+
+    def update_status(self, context):
+        finished_count = len(self.results)
+        context.window_manager.progress_update(finished_count)
+        context.workspace.status_text_set(
+            f"Exporting IQM {finished_count}/{len(self.jobs)} files | " + " | ".join(self.workers.values()) + " | Esc to cancel"
+        )
+
+    def modal(self, context, event):
+        if event.type == "ESC" and event.value == "PRESS":
+            self.cancel(context)
+            self.report({"WARNING"}, "Export cancelled, files that weren't finished were left unchanged")
+            return {"CANCELLED"}
+
+        if event.type != "TIMER":
+            # Let every other event through, so Blender stays usable while exporting.
+            return {"PASS_THROUGH"}
+
+        for worker in list(self.workers):
+            for progress in worker.poll_progress():
+                self.workers[worker] = self.describe_progress(worker.jobs[0], progress)
+
+            if not worker.is_running:
+                worker.wait()
+                for result in worker.get_results():
+                    self.results.append(result)
+                    print(f"{os.path.basename(result.filepath)}: {result.status} ({result.seconds:.2f}s)")
+                del self.workers[worker]
+
+        self.start_workers()
+
+        if self.workers:
+            self.update_status(context)
+            return {"PASS_THROUGH"}
+
+        self.stop(context)
+        settings = context.scene.iqm_export_pipeline_settings
+        return finish_export(self, settings, self.jobs, self.results)
+
+    def stop(self, context):
+        """Remove the timer, progress and status text, and delete the snapshot."""
+
+        window_manager = context.window_manager
+        window_manager.event_timer_remove(self.timer)
+        window_manager.progress_end()
+        context.workspace.status_text_set(None)
+        self.snapshot_directory.cleanup()
+
+    def cancel(self, context):
+        """Kill the running workers and roll back their unfinished files. Also called by Blender, e.g. when a file is loaded."""
+
+        for worker in self.workers:
+            worker.cancel()
+
+            # The staged files of killed workers are all that's left of their exports. The export cache entries were
+            # invalidated when the exports started, so the unchanged files are exported again next time.
+            for job in worker.jobs:
+                output_staging.remove_staging_files(job.filepath)
+
+        self.workers.clear()
+        self.pending_jobs.clear()
+        self.stop(context)
+
+
+classes = [
+    IQM_EXPORT_PIPELINE_OT_BackgroundExport,
+]
+
+
+def register():
+    for class_to_register in classes:
+        bpy.utils.register_class(class_to_register)
+
+
+def unregister():
+    for class_to_unregister in classes:
+        bpy.utils.unregister_class(class_to_unregister)
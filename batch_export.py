@@ -0,0 +1,386 @@
+import json
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict
+import bpy
+from bpy.types import Operator
+from . import export_cache
+from . import output_staging
+from .validation_cache import validate_collection
+from .iqm_export_pipeline import (
+    ExportJob,
+    ExportResult,
+    build_export_jobs,
+    find_limit_problems,
+    get_session_cache_key,
+    is_export_job_up_to_date,
+    run_export_job,
+)
+
+# Prefix of the stdout lines a worker process uses to hand an ExportResult back to the UI process.
+WORKER_RESULT_PREFIX: str = "IQM_EXPORT_PIPELINE_RESULT "
+
+# Prefix of the stdout lines a worker process uses to report the stage it has started.
+WORKER_PROGRESS_PREFIX: str = "IQM_EXPORT_PIPELINE_PROGRESS "
+
+BATCH_SUMMARY_FILE_NAME: str = "iqm_batch_summary.json"
+
+
+def find_export_collections() -> list:
+    """Find every collection that has been given an IQM file name."""
+
+    # Collections that were never assigned a file name only report the "ExampleFile" default, so skip them.
+    return [
+        collection
+        for collection in bpy.data.collections
+        if collection.is_property_set("iqm_export_pipeline_file_name") and collection.iqm_export_pipeline_file_name
+    ]
+
+
+def resolve_worker_count(requested_workers: int, job_count: int) -> int:
+    """A requested worker count of 0 uses one worker per CPU core. Never start more workers than there are jobs."""
+
+    worker_count = requested_workers if requested_workers > 0 else (os.cpu_count() or 1)
+    return max(1, min(worker_count, job_count))
+
+
+def worker_command(blend_filepath: str, jobs: list[ExportJob]) -> list[str]:
+    """Build the command line that runs jobs in a background Blender process."""
+
+    return [
+        bpy.app.binary_path,
+        "--background",
+        blend_filepath,
+        "--python-exit-code",
+        "1",
+        "--python-expr",
+        f"import importlib; importlib.import_module({__name__!r}).worker_main()",
+        "--",
+        *(json.dumps(asdict(job)) for job in jobs),
+    ]
+
+
+def worker_main():
+    """Entry point of a background worker. Runs every job passed after "--" and prints one result line per job.
+    The start of every stage is printed as a progress line, so the UI process can show what the worker is doing.
+    """
+
+    job_arguments = sys.argv[sys.argv.index("--") + 1 :]
+
+    for job_argument in job_arguments:
+        job = ExportJob(**json.loads(job_argument))
+
+        def on_progress(stage: str, args: dict):
+            progress = {"filepath": job.filepath, "stage": stage, "action": args.get("action", "")}
+            print(WORKER_PROGRESS_PREFIX + json.dumps(progress), flush=True)
+
+        result = run_export_job(bpy.context, job, on_progress)
+        print(WORKER_RESULT_PREFIX + json.dumps(asdict(result)), flush=True)
+
+
+class WorkerProcess:
+    """A background Blender process running export jobs.
+    Its output is read on a separate thread, so progress and results can be polled without blocking the UI.
+    """
+
+    def __init__(self, blend_filepath: str, jobs: list[ExportJob]):
+        self.jobs = jobs
+        self.results: dict[str, ExportResult] = {}
+        self.progress: queue.SimpleQueue = queue.SimpleQueue()
+        self.output_tail: deque[str] = deque(maxlen=20)
+
+        self.process = subprocess.Popen(
+            worker_command(blend_filepath, jobs),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+        self._reader = threading.Thread(target=self._read_output, daemon=True)
+        self._reader.start()
+
+    def _read_output(self):
+        for line in self.process.stdout:
+            line = line.rstrip("\n")
+
+            if line.startswith(WORKER_RESULT_PREFIX):
+                result = ExportResult(**json.loads(line[len(WORKER_RESULT_PREFIX) :]))
+                self.results[result.filepath] = result
+            elif line.startswith(WORKER_PROGRESS_PREFIX):
+                self.progress.put(json.loads(line[len(WORKER_PROGRESS_PREFIX) :]))
+            else:
+                self.output_tail.append(line)
+
+    @property
+    def is_running(self) -> bool:
+        return self.process.poll() is None or self._reader.is_alive()
+
+    def poll_progress(self) -> list[dict]:
+        """Return the progress lines printed since the last call."""
+
+        progress = []
+        while True:
+            try:
+                progress.append(self.progress.get_nowait())
+            except queue.Empty:
+                return progress
+
+    def wait(self):
+        self.process.wait()
+        self._reader.join()
+
+    def cancel(self):
+        """Stop the worker immediately. Its staged files are left behind, see output_staging.remove_staging_files."""
+
+        if self.process.poll() is None:
+            self.process.kill()
+        self.wait()
+
+    def get_results(self) -> list[ExportResult]:
+        """The result of every job, once the worker has finished."""
+
+        # A worker that crashed or couldn't load the file won't report every job, so record those jobs as failures.
+        output_tail = "\n".join(self.output_tail)
+        return [
+            self.results.get(job.filepath)
+            or ExportResult(
+                collection=job.collection,
+                filepath=job.filepath,
+                status="failed",
+                error=f"Worker exited with code {self.process.returncode} without reporting a result.\n{output_tail}",
+            )
+            for job in self.jobs
+        ]
+
+
+def run_worker(blend_filepath: str, jobs: list[ExportJob]) -> list[ExportResult]:
+    """Run jobs in a single background Blender process and collect their results."""
+
+    worker = WorkerProcess(blend_filepath, jobs)
+    worker.wait()
+    return worker.get_results()
+
+
+def group_shared_jobs(jobs: list[ExportJob]) -> list[list[ExportJob]]:
+    """Group the jobs that export the same datablocks with the same options, such as the split animation files of
+    collections sharing an armature. Each group runs in a single worker, where the jobs after the first reuse the file
+    kept in its session cache.
+    """
+
+    groups: dict[object, list[ExportJob]] = {}
+    for job in jobs:
+        try:
+            key = get_session_cache_key(job)[0] if job.session_cache_mb > 0 else id(job)
+        except Exception:
+            # Let the export itself report the problem.
+            key = id(job)
+        groups.setdefault(key, []).append(job)
+
+    return list(groups.values())
+
+
+def run_batch(blend_filepath: str, jobs: list[ExportJob], worker_count: int, on_result=None) -> list[ExportResult]:
+    """Spread jobs across a pool of background Blender processes, one group of jobs (see group_shared_jobs) per process.
+    on_result is called with the ExportResults of each group as soon as its jobs finish.
+    """
+
+    results: list[ExportResult] = []
+
+    # Each thread only waits on its own child process, so the GIL isn't a bottleneck here.
+    with ThreadPoolExecutor(max_workers=worker_count) as executor:
+        futures = [executor.submit(run_worker, blend_filepath, job_group) for job_group in group_shared_jobs(jobs)]
+
+        for future in as_completed(futures):
+            for result in future.result():
+                results.append(result)
+                if on_result:
+                    on_result(result)
+
+    return results
+
+
+def skip_up_to_date_jobs(jobs: list[ExportJob], on_result=None) -> tuple[list[ExportResult], list[ExportJob]]:
+    """Split jobs into results for the jobs whose output is up to date in the export cache, and the jobs left to run."""
+
+    results: list[ExportResult] = []
+    pending_jobs: list[ExportJob] = []
+
+    for job in jobs:
+        try:
+            up_to_date = is_export_job_up_to_date(job)
+        except Exception:
+            # Let the export itself report the problem.
+            up_to_date = False
+
+        if up_to_date:
+            result = ExportResult(collection=job.collection, filepath=job.filepath, status="skipped")
+            results.append(result)
+            if on_result:
+                on_result(result)
+        else:
+            pending_jobs.append(job)
+
+    return results, pending_jobs
+
+
+def save_snapshot(snapshot_directory: str) -> str:
+    """Save a copy of the current file for background workers to read, so unsaved changes are exported too."""
+
+    snapshot_filepath = os.path.join(snapshot_directory, "snapshot.blend")
+    bpy.ops.wm.save_as_mainfile(filepath=snapshot_filepath, copy=True)
+    return snapshot_filepath
+
+
+def run_export_jobs(context, jobs: list[ExportJob], requested_workers: int, on_result=None) -> list[ExportResult]:
+    """Run jobs, skipping the ones whose output is up to date in the export cache.
+    A single remaining job runs in this process, since starting a background Blender would take longer than most
+    exports. More jobs are spread across a pool of background workers that read a copy of the current file.
+    """
+
+    results, pending_jobs = skip_up_to_date_jobs(jobs, on_result)
+
+    if len(pending_jobs) == 1:
+        result = run_export_job(context, pending_jobs[0])
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    elif pending_jobs:
+        with tempfile.TemporaryDirectory(prefix="iqm_export_pipeline_") as snapshot_directory:
+            snapshot_filepath = save_snapshot(snapshot_directory)
+            worker_count = resolve_worker_count(requested_workers, len(pending_jobs))
+            results += run_batch(snapshot_filepath, pending_jobs, worker_count, on_result)
+
+    return results
+
+
+def write_batch_summary(file_directory: str, results: list[ExportResult], worker_count: int, wall_seconds: float) -> str:
+    """Write the results of a batch export as JSON, and return the path of the summary file."""
+
+    summary = {
+        "workers": worker_count,
+        "wall_seconds": wall_seconds,
+        "exported": sum(1 for result in results if result.status == "exported"),
+        "skipped": sum(1 for result in results if result.status == "skipped"),
+        "failed": sum(1 for result in results if result.status == "failed"),
+        "jobs": [asdict(result) for result in sorted(results, key=lambda result: (result.collection, result.filepath))],
+    }
+
+    os.makedirs(file_directory, exist_ok=True)
+    summary_path = os.path.join(file_directory, BATCH_SUMMARY_FILE_NAME)
+    output_staging.write_atomic(summary_path, json.dumps(summary, indent=4).encode())
+
+    return summary_path
+
+
+class IQM_EXPORT_PIPELINE_OT_BatchExport(Operator):
+    """Export every collection that has an IQM file name, using a pool of background Blender processes"""
+
+    bl_idname = "export.iqm_pipeline_batch"
+    bl_label = "Batch Export IQM via pipeline"
+
+    @classmethod
+    def poll(cls, context):
+        # Ensure the scene contains an instance of the iqm_export_pipeline_settings PropertyGroup.
+        return hasattr(context.scene, "iqm_export_pipeline_settings")
+
+    def execute(self, context):
+        settings = context.scene.iqm_export_pipeline_settings
+
+        jobs: list[ExportJob] = []
+        results: list[ExportResult] = []
+        claimed_filepaths: dict[str, str] = {}
+
+        for collection in find_export_collections():
+            validation = validate_collection(settings, collection)
+            if not validation.exportable:
+                results.append(
+                    ExportResult(
+                        collection=collection.name,
+                        filepath="",
+                        status="failed",
+                        error="\n".join(validation.problems),
+                    )
+                )
+                continue
+
+            collection_jobs = build_export_jobs(settings, collection)
+            problems = find_limit_problems(settings, collection, collection_jobs)
+            if problems:
+                results.append(ExportResult(collection=collection.name, filepath="", status="failed", error="\n".join(problems)))
+                continue
+
+            for job in collection_jobs:
+                # Two collections writing the same file would race each other, so only the first one is exported.
+                if job.filepath in claimed_filepaths:
+                    results.append(
+                        ExportResult(
+                            collection=job.collection,
+                            filepath=job.filepath,
+                            status="failed",
+                            error=f"The output file is already written by the collection '{claimed_filepaths[job.filepath]}'.",
+                        )
+                    )
+                    continue
+
+                claimed_filepaths[job.filepath] = job.collection
+                jobs.append(job)
+
+        if not jobs:
+            self.report({"WARNING"}, "No exportable collections with an IQM file name were found")
+            return {"CANCELLED"}
+
+        worker_count = resolve_worker_count(settings.batch_worker_count, len(jobs))
+        window_manager = context.window_manager
+        window_manager.progress_begin(0, len(jobs))
+        start_time = time.perf_counter()
+        finished_jobs: list[ExportResult] = []
+
+        def on_result(result: ExportResult):
+            finished_jobs.append(result)
+            window_manager.progress_update(len(finished_jobs))
+            print(f"{os.path.basename(result.filepath)}: {result.status} ({result.seconds:.2f}s)")
+
+        try:
+            results += run_export_jobs(context, jobs, settings.batch_worker_count, on_result)
+
+        finally:
+            window_manager.progress_end()
+
+        wall_seconds = time.perf_counter() - start_time
+        file_directory = os.path.abspath(settings.export_directory)
+        summary_path = write_batch_summary(file_directory, results, worker_count, wall_seconds)
+
+        if settings.use_export_cache:
+            export_cache.evict(file_directory, settings.export_cache_max_entries, settings.export_cache_max_age_days)
+
+        failed_count = sum(1 for result in results if result.status == "failed")
+        skipped_count = sum(1 for result in results if result.status == "skipped")
+        self.report(
+            {"ERROR"} if failed_count else {"INFO"},
+            f"Exported {len(results) - failed_count - skipped_count}/{len(results)} files in {wall_seconds:.1f}s "
+            f"with {worker_count} workers ({skipped_count} unchanged, {failed_count} failed). Summary: {summary_path}",
+        )
+
+        return {"CANCELLED"} if failed_count else {"FINISHED"}
+
+
+classes = [
+    IQM_EXPORT_PIPELINE_OT_BatchExport,
+]
+
+
+def register():
+    for class_to_register in classes:
+        bpy.utils.register_class(class_to_register)
+
+
+def unregister():
+    for class_to_unregister in classes:
+        bpy.utils.unregister_class(class_to_unregister)
@@ -0,0 +1,185 @@
+# End-to-end benchmarks of the Export operator, run in a headless Blender on generated synthetic scenes.
+#
+# Usage: blender --background --factory-startup --python benchmarks/bench_blender.py -- [--scenes tiny small] [--repeat 3]
+#
+# Each scene is built from scratch: an armature with chains of bones, a mesh skinned to it, extra root mesh objects
+# sharing the remaining vertices, and actions that key every bone. The operator is timed with profiling off, then run
+# once more with profiling on to record the time of each stage.
+
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+
+import bpy
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import DEFAULT_SCENES, SCENE_SIZES, BenchmarkResult, load_addon, measure, median_stage_seconds, print_result, write_results  # noqa: E402
+
+
+def enable_exporter():
+    """Enable the IQM exporter add-on, which --factory-startup leaves disabled."""
+
+    import addon_utils
+
+    if "iqm_export" not in sys.modules:
+        addon_utils.enable("iqm_export", default_set=True)
+
+    if "iqm_export" not in sys.modules:
+        raise RuntimeError("The iqm_export add-on isn't installed")
+
+
+def make_grid_mesh(name: str, vertex_count: int):
+    """A grid of quads with (about) vertex_count vertices, built with foreach_set so large meshes are quick to create."""
+
+    columns = max(2, math.isqrt(vertex_count))
+    rows = max(2, math.ceil(vertex_count / columns))
+
+    x, y = np.meshgrid(np.linspace(-1.0, 1.0, columns), np.linspace(0.0, 2.0, rows))
+    coordinates = np.stack([x.ravel(), np.zeros(x.size), y.ravel()], axis=1)
+
+    corners = (np.arange(rows - 1)[:, np.newaxis] * columns + np.arange(columns - 1)).ravel()
+    quads = np.stack([corners, corners + 1, corners + columns + 1, corners + columns], axis=1)
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(coordinates))
+    mesh.vertices.foreach_set("co", coordinates.astype(np.float32).ravel())
+    mesh.loops.add(quads.size)
+    mesh.loops.foreach_set("vertex_index", quads.astype(np.int32).ravel())
+    mesh.polygons.add(len(quads))
+    mesh.polygons.foreach_set("loop_start", np.arange(0, quads.size, 4, dtype=np.int32))
+    mesh.polygons.foreach_set("loop_total", np.full(len(quads), 4, dtype=np.int32))
+    mesh.update(calc_edges=True)
+    return mesh
+
+
+def build_scene(size, export_collection):
+    """Fill export_collection with a synthetic scene of the given size. Returns the created actions."""
+
+    armature = bpy.data.armatures.new("benchmark_armature")
+    armature_object = bpy.data.objects.new("benchmark_armature", armature)
+    export_collection.objects.link(armature_object)
+
+    # Bones can only be created in edit mode.
+    bpy.context.view_layer.objects.active = armature_object
+    bpy.ops.object.mode_set(mode="EDIT")
+    bone_names = []
+    for bone_index in range(size.bones):
+        edit_bone = armature.edit_bones.new(f"bone_{bone_index}")
+        chain_index = bone_index % 10
+        edit_bone.head = (bone_index // 10 * 0.1, 0.0, chain_index * 0.2)
+        edit_bone.tail = (bone_index // 10 * 0.1, 0.0, chain_index * 0.2 + 0.2)
+        if chain_index:
+            edit_bone.parent = armature.edit_bones[bone_names[-1]]
+        bone_names.append(edit_bone.name)
+    bpy.ops.object.mode_set(mode="OBJECT")
+
+    # The skinned mesh is a child of the armature, the other meshes are root objects sharing the remaining vertices.
+    skinned_vertices = size.vertices // 2 if size.root_objects > 1 else size.vertices
+    skinned_object = bpy.data.objects.new("benchmark_skinned", make_grid_mesh("benchmark_skinned", skinned_vertices))
+    skinned_object.parent = armature_object
+    skinned_object.modifiers.new("Armature", "ARMATURE").object = armature_object
+    export_collection.objects.link(skinned_object)
+
+    vertex_bands = np.array_split(np.arange(len(skinned_object.data.vertices)), size.bones)
+    for bone_name, vertex_band in zip(bone_names, vertex_bands):
+        skinned_object.vertex_groups.new(name=bone_name).add(vertex_band.tolist(), 1.0, "REPLACE")
+
+    static_count = size.root_objects - 1
+    for object_index in range(static_count):
+        vertex_count = max(4, (size.vertices - skinned_vertices) // static_count)
+        static_object = bpy.data.objects.new(f"benchmark_static_{object_index}", make_grid_mesh(f"benchmark_static_{object_index}", vertex_count))
+        static_object.location = (object_index * 2.5, 0.0, 0.0)
+        export_collection.objects.link(static_object)
+
+    actions = []
+    for action_index in range(size.actions):
+        action = bpy.data.actions.new(f"benchmark_action_{action_index}")
+        for bone_index, bone_name in enumerate(bone_names):
+            # Rotate each bone about its x axis, the quaternion is stored as (w, x, y, z).
+            angle = 0.1 + (action_index + bone_index) % 7 * 0.1
+            start_values = (1.0, 0.0, 0.0, 0.0)
+            end_values = (math.cos(angle / 2.0), math.sin(angle / 2.0), 0.0, 0.0)
+            for array_index in range(4):
+                fcurve = action.fcurves.new(f'pose.bones["{bone_name}"].rotation_quaternion', index=array_index, action_group=bone_name)
+                fcurve.keyframe_points.add(2)
+                fcurve.keyframe_points.foreach_set(
+                    "co", [1.0, start_values[array_index], float(size.frames_per_action), end_values[array_index]]
+                )
+                fcurve.update()
+        actions.append(action)
+
+    # exportIQM assigns each action to the armature's animation data while sampling it.
+    armature_object.animation_data_create()
+    return actions
+
+
+def run(scene_names, repeat: int) -> list[BenchmarkResult]:
+    enable_exporter()
+    addon = load_addon()
+    if not hasattr(bpy.types.Scene, "iqm_export_pipeline_settings"):
+        addon.register()
+
+    results: list[BenchmarkResult] = []
+
+    for scene_name in scene_names:
+        size = SCENE_SIZES[scene_name]
+        bpy.ops.wm.read_homefile(use_empty=True)
+        scene = bpy.context.scene
+
+        export_collection = bpy.data.collections.new("benchmark")
+        scene.collection.children.link(export_collection)
+        export_collection.iqm_export_pipeline_file_name = f"benchmark_{scene_name}"
+        actions = build_scene(size, export_collection)
+
+        for action in actions:
+            export_collection.action_items.add().action = action
+
+        with tempfile.TemporaryDirectory() as output_directory:
+            settings = scene.iqm_export_pipeline_settings
+            settings.export_collection = export_collection
+            settings.export_directory = output_directory
+            settings.action_list_source = "action_list" if actions else "none"
+            settings.use_export_cache = False
+
+            def export():
+                if bpy.ops.export.iqm_pipeline() != {"FINISHED"}:
+                    raise RuntimeError(f"Exporting the {scene_name} scene failed, check the console")
+
+            settings.use_profiling = False
+            samples = measure(export, repeat)
+
+            settings.use_profiling = True
+            export()
+            job = addon.iqm_export_pipeline.build_export_job(settings, export_collection)
+            with open(addon.iqm_export_pipeline.get_trace_path(job.filepath)) as trace_file:
+                stages = median_stage_seconds([json.load(trace_file)])
+            output_size = os.path.getsize(job.filepath)
+            settings.use_profiling = False
+
+        result = BenchmarkResult("export_operator", scene_name, {**vars(size), "bytes": output_size}, samples, stages)
+        print_result(result)
+        results.append(result)
+
+    return results
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+
+    parser = argparse.ArgumentParser(description="Benchmark the IQM Export Pipeline in Blender")
+    parser.add_argument("--scenes", nargs="+", choices=sorted(SCENE_SIZES), default=list(DEFAULT_SCENES))
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs of each export")
+    parser.add_argument("--output", default="", help="where to write the JSON results (default: results/blender-<commit>.json)")
+    args = parser.parse_args(argv)
+
+    results = run(args.scenes, args.repeat)
+    print(f"Wrote {write_results('blender', results, args.output, bpy.app.version_string)}")
+
+
+if __name__ == "__main__":
+    main()
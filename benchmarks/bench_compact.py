@@ -0,0 +1,92 @@
+# Compact format: the size of files written with quantized vertices and 8-bit animation channels, and the time to
+# decode their vertices and poses, against the default format the Export operator writes.
+#
+# Usage: python benchmarks/bench_compact.py [--scenes tiny small medium] [--repeat 5] [--output results.json]
+
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy_stand_in  # noqa: E402
+from common import DEFAULT_SCENES, SCENE_SIZES, BenchmarkResult, load_addon, make_synthetic_model, measure, print_result, write_results  # noqa: E402
+
+# The vertex format and whether animations are compact, of each benchmarked variant.
+VARIANTS: dict[str, tuple[str, bool]] = {
+    "default": ("FLOAT", False),
+    "half": ("HALF", True),
+    "fixed": ("FIXED", True),
+}
+
+# The default tolerances of the pipeline settings: translation, rotation and scale.
+TOLERANCES: tuple[float, float, float] = (0.001, 0.0005, 0.001)
+
+
+def decode_mapped(compact_format, filepath: str):
+    """Decode every vertex array and the poses of every frame, as a loader would."""
+
+    with compact_format.open_iqm(filepath) as model:
+        for vertex_array in model.vertex_arrays:
+            model.decode_vertex_array(vertex_array.type)
+        model.decode_frames()
+
+
+def run(scene_names, repeat: int) -> list[BenchmarkResult]:
+    bpy_stand_in.install()
+    load_addon()
+    from iqm_export_pipeline import animation_compression, compact_format, iqm_format
+
+    tolerances = animation_compression.channel_tolerances(*TOLERANCES)
+    results = []
+
+    def add(name, scene_name, function, **params):
+        result = BenchmarkResult(name, scene_name, params, measure(function, repeat))
+        print_result(result)
+        results.append(result)
+
+    with tempfile.TemporaryDirectory() as output_directory:
+        for scene_name in scene_names:
+            size = SCENE_SIZES[scene_name]
+            default_bytes = 0
+
+            for variant, (vertex_format, compact_animations) in VARIANTS.items():
+                model = make_synthetic_model(iqm_format, size)
+                compact_format.quantize_vertices(model, vertex_format)
+                if compact_animations:
+                    compact_format.quantize_frames(model, tolerances)
+
+                filepath = os.path.join(output_directory, f"{scene_name}_{variant}.iqm")
+                iqm_format.write_iqm(model, filepath)
+                file_bytes = os.path.getsize(filepath)
+                default_bytes = default_bytes or file_bytes
+
+                add(
+                    f"decode_{variant}",
+                    scene_name,
+                    lambda: decode_mapped(compact_format, filepath),
+                    bytes=file_bytes,
+                    size_ratio=round(file_bytes / default_bytes, 3),
+                )
+
+            # The copying reader used by the export stages, on the default format.
+            default_path = os.path.join(output_directory, f"{scene_name}_default.iqm")
+            add("read_iqm_default", scene_name, lambda: iqm_format.decode_frames(iqm_format.read_iqm(default_path)), bytes=default_bytes)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the size and decode time of the IQM Export Pipeline compact format")
+    parser.add_argument("--scenes", nargs="+", default=list(DEFAULT_SCENES), choices=list(SCENE_SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="", help="where to write the JSON results (default: results/compact-<commit>.json)")
+    args = parser.parse_args(argv)
+
+    results = run(args.scenes, args.repeat)
+    print(f"Wrote {write_results('compact', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
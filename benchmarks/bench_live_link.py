@@ -0,0 +1,74 @@
+# Live link latency: the time from publishing an exported file to a local client having received all of it, with the
+# reference client as the consumer. This is the part of edit-to-screen latency the live link adds, on top of the export.
+#
+# Usage: python benchmarks/bench_live_link.py [--scenes tiny small medium] [--repeat 20] [--output results.json]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy_stand_in  # noqa: E402
+from common import DEFAULT_SCENES, SCENE_SIZES, BenchmarkResult, load_addon, make_synthetic_model, print_result, write_results  # noqa: E402
+
+
+def measure_latency(live_link, live_link_client, filepath: str, send_contents: bool, repeat: int) -> list[float]:
+    """Publish filepath repeat times, one at a time, and return the seconds until the client received each one."""
+
+    with tempfile.TemporaryDirectory() as socket_directory:
+        address = f"unix:{os.path.join(socket_directory, 'live_link.sock')}" if hasattr(live_link.socket, "AF_UNIX") else "127.0.0.1:0"
+        server = live_link.LiveLinkServer(address, send_contents, batch_seconds=0.0)
+        try:
+            with live_link_client.connect(server.address) as sock:
+                files = live_link_client.iter_files(sock)
+                samples = []
+                for _ in range(repeat):
+                    start_time = time.perf_counter()
+                    server.publish([filepath])
+                    next(files)
+                    samples.append(time.perf_counter() - start_time)
+        finally:
+            server.stop()
+
+    return samples
+
+
+def run(scene_names, repeat: int) -> list[BenchmarkResult]:
+    bpy_stand_in.install()
+    addon = load_addon()
+    from iqm_export_pipeline import iqm_format, live_link, live_link_client
+
+    results = []
+    with tempfile.TemporaryDirectory() as output_directory:
+        for scene_name in scene_names:
+            size = SCENE_SIZES[scene_name]
+            filepath = os.path.join(output_directory, f"{scene_name}.iqm")
+            iqm_format.write_iqm(make_synthetic_model(iqm_format, size), filepath)
+
+            for send_contents in (True, False):
+                samples = measure_latency(live_link, live_link_client, filepath, send_contents, repeat)
+                result = BenchmarkResult(
+                    "live_link_latency", scene_name, {"bytes": os.path.getsize(filepath), "send_contents": send_contents}, samples
+                )
+                print_result(result)
+                results.append(result)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the latency of the IQM Export Pipeline live link")
+    parser.add_argument("--scenes", nargs="+", default=list(DEFAULT_SCENES), choices=list(SCENE_SIZES))
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", default="", help="where to write the JSON results (default: results/live_link-<commit>.json)")
+    args = parser.parse_args(argv)
+
+    results = run(args.scenes, args.repeat)
+    print(f"Wrote {write_results('live_link', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# Benchmarks of the pure-Python parts of the add-on, run with a regular Python interpreter against the bpy stand-in.
+#
+# Usage: python benchmarks/bench_pure.py [--scenes tiny small medium large] [--repeat 5] [--output results.json]
+
+import argparse
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy_stand_in  # noqa: E402
+from common import DEFAULT_SCENES, SCENE_SIZES, BenchmarkResult, load_addon, make_synthetic_model, measure, print_result, write_results  # noqa: E402
+
+
+def make_stand_in_context(addon, size, action_list_source: str = "action_list"):
+    """A context whose scene settings export a collection with one action item per action of size."""
+
+    ActionItem = addon.action_items_ui_list.ACTIONITEMS_ActionItemProp
+    action_items = [
+        ActionItem(action=SimpleNamespace(name=f"action_{index}"), frame_start=1, frame_end=size.frames_per_action, fps=24.0, looping=True)
+        for index in range(size.actions)
+    ]
+
+    export_collection = bpy_stand_in.Struct(
+        name="export",
+        all_objects=[SimpleNamespace(name=f"object_{index}", parent=None) for index in range(size.root_objects)],
+        action_items=action_items,
+        iqm_export_pipeline_file_name="export",
+    )
+
+    settings = bpy_stand_in.Struct(
+        export_collection=export_collection,
+        action_list_source=action_list_source,
+        action_list_string=", ".join(str(action_item) for action_item in action_items),
+        lod_ratios="",
+        use_packaging=False,
+        package_path="",
+    )
+    return SimpleNamespace(scene=SimpleNamespace(iqm_export_pipeline_settings=settings))
+
+
+def run(scene_names, repeat: int) -> list[BenchmarkResult]:
+    addon = load_addon()
+    pipeline = addon.iqm_export_pipeline
+    # The export stages are imported on the first export instead of with the add-on.
+    from iqm_export_pipeline import animation_compression, compact_format, iqm_diff, iqm_format, iqm_transform, vertex_cache, vertex_welding
+    results: list[BenchmarkResult] = []
+
+    def add(name, scene_name, size, function, **params):
+        result = BenchmarkResult(name, scene_name, {**vars(size), **params}, measure(function, repeat))
+        print_result(result)
+        results.append(result)
+
+    for scene_name in scene_names:
+        size = SCENE_SIZES[scene_name]
+        context = make_stand_in_context(addon, size)
+        settings = context.scene.iqm_export_pipeline_settings
+
+        add("action_items_join", scene_name, size, lambda: pipeline.build_animation_specs(settings, settings.export_collection))
+        add("validate_collection", scene_name, size, lambda: addon.validation_cache.validate_collection(settings, settings.export_collection))
+        add("poll", scene_name, size, lambda: pipeline.IQM_EXPORT_PIPELINE_OT_Export.poll(context))
+        add("parse_animation_specs", scene_name, size, lambda: addon.action_items_ui_list.parse_animation_specs(settings.action_list_string))
+
+        # What drawing the action list computes when its filter or items change, searching and sorting by name.
+        action_items = settings.export_collection.action_items
+        names = [action_item.action.name for action_item in action_items]
+        frame_counts = [action_item.frame_end - action_item.frame_start + 1 for action_item in action_items]
+        fps = [action_item.fps for action_item in action_items]
+        name_filter = addon.action_items_ui_list.compile_name_filter("action_1*", False)
+        add(
+            "filter_action_items",
+            scene_name,
+            size,
+            lambda: addon.action_items_ui_list.filter_action_items(names, frame_counts, fps, name_filter, "NAME", False),
+        )
+        add(
+            "build_offset_matrix",
+            scene_name,
+            size,
+            lambda: pipeline.build_offset_matrix((0.0, 0.0, -24.0), (0.0, 0.0, np.pi / 2.0), (32.0, 32.0, 32.0)),
+        )
+
+        # The offset stage transforms the exported file, so benchmark it on a synthetic model of the same size.
+        model = make_synthetic_model(iqm_format, size)
+        buffer = bytes(iqm_format.serialize_iqm(model))
+        offset = np.array(pipeline.build_offset_matrix((0.0, 0.0, -24.0), (0.0, 0.0, np.pi / 2.0), (32.0, 32.0, 32.0)))
+
+        add("parse_iqm", scene_name, size, lambda: iqm_format.parse_iqm(buffer), bytes=len(buffer))
+        add("apply_offset", scene_name, size, lambda: iqm_transform.apply_offset(iqm_format.parse_iqm(buffer), offset))
+        add("serialize_iqm", scene_name, size, lambda: iqm_format.serialize_iqm(model), bytes=len(buffer))
+
+        compression = animation_compression
+        tolerances = compression.channel_tolerances(0.001, 0.0005, 0.001)
+        add("compress_animations", scene_name, size, lambda: compression.compress_animations(iqm_format.parse_iqm(buffer), tolerances))
+
+        add("weld_vertices", scene_name, size, lambda: vertex_welding.weld_vertices(iqm_format.parse_iqm(buffer)))
+        # Comparing the file with itself reads and decodes every section, like comparing a build that didn't change.
+        add(
+            "diff_models",
+            scene_name,
+            size,
+            lambda: iqm_diff.diff_models(compact_format.MappedIQM(buffer), compact_format.MappedIQM(buffer)),
+            bytes=len(buffer),
+        )
+        add("optimize_vertex_cache", scene_name, size, lambda: vertex_cache.optimize_vertex_cache(iqm_format.parse_iqm(buffer)))
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pure-Python parts of the IQM Export Pipeline")
+    parser.add_argument("--scenes", nargs="+", choices=sorted(SCENE_SIZES), default=list(DEFAULT_SCENES))
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs of each benchmark")
+    parser.add_argument("--output", default="", help="where to write the JSON results (default: results/pure-<commit>.json)")
+    args = parser.parse_args(argv)
+
+    bpy_stand_in.install()
+    results = run(args.scenes, args.repeat)
+    print(f"Wrote {write_results('pure', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Startup budget of the add-on: how long importing and registering it takes in a fresh process, as happens every time
+# Blender starts with the add-on enabled. Exits with 1 when the median total is over the budget.
+#
+# Usage: python benchmarks/bench_startup.py [--repeat 10] [--budget-ms 100] [--output results.json]
+#        python benchmarks/bench_startup.py --blender /path/to/blender [--repeat 10] [--budget-ms 100]
+#
+# Without --blender, each run uses the bpy stand-in in a regular Python interpreter. That leaves out Blender's own
+# registration work, but includes everything the add-on imports and does while registering, such as installing presets.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import BenchmarkResult, load_addon, print_result, write_results  # noqa: E402
+
+# Prefix of the line a child process prints its timings on, so it can be told apart from Blender's own output.
+CHILD_RESULT_PREFIX: str = "IQM_EXPORT_PIPELINE_STARTUP "
+
+# The default budget for importing and registering the add-on, in milliseconds.
+DEFAULT_BUDGET_MS: float = 100.0
+
+
+def run_child():
+    """Import and register the add-on once, and print how long each step took."""
+
+    import bpy_stand_in
+
+    bpy_stand_in.install()
+
+    start_time = time.perf_counter()
+    addon = load_addon()
+    import_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    addon.register()
+    register_seconds = time.perf_counter() - start_time
+
+    addon.unregister()
+    print(CHILD_RESULT_PREFIX + json.dumps({"import": import_seconds, "register": register_seconds}), flush=True)
+
+
+def measure_startup(blender: str) -> dict[str, float]:
+    """Start a fresh process that imports and registers the add-on, and return the seconds of each step."""
+
+    script = os.path.abspath(__file__)
+    if blender:
+        command = [blender, "--background", "--factory-startup", "--python", script, "--", "--child"]
+    else:
+        command = [sys.executable, script, "--child"]
+
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    for line in output.splitlines():
+        if line.startswith(CHILD_RESULT_PREFIX):
+            return json.loads(line[len(CHILD_RESULT_PREFIX) :])
+
+    raise RuntimeError(f"The startup benchmark didn't report its timings:\n{output}")
+
+
+def run(blender: str, repeat: int) -> list[BenchmarkResult]:
+    # The first start installs the presets, which later starts skip.
+    measure_startup(blender)
+
+    samples = [measure_startup(blender) for _ in range(repeat)]
+    params = {"blender": bool(blender)}
+
+    results = [
+        BenchmarkResult("import", "startup", params, [sample["import"] for sample in samples]),
+        BenchmarkResult("register", "startup", params, [sample["register"] for sample in samples]),
+        BenchmarkResult("import_and_register", "startup", params, [sample["import"] + sample["register"] for sample in samples]),
+    ]
+    for result in results:
+        print_result(result)
+
+    return results
+
+
+def main(argv=None):
+    if argv is None:
+        # Blender passes the script's own arguments after "--".
+        argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description="Measure the startup cost of the IQM Export Pipeline")
+    parser.add_argument("--blender", default="", help="measure in this Blender executable instead of with the bpy stand-in")
+    parser.add_argument("--repeat", type=int, default=10, help="number of fresh processes to time")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="fail when the median import and register time is over this")
+    parser.add_argument("--output", default="", help="where to write the JSON results (default: results/startup-<commit>.json)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child()
+        return
+
+    results = run(args.blender, args.repeat)
+    print(f"Wrote {write_results('startup', results, args.output)}")
+
+    total_ms = results[-1].median * 1000.0
+    if total_ms > args.budget_ms:
+        print(f"Startup takes {total_ms:.1f} ms, over the budget of {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+    print(f"Startup takes {total_ms:.1f} ms, within the budget of {args.budget_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
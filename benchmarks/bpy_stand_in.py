@@ -0,0 +1,166 @@
+# A lightweight stand-in for the bpy and mathutils modules, so the pure-Python parts of the add-on can be imported and
+# benchmarked with a regular Python interpreter.
+#
+# Only what the add-on touches while importing is provided: bpy.types classes are plain objects whose properties are
+# set from keyword arguments, bpy.props functions return their options, and registration does nothing. Anything that
+# needs real Blender data (such as exporting) has to be benchmarked with bench_blender.py instead.
+
+import math
+import re
+import sys
+import tempfile
+import types
+
+import numpy as np
+
+
+class Struct:
+    """Base class of every stand-in bpy.types class. Properties are plain attributes, set from keyword arguments."""
+
+    def __init__(self, **properties):
+        for name, value in properties.items():
+            setattr(self, name, value)
+
+    def as_pointer(self) -> int:
+        return id(self)
+
+
+# Class attributes of bpy.types classes that the add-on reads while its classes are defined.
+TYPE_ATTRIBUTES: dict[str, dict] = {
+    "Menu": {"draw_preset": lambda self, context: None},
+}
+
+
+def _make_type(name: str) -> type:
+    return type(name, (Struct,), dict(TYPE_ATTRIBUTES.get(name, {})))
+
+
+def _lazy_module(name: str, make_attribute) -> types.ModuleType:
+    """A module that creates (and caches) any attribute that is looked up on it."""
+
+    module = types.ModuleType(name)
+    attributes = {}
+
+    def __getattr__(attribute_name):
+        if attribute_name.startswith("__"):
+            raise AttributeError(attribute_name)
+        if attribute_name not in attributes:
+            attributes[attribute_name] = make_attribute(attribute_name)
+        return attributes[attribute_name]
+
+    module.__getattr__ = __getattr__
+    return module
+
+
+def _make_property_function(property_type: str):
+    def property_function(**options):
+        return (property_type, options)
+
+    return property_function
+
+
+def clean_name(name: str, replace: str = "_") -> str:
+    """Like bpy.path.clean_name(), replace every character that isn't safe in a file name."""
+
+    return re.sub(r"[^A-Za-z0-9_]", replace, name)
+
+
+class Euler(tuple):
+    def __new__(cls, angles=(0.0, 0.0, 0.0), order: str = "XYZ"):
+        euler = super().__new__(cls, angles)
+        euler.order = order
+        return euler
+
+    def to_matrix(self) -> np.ndarray:
+        rotations = {}
+        for axis, angle in zip("XYZ", self):
+            cos, sin = math.cos(angle), math.sin(angle)
+            rotations[axis] = {
+                "X": np.array([[1, 0, 0], [0, cos, -sin], [0, sin, cos]]),
+                "Y": np.array([[cos, 0, sin], [0, 1, 0], [-sin, 0, cos]]),
+                "Z": np.array([[cos, -sin, 0], [sin, cos, 0], [0, 0, 1]]),
+            }[axis]
+
+        # The first axis of the order is applied first.
+        matrix = np.identity(3)
+        for axis in self.order:
+            matrix = rotations[axis] @ matrix
+        return matrix
+
+
+class Matrix(list):
+    """A 4x4 matrix stored as a list of rows, so it can be iterated and converted with np.array() like mathutils.Matrix."""
+
+    def __init__(self, rows=None):
+        super().__init__(list(row) for row in (np.identity(4) if rows is None else rows))
+
+    @classmethod
+    def Identity(cls, size: int = 4):
+        return cls(np.identity(size))
+
+    @classmethod
+    def LocRotScale(cls, location, rotation, scale):
+        matrix = np.identity(4)
+        matrix[:3, :3] = Euler(rotation, getattr(rotation, "order", "XYZ")).to_matrix() @ np.diag(scale)
+        matrix[:3, 3] = location
+        return cls(matrix)
+
+
+def _export_iqm(*args, **kwargs):
+    raise NotImplementedError("The bpy stand-in can't export, run bench_blender.py in Blender instead")
+
+
+def install():
+    """Install the stand-in modules into sys.modules. Does nothing when running inside Blender."""
+
+    if "bpy" in sys.modules:
+        return
+
+    bpy = types.ModuleType("bpy")
+    bpy.types = _lazy_module("bpy.types", _make_type)
+    bpy.props = _lazy_module("bpy.props", _make_property_function)
+    bpy.utils = types.SimpleNamespace(
+        register_class=lambda cls: None,
+        unregister_class=lambda cls: None,
+        user_resource=lambda resource_type, path="": tempfile.gettempdir(),
+    )
+    bpy.path = types.SimpleNamespace(clean_name=clean_name)
+    bpy.app = types.ModuleType("bpy.app")
+    bpy.app.version = (0, 0, 0)
+    bpy.app.handlers = _lazy_module("bpy.app.handlers", lambda name: [])
+    bpy.app.handlers.persistent = lambda function: function
+    bpy.msgbus = types.SimpleNamespace(subscribe_rna=lambda **kwargs: None, clear_by_owner=lambda owner: None)
+    bpy.context = types.SimpleNamespace()
+    bpy.data = types.SimpleNamespace(collections={}, actions={}, filepath="")
+
+    mathutils = types.ModuleType("mathutils")
+    mathutils.Euler = Euler
+    mathutils.Matrix = Matrix
+
+    bl_ui = types.ModuleType("bl_ui")
+    bl_ui.utils = types.ModuleType("bl_ui.utils")
+    bl_ui.utils.PresetPanel = type("PresetPanel", (Struct,), {})
+
+    bl_operators = types.ModuleType("bl_operators")
+    bl_operators.presets = types.ModuleType("bl_operators.presets")
+    bl_operators.presets.AddPresetBase = type("AddPresetBase", (Struct,), {})
+    bl_operators.presets.ExecutePreset = type("ExecutePreset", (Struct,), {})
+
+    iqm_export = types.ModuleType("iqm_export")
+    iqm_export.exportIQM = _export_iqm
+
+    sys.modules.update(
+        {
+            "bpy": bpy,
+            "bpy.types": bpy.types,
+            "bpy.props": bpy.props,
+            "bpy.app": bpy.app,
+            "bpy.app.handlers": bpy.app.handlers,
+            "mathutils": mathutils,
+            "bl_ui": bl_ui,
+            "bl_ui.utils": bl_ui.utils,
+            "bl_operators": bl_operators,
+            "bl_operators.presets": bl_operators.presets,
+            "iqm_export": iqm_export,
+        }
+    )
@@ -0,0 +1,212 @@
+# Helpers shared by the benchmark suites: loading the add-on from this checkout, synthetic scene sizes, timing, and
+# writing results as JSON so runs on different commits can be compared with compare.py.
+
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+
+BENCHMARKS_DIRECTORY: str = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIRECTORY: str = os.path.dirname(BENCHMARKS_DIRECTORY)
+RESULTS_DIRECTORY: str = os.path.join(BENCHMARKS_DIRECTORY, "results")
+
+# The add-on is loaded from this checkout under its installed package name.
+ADDON_PACKAGE: str = "iqm_export_pipeline"
+
+
+@dataclass
+class SceneSize:
+    """The size of a synthetic scene. Vertices are split between the root objects, and every action keys every bone."""
+
+    root_objects: int
+    bones: int
+    vertices: int
+    actions: int
+    frames_per_action: int = 24
+
+
+SCENE_SIZES: dict[str, SceneSize] = {
+    "tiny": SceneSize(root_objects=1, bones=10, vertices=1_000, actions=1),
+    "small": SceneSize(root_objects=10, bones=50, vertices=10_000, actions=10),
+    "medium": SceneSize(root_objects=100, bones=150, vertices=100_000, actions=100),
+    "large": SceneSize(root_objects=500, bones=300, vertices=1_000_000, actions=500),
+}
+
+# The large scene takes minutes to build and export, so it only runs when asked for.
+DEFAULT_SCENES: tuple[str, ...] = ("tiny", "small", "medium")
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    scene: str
+    params: dict
+    samples: list[float]
+    stages: dict[str, float] = field(default_factory=dict)  # Median seconds of each profiled stage.
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.samples)
+
+
+def load_addon():
+    """Import the add-on package from this checkout, so it can be benchmarked without being installed."""
+
+    if ADDON_PACKAGE in sys.modules:
+        return sys.modules[ADDON_PACKAGE]
+
+    spec = importlib.util.spec_from_file_location(
+        ADDON_PACKAGE,
+        os.path.join(REPOSITORY_DIRECTORY, "__init__.py"),
+        submodule_search_locations=[REPOSITORY_DIRECTORY],
+    )
+    addon = importlib.util.module_from_spec(spec)
+    sys.modules[ADDON_PACKAGE] = addon
+    spec.loader.exec_module(addon)
+    return addon
+
+
+def measure(function, repeat: int = 5, warmup: int = 1) -> list[float]:
+    """Call function warmup times, then time repeat calls. Returns the seconds of each timed call."""
+
+    for _ in range(warmup):
+        function()
+
+    samples = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start_time)
+
+    return samples
+
+
+def median_stage_seconds(traces: list[dict]) -> dict[str, float]:
+    """The median seconds of each named span over several Chrome traces written by the profiler."""
+
+    stage_samples: dict[str, list[float]] = {}
+    for trace in traces:
+        stage_seconds: dict[str, float] = {}
+        for event in trace["traceEvents"]:
+            if event["ph"] == "X":
+                stage_seconds[event["name"]] = stage_seconds.get(event["name"], 0.0) + event["dur"] / 1.0e6
+
+        for name, seconds in stage_seconds.items():
+            stage_samples.setdefault(name, []).append(seconds)
+
+    return {name: statistics.median(samples) for name, samples in stage_samples.items()}
+
+
+def get_commit() -> tuple[str, bool]:
+    """The commit of this checkout, and whether it has uncommitted changes."""
+
+    def git(*args) -> str:
+        return subprocess.run(
+            ["git", *args], cwd=REPOSITORY_DIRECTORY, capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+    try:
+        return git("rev-parse", "--short", "HEAD"), bool(git("status", "--porcelain", "--untracked-files=no"))
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def write_results(suite: str, results: list[BenchmarkResult], output_path: str = "", blender_version: str = "") -> str:
+    """Write results to output_path, by default results/<suite>-<commit>.json. Returns the written path."""
+
+    commit, dirty = get_commit()
+    output_path = output_path or os.path.join(RESULTS_DIRECTORY, f"{suite}-{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    report = {
+        "suite": suite,
+        "commit": commit,
+        "dirty": dirty,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "blender": blender_version,
+        "benchmarks": [{**asdict(result), "median": result.median} for result in results],
+    }
+
+    with open(output_path, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+
+    return output_path
+
+
+def print_result(result: BenchmarkResult):
+    params = ", ".join(f"{name}={value}" for name, value in result.params.items())
+    print(f"{result.name:<28} {result.scene:<8} {result.median * 1000.0:>10.2f} ms  ({params})")
+    for stage, seconds in result.stages.items():
+        print(f"{'':<38}{seconds * 1000.0:>10.2f} ms  {stage}")
+
+
+def make_synthetic_model(iqm_format, size: SceneSize):
+    """Build an IQMModel like one exported from a synthetic scene of the given size, without Blender.
+    The bones form chains of 10 under a single root, and every action rotates every bone.
+    """
+
+    rng = np.random.default_rng(0)
+    model = iqm_format.IQMModel()
+    vertex_count = size.vertices
+    model.num_vertexes = vertex_count
+
+    positions = rng.uniform(-1.0, 1.0, (vertex_count, 3)).astype(np.float32)
+    normals = positions / np.linalg.norm(positions, axis=1, keepdims=True)
+    model.vertex_arrays = [
+        iqm_format.VertexArray(iqm_format.IQM_POSITION, iqm_format.IQM_FLOAT, 3, positions),
+        iqm_format.VertexArray(iqm_format.IQM_NORMAL, iqm_format.IQM_FLOAT, 3, normals.astype(np.float32)),
+        iqm_format.VertexArray(iqm_format.IQM_TEXCOORD, iqm_format.IQM_FLOAT, 2, positions[:, :2].copy()),
+    ]
+
+    triangle_count = max(vertex_count - 2, 1)
+    first_vertexes = np.arange(triangle_count) % max(vertex_count - 2, 1)
+    model.triangles = (first_vertexes[:, np.newaxis] + np.arange(3)).astype(iqm_format.TRIANGLE_DTYPE)
+
+    model.meshes = np.zeros(1, iqm_format.MESH_DTYPE)
+    model.meshes[0] = (model.add_string("mesh"), model.add_string("material"), 0, vertex_count, 0, triangle_count)
+
+    joints = np.zeros(size.bones, iqm_format.JOINT_DTYPE)
+    for bone_index in range(size.bones):
+        parent = -1 if bone_index == 0 else (bone_index - 1 if bone_index % 10 else 0)
+        joints[bone_index] = (model.add_string(f"bone_{bone_index}"), parent, (0.0, 0.0, 1.0), (0.0, 0.0, 0.0, 1.0), (1.0, 1.0, 1.0))
+    model.joints = joints
+
+    poses = np.zeros(size.bones, iqm_format.POSE_DTYPE)
+    poses["parent"] = joints["parent"]
+    model.poses = poses
+
+    frame_count = size.actions * size.frames_per_action
+    angles = np.linspace(0.0, np.pi, frame_count)[:, np.newaxis] * rng.uniform(0.1, 1.0, size.bones)
+    values = np.zeros((frame_count, size.bones, iqm_format.POSE_CHANNELS))
+    values[:, :, 2] = 1.0
+    values[:, :, 5] = np.sin(angles / 2.0)
+    values[:, :, 6] = np.cos(angles / 2.0)
+    values[:, :, 7:10] = 1.0
+    iqm_format.encode_frames(model, values)
+
+    model.anims = np.zeros(size.actions, iqm_format.ANIM_DTYPE)
+    for action_index in range(size.actions):
+        model.anims[action_index] = (
+            model.add_string(f"action_{action_index}"),
+            action_index * size.frames_per_action,
+            size.frames_per_action,
+            24.0,
+            iqm_format.IQM_LOOP,
+        )
+
+    model.bounds = np.zeros(frame_count, iqm_format.BOUNDS_DTYPE)
+    model.bounds["bbmin"] = -1.0
+    model.bounds["bbmax"] = 1.0
+    model.bounds["xyradius"] = np.sqrt(2.0)
+    model.bounds["radius"] = np.sqrt(3.0)
+
+    return model
@@ -0,0 +1,54 @@
+# Compare two benchmark result files, for example the results of the main branch against the results of a change.
+#
+# Usage: python benchmarks/compare.py results/pure-abc1234.json results/pure-def5678.json [--threshold 0.1]
+#
+# Exits with 1 when any benchmark got slower than the threshold (10% by default), so it can gate CI.
+
+import argparse
+import json
+import sys
+
+
+def load_medians(results_path: str) -> tuple[dict, dict[tuple[str, str], float]]:
+    with open(results_path) as results_file:
+        report = json.load(results_file)
+
+    medians = {}
+    for benchmark in report["benchmarks"]:
+        medians[(benchmark["name"], benchmark["scene"])] = benchmark["median"]
+        for stage, seconds in benchmark.get("stages", {}).items():
+            medians[(f"{benchmark['name']}/{stage}", benchmark["scene"])] = seconds
+
+    return report, medians
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two IQM Export Pipeline benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    baseline_report, baseline = load_medians(args.baseline)
+    candidate_report, candidate = load_medians(args.candidate)
+    print(f"{baseline_report['commit']} -> {candidate_report['commit']}")
+
+    regressions = 0
+    for key in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[key], candidate[key]
+        change = (after - before) / before if before > 0 else 0.0
+        regressed = change > args.threshold
+        regressions += regressed
+
+        name, scene = key
+        marker = "  REGRESSION" if regressed else ""
+        print(f"{name:<40} {scene:<8} {before * 1000.0:>10.2f} ms -> {after * 1000.0:>10.2f} ms  {change:+7.1%}{marker}")
+
+    for name, scene in sorted(baseline.keys() ^ candidate.keys()):
+        print(f"{name:<40} {scene:<8} only in {'baseline' if (name, scene) in baseline else 'candidate'}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
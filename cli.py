@@ -0,0 +1,324 @@
+# Headless command-line builds driven by a manifest.
+#
+# Run the build inside a background Blender, without registering any of the add-on's UI classes:
+#   blender -b --python-expr "import importlib; importlib.import_module('iqm_export_pipeline.cli').run()" -- build.json
+# or, when Blender is available as the bpy Python module:
+#   python -m iqm_export_pipeline.cli build.json
+# (Replace iqm_export_pipeline with the name of the folder the add-on is installed in.)
+#
+# See the README for the manifest format. The exit code is 0 when every job was exported or skipped as unchanged,
+# 1 when any job or the packaging failed, and 2 when the manifest couldn't be read.
+
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+from dataclasses import asdict, replace
+import bpy
+from bpy.types import Scene
+from . import action_items_ui_list
+from . import iqm_export_pipeline
+from . import pk3_packaging
+from .batch_export import find_export_collections
+from .iqm_export_pipeline import (
+    VERTEX_FORMATS,
+    ExportJob,
+    ExportResult,
+    build_export_job,
+    build_lod_jobs,
+    find_limit_problems,
+    get_compression_tolerances,
+    run_export_job,
+    split_export_job,
+)
+from .lod_export import parse_lod_ratios
+from .pipeline_presets import find_preset, read_preset
+
+EXIT_SUCCESS: int = 0
+EXIT_EXPORT_FAILED: int = 1
+EXIT_INVALID_MANIFEST: int = 2
+
+# Options that can be given for the whole manifest, for a blend file, or for a single collection.
+JOB_OPTIONS: tuple[str, ...] = ("output_directory", "preset", "offset", "actions", "use_cache", "split_animations", "compress_animations", "compact_animations", "vertex_format", "report_changes", "lod_ratios")
+
+
+class ManifestError(Exception):
+    """Raised when a manifest, or one of its entries, can't be turned into export jobs."""
+
+
+class PackageError(Exception):
+    """Raised when the exported files can't be added to the archive of the manifest's package table."""
+
+
+def load_manifest(manifest_path: str) -> dict:
+    """Load a JSON or TOML manifest."""
+
+    try:
+        if manifest_path.lower().endswith(".toml"):
+            try:
+                import tomllib
+            except ImportError:
+                raise ManifestError("TOML manifests require Python 3.11 or newer, use a JSON manifest instead")
+
+            with open(manifest_path, "rb") as manifest_file:
+                manifest = tomllib.load(manifest_file)
+        else:
+            with open(manifest_path) as manifest_file:
+                manifest = json.load(manifest_file)
+
+    except (OSError, ValueError) as error:
+        raise ManifestError(f"Couldn't read the manifest {manifest_path}: {error}")
+
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("blend_files", []), list):
+        raise ManifestError("The manifest must be a table with a list of blend_files")
+
+    return manifest
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _pick_options(table: dict) -> dict:
+    return {option: table[option] for option in JOB_OPTIONS if option in table}
+
+
+def build_manifest_jobs(entry, options: dict, manifest_dir: str) -> list[ExportJob]:
+    """Build the ExportJobs of a collection entry, using the blend file's scene settings for any omitted option.
+    entry is either the name of a collection, or a table with a "collection" name and any job options.
+    """
+
+    if isinstance(entry, str):
+        entry = {"collection": entry}
+
+    options = {**options, **_pick_options(entry)}
+    collection = bpy.data.collections.get(entry.get("collection", ""))
+    if not collection:
+        raise ManifestError(f"The collection '{entry.get('collection')}' doesn't exist in {bpy.data.filepath}")
+
+    settings = bpy.context.scene.iqm_export_pipeline_settings
+    try:
+        job = build_export_job(settings, collection)
+    except AttributeError:
+        raise ManifestError(f"An item in the action list of '{collection.name}' has no action")
+
+    # The manifest options override the job built from the scene settings.
+    overrides = {"use_cache": bool(options.get("use_cache", True))}
+
+    file_directory = os.path.dirname(job.filepath)
+    if "output_directory" in options:
+        file_directory = os.path.abspath(os.path.join(manifest_dir, options["output_directory"]))
+    file_name = entry.get("file_name") or collection.iqm_export_pipeline_file_name
+    overrides["filepath"] = os.path.join(file_directory, file_name + ".iqm")
+
+    actions = options.get("actions")
+    if isinstance(actions, list):
+        overrides["animspecs"] = ", ".join(actions)
+    elif actions is not None:
+        overrides["animspecs"] = str(actions)
+
+    if "preset" in options:
+        try:
+            overrides.update(read_preset(find_preset(options["preset"])))
+        except (OSError, SyntaxError, ValueError) as error:
+            raise ManifestError(f"Couldn't read the preset '{options['preset']}': {error}")
+    if not isinstance(options.get("offset", {}), dict):
+        raise ManifestError("offset must be a table with a location, rotation and/or scale")
+    for key, value in options.get("offset", {}).items():
+        if key not in {"location", "rotation", "scale"}:
+            raise ManifestError(f"Unknown offset '{key}', expected location, rotation or scale")
+        # Rotations are XYZ Euler angles, so every offset is 3 numbers.
+        if not isinstance(value, list) or len(value) != 3 or not all(_is_number(number) for number in value):
+            raise ManifestError(f"The {key} offset must be a list of 3 numbers, got {value!r}")
+        overrides["offset_" + key] = tuple(float(number) for number in value)
+
+    # Animations are compressed with the tolerances saved in the blend file.
+    tolerances = get_compression_tolerances(settings)
+    if "compress_animations" in options:
+        overrides["compression_tolerances"] = tolerances if options["compress_animations"] else ()
+    if "compact_animations" in options:
+        overrides["compact_tolerances"] = tolerances if options["compact_animations"] else ()
+    if "vertex_format" in options:
+        overrides["vertex_format"] = options["vertex_format"]
+    if "report_changes" in options:
+        overrides["report_changes"] = bool(options["report_changes"])
+
+    job = replace(job, **overrides)
+
+    if job.vertex_format not in {identifier for identifier, _, _ in VERTEX_FORMATS}:
+        raise ManifestError(f"Unknown vertex_format '{job.vertex_format}', expected FLOAT, HALF or FIXED")
+
+    lod_ratios = options.get("lod_ratios", settings.lod_ratios)
+    try:
+        if isinstance(lod_ratios, list):
+            lod_ratios = ", ".join(str(ratio) for ratio in lod_ratios)
+        lod_jobs = build_lod_jobs(job, parse_lod_ratios(lod_ratios))
+    except ValueError as error:
+        raise ManifestError(str(error))
+
+    split_animations = options.get("split_animations", settings.animation_export_mode == "split")
+    if split_animations and job.animspecs:
+        try:
+            return split_export_job(job) + lod_jobs
+        except ValueError as error:
+            raise ManifestError(str(error))
+
+    return [job] + lod_jobs
+
+
+def run_blend_file(blend_entry: dict, options: dict, manifest_dir: str, allow_cache: bool = True) -> list[dict]:
+    """Open a blend file from the manifest and run all of its jobs. allow_cache=False exports every job."""
+
+    if "path" in blend_entry:
+        blend_filepath = os.path.abspath(os.path.join(manifest_dir, blend_entry["path"]))
+        if os.path.normcase(blend_filepath) != os.path.normcase(bpy.data.filepath):
+            try:
+                bpy.ops.wm.open_mainfile(filepath=blend_filepath)
+            except RuntimeError as error:
+                # A missing or corrupt blend file fails its own entry, and the build goes on with the next one.
+                result = ExportResult(collection="", filepath="", status="failed", error=f"Couldn't open {blend_filepath}: {error}")
+                print(result.error)
+                return [{"blend": blend_filepath, **asdict(result)}]
+
+    options = {**options, **_pick_options(blend_entry)}
+    entries = blend_entry.get("collections")
+    if entries is None:
+        # Without a list of collections, export every collection that has been given a file name.
+        entries = [collection.name for collection in find_export_collections()]
+
+    results: list[dict] = []
+    for entry in entries:
+        try:
+            jobs = build_manifest_jobs(entry, options, manifest_dir)
+        except ManifestError as error:
+            name = entry if isinstance(entry, str) else str(entry.get("collection"))
+            jobs = []
+            entry_results = [ExportResult(collection=name, filepath="", status="failed", error=str(error))]
+        else:
+            entry_results = []
+
+            # Fail before sampling any animations if the collection is over the engine limits.
+            if jobs:
+                settings = bpy.context.scene.iqm_export_pipeline_settings
+                problems = find_limit_problems(settings, bpy.data.collections[jobs[0].collection], jobs)
+                if problems:
+                    entry_results = [ExportResult(collection=jobs[0].collection, filepath="", status="failed", error="\n".join(problems))]
+                    jobs = []
+
+        for job in jobs:
+            job.use_cache = job.use_cache and allow_cache
+            entry_results.append(run_export_job(bpy.context, job))
+
+        for result in entry_results:
+            print(f"{result.collection} -> {os.path.basename(result.filepath)}: {result.status} ({result.seconds:.2f}s)")
+            if result.status == "failed":
+                print(result.error)
+            elif result.change_summary:
+                print(result.change_summary)
+
+            results.append({"blend": bpy.data.filepath, **asdict(result)})
+
+    return results
+
+
+def package_manifest_results(package: dict, results: list[dict], manifest_dir: str) -> str:
+    """Add the exported and up-to-date files of results to the archive described by the manifest's package table.
+    Returns a summary of the update.
+    """
+
+    if not isinstance(package, dict) or "path" not in package:
+        raise ManifestError("package must be a table with the path of the archive")
+
+    prefix = package.get("prefix", "models/")
+    files = {
+        prefix + os.path.basename(result["filepath"]): result["filepath"]
+        for result in results
+        if result["status"] in {"exported", "skipped"}
+    }
+
+    archive_path = os.path.join(manifest_dir, package["path"])
+    try:
+        return str(pk3_packaging.update_archive(archive_path, files, int(package.get("compression_level", 6))))
+    except (OSError, zipfile.BadZipFile) as error:
+        raise PackageError(f"Couldn't update the package {archive_path}: {error}")
+
+
+def ensure_properties_registered():
+    """Register the add-on's data properties (but none of its UI) unless the add-on is already enabled."""
+
+    if "iqm_export_pipeline_settings" not in Scene.bl_rna.properties:
+        iqm_export_pipeline.register_properties()
+        action_items_ui_list.register_properties()
+
+
+def main(argv: list[str] = None) -> int:
+    if argv is None:
+        # Blender passes the script's own arguments after "--".
+        argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else sys.argv[1:]
+
+    parser = argparse.ArgumentParser(prog="iqm_export_pipeline.cli", description="Build IQM files from a manifest.")
+    parser.add_argument("manifest", help="path of a JSON or TOML manifest")
+    parser.add_argument("--results", help="write the results of every job to this JSON file")
+    parser.add_argument("--no-cache", action="store_true", help="export every collection, even if it is unchanged")
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    manifest_dir = os.path.dirname(os.path.abspath(args.manifest))
+    results: list[dict] = []
+
+    try:
+        manifest = load_manifest(args.manifest)
+        ensure_properties_registered()
+
+        options = _pick_options(manifest)
+
+        # A manifest without blend files builds the file Blender was started with.
+        for blend_entry in manifest.get("blend_files") or [{}]:
+            if not isinstance(blend_entry, dict):
+                raise ManifestError("Each entry of blend_files must be a table")
+            results += run_blend_file(blend_entry, options, manifest_dir, allow_cache=not args.no_cache)
+
+        exit_code = EXIT_EXPORT_FAILED if any(result["status"] == "failed" for result in results) else EXIT_SUCCESS
+        error = ""
+
+        # Only package complete builds, so the archive never mixes new files with the old files they were built with.
+        if "package" in manifest and exit_code == EXIT_SUCCESS:
+            print(package_manifest_results(manifest["package"], results, manifest_dir))
+
+    except ManifestError as manifest_error:
+        exit_code = EXIT_INVALID_MANIFEST
+        error = str(manifest_error)
+        print(error, file=sys.stderr)
+
+    except PackageError as package_error:
+        # The files were exported, but the build isn't complete without its archive.
+        exit_code = EXIT_EXPORT_FAILED
+        error = str(package_error)
+        print(error, file=sys.stderr)
+
+    summary = {
+        "manifest": os.path.abspath(args.manifest),
+        "exit_code": exit_code,
+        "error": error,
+        "wall_seconds": time.perf_counter() - start_time,
+        "results": results,
+    }
+
+    if args.results:
+        with open(args.results, "w") as results_file:
+            json.dump(summary, results_file, indent=4)
+
+    print(json.dumps(summary))
+    return exit_code
+
+
+def run():
+    """Run main() and exit with its exit code, for use with blender --python-expr."""
+
+    sys.exit(main())
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,413 @@
+# Compact output format: quantized vertex attributes and 8-bit animation channels, and a zero-copy reader for them.
+#
+# Exported files store vertex attributes as 32-bit floats and animation channels as 16-bit values. For streaming,
+# smaller files load faster, so this stage can quantize them further:
+# - "HALF" stores positions and texture coordinates as half floats, and normals and tangents as normalized signed
+#   bytes. These are standard IQM vertex formats, so any loader that supports them can read the file.
+# - "FIXED" also stores positions as normalized signed shorts within the bounds of the model, which is more precise
+#   than half floats for large models. The offset and scale to decode them are stored in the IQM_QUANTIZED_POSITIONS
+#   extension (6 floats: offset x, y, z, then scale x, y, z).
+# - Compact animations store every channel whose error stays within tolerance in 8 bits instead of 16, in the
+#   IQM_COMPACT_FRAMES extension. The regular frame data is then left empty, and the poses hold the first frame, so
+#   loaders that don't know the extension show a still model instead of reading garbage.
+#
+# The IQM_COMPACT_FRAMES extension is laid out as:
+# - A header of 4 little-endian uint32: version, number of frames, number of 8-bit and of 16-bit channels per frame.
+# - One COMPACT_POSE_DTYPE record per pose: the mask of animated channels, the mask of those stored in 8 bits, and the
+#   offset and scale of each channel (value = offset + stored * scale).
+# - The 8-bit channels of every frame, padded to 2 bytes, then the 16-bit channels of every frame. The channels of a
+#   frame are in the order of their pose, then of their channel, like the regular frame data.
+#
+# MappedIQM reads both the default and the compact format through lazy, memory mapped NumPy views, so reading a file
+# only copies the data that's decoded.
+#
+# This module doesn't depend on bpy, so it can also be used by tools that run outside of Blender.
+
+import mmap
+import struct
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+
+if __package__:
+    from .iqm_format import (
+        ANIM_DTYPE, BOUNDS_DTYPE, CHANNEL_EPSILON, EXTENSION_STRUCT, FORMAT_DTYPES, FRAME_DTYPE, IQM_BYTE, IQM_FLOAT, IQM_HALF,
+        IQM_NORMAL, IQM_POSITION, IQM_SHORT, IQM_TANGENT, IQM_TEXCOORD, JOINT_DTYPE, MESH_DTYPE, POSE_CHANNELS, POSE_DTYPE,
+        TRIANGLE_DTYPE, VERTEXARRAY_DTYPE, Extension, IQMFormatError, IQMModel, VertexArray, decode_frames, parse_header,
+        pose_channel_columns,
+    )
+else:
+    from iqm_format import (
+        ANIM_DTYPE, BOUNDS_DTYPE, CHANNEL_EPSILON, EXTENSION_STRUCT, FORMAT_DTYPES, FRAME_DTYPE, IQM_BYTE, IQM_FLOAT, IQM_HALF,
+        IQM_NORMAL, IQM_POSITION, IQM_SHORT, IQM_TANGENT, IQM_TEXCOORD, JOINT_DTYPE, MESH_DTYPE, POSE_CHANNELS, POSE_DTYPE,
+        TRIANGLE_DTYPE, VERTEXARRAY_DTYPE, Extension, IQMFormatError, IQMModel, VertexArray, decode_frames, parse_header,
+        pose_channel_columns,
+    )
+
+QUANTIZED_POSITIONS_EXTENSION: str = "IQM_QUANTIZED_POSITIONS"
+COMPACT_FRAMES_EXTENSION: str = "IQM_COMPACT_FRAMES"
+COMPACT_FRAMES_VERSION: int = 1
+
+COMPACT_FRAMES_HEADER = struct.Struct("<4I")
+COMPACT_POSE_DTYPE = np.dtype(
+    [
+        ("channelmask", "<u4"),
+        ("channelmask8", "<u4"),
+        ("channeloffset", "<f4", POSE_CHANNELS),
+        ("channelscale", "<f4", POSE_CHANNELS),
+    ]
+)
+POSITIONS_QUANTIZATION_DTYPE = np.dtype([("offset", "<f4", 3), ("scale", "<f4", 3)])
+
+# The largest value of the normalized integer formats.
+BYTE_MAX: int = 127
+SHORT_MAX: int = 32767
+
+
+@dataclass
+class CompactReport:
+    section: str
+    bytes_before: int
+    bytes_after: int
+    max_error: float
+
+    def __str__(self) -> str:
+        saved = 1.0 - self.bytes_after / self.bytes_before if self.bytes_before else 0.0
+        return f"{self.section}: {self.bytes_before:,} -> {self.bytes_after:,} bytes ({saved:.0%} smaller), largest error {self.max_error:.6f}"
+
+
+def _set_extension(model: IQMModel, name: str, data: bytes):
+    """Add the extension called name to model, replacing any previous one."""
+
+    name_offset = model.add_string(name)
+    model.extensions = [extension for extension in model.extensions if extension.name != name_offset]
+    model.extensions.append(Extension(name=name_offset, data=data))
+
+
+def _quantize_normalized(data: np.ndarray, maximum: int, dtype) -> np.ndarray:
+    return np.clip(np.rint(data * maximum), -maximum, maximum).astype(dtype)
+
+
+def quantize_vertices(model: IQMModel, vertex_format: str) -> CompactReport | None:
+    """Store the float vertex arrays of model in vertex_format ("HALF" or "FIXED"). Returns the size of the vertex
+    arrays before and after, and the largest position error, or None if nothing was quantized.
+    """
+
+    if vertex_format == "FLOAT" or not model.num_vertexes:
+        return None
+
+    bytes_before = sum(vertex_array.data.nbytes for vertex_array in model.vertex_arrays)
+    max_error = 0.0
+
+    for vertex_array in model.vertex_arrays:
+        if vertex_array.format != IQM_FLOAT:
+            continue
+
+        data = vertex_array.data.astype(np.float64)
+        if vertex_array.type == IQM_POSITION and vertex_format == "FIXED":
+            minimums, maximums = data.min(axis=0), data.max(axis=0)
+            offset = (minimums + maximums) / 2.0
+            scale = np.maximum((maximums - minimums) / 2.0, CHANNEL_EPSILON) / SHORT_MAX
+            vertex_array.data = _quantize_normalized((data - offset) / (scale * SHORT_MAX), SHORT_MAX, FORMAT_DTYPES[IQM_SHORT])
+            vertex_array.format = IQM_SHORT
+
+            quantization = np.array([(offset, scale)], POSITIONS_QUANTIZATION_DTYPE)
+            _set_extension(model, QUANTIZED_POSITIONS_EXTENSION, quantization.tobytes())
+            decoded = vertex_array.data * quantization["scale"][0].astype(np.float64) + quantization["offset"][0]
+            max_error = max(max_error, float(np.abs(decoded - data).max()))
+        elif vertex_array.type in (IQM_POSITION, IQM_TEXCOORD):
+            vertex_array.data = data.astype(FORMAT_DTYPES[IQM_HALF])
+            vertex_array.format = IQM_HALF
+            if vertex_array.type == IQM_POSITION:
+                max_error = max(max_error, float(np.abs(vertex_array.data.astype(np.float64) - data).max()))
+        elif vertex_array.type in (IQM_NORMAL, IQM_TANGENT):
+            vertex_array.data = _quantize_normalized(data, BYTE_MAX, FORMAT_DTYPES[IQM_BYTE])
+            vertex_array.format = IQM_BYTE
+
+    return CompactReport(
+        section="vertices",
+        bytes_before=bytes_before,
+        bytes_after=sum(vertex_array.data.nbytes for vertex_array in model.vertex_arrays),
+        max_error=max_error,
+    )
+
+
+def quantize_frames(model: IQMModel, tolerances: np.ndarray) -> CompactReport | None:
+    """Move the frame data of model into the IQM_COMPACT_FRAMES extension, storing the channels whose error stays
+    within tolerances (per pose channel, see animation_compression.channel_tolerances) in 8 bits.
+    Returns the size of the frame data before and after, or None if model has no animated channels.
+    """
+
+    if not model.frames.size:
+        return None
+
+    values = decode_frames(model)
+    num_frames = len(values)
+    minimums, maximums = values.min(axis=0), values.max(axis=0)
+    ranges = maximums - minimums
+    animated = ranges >= CHANNEL_EPSILON
+    # Rounding to the nearest of 256 steps is off by at most half a step.
+    eight_bit = animated & (ranges / 255.0 / 2.0 <= tolerances)
+
+    channel_bits = 1 << np.arange(POSE_CHANNELS)
+    poses = np.zeros(len(model.poses), COMPACT_POSE_DTYPE)
+    poses["channelmask"] = (animated * channel_bits).sum(axis=1)
+    poses["channelmask8"] = (eight_bit * channel_bits).sum(axis=1)
+    poses["channeloffset"] = minimums
+    poses["channelscale"] = np.where(eight_bit, ranges / 255.0, np.where(animated, ranges / 65535.0, 0.0))
+
+    blocks = []
+    max_error = 0.0
+    for mask, bits, dtype in (("channelmask8", 255, np.uint8), (None, 65535, FRAME_DTYPE)):
+        columns = _compact_columns(poses, mask)
+        block = np.zeros((num_frames, len(columns)), dtype)
+        if columns:
+            pose_indices, channels = (np.array(indices) for indices in zip(*columns))
+            offsets = poses["channeloffset"][pose_indices, channels].astype(np.float64)
+            scales = poses["channelscale"][pose_indices, channels].astype(np.float64)
+            block[:] = np.clip(np.rint((values[:, pose_indices, channels] - offsets) / scales), 0, bits)
+            max_error = max(max_error, float(np.abs(offsets + block * scales - values[:, pose_indices, channels]).max()))
+        blocks.append(block)
+
+    frames8, frames16 = blocks
+    data = bytearray(COMPACT_FRAMES_HEADER.pack(COMPACT_FRAMES_VERSION, num_frames, frames8.shape[1], frames16.shape[1]))
+    data += poses.tobytes()
+    data += frames8.tobytes()
+    data += bytes(len(data) % 2)
+    data += frames16.tobytes()
+
+    bytes_before = model.frames.nbytes
+    _set_extension(model, COMPACT_FRAMES_EXTENSION, bytes(data))
+
+    # Loaders that don't read the extension see every pose hold its first frame.
+    model.poses = model.poses.copy()
+    model.poses["channelmask"] = 0
+    model.poses["channeloffset"] = values[0]
+    model.poses["channelscale"] = 0.0
+    model.frames = np.zeros((num_frames, 0), FRAME_DTYPE)
+
+    return CompactReport(section="animations", bytes_before=bytes_before, bytes_after=len(data), max_error=max_error)
+
+
+def _compact_columns(poses: np.ndarray, mask: str | None) -> list[tuple[int, int]]:
+    """The (pose, channel) of each column of the 8-bit (mask="channelmask8") or 16-bit (mask=None) frame block."""
+
+    return [
+        (pose_index, channel)
+        for pose_index, channel in pose_channel_columns(poses)
+        if bool(poses[pose_index]["channelmask8"] & (1 << channel)) == (mask is not None)
+    ]
+
+
+class MappedIQM:
+    """Read-only NumPy views of the sections of an IQM file, without copying them. Each section is only looked up
+    the first time it's used, so reading a few sections of a large file doesn't touch the others.
+    """
+
+    # The sections that are looked up lazily, and released by close().
+    SECTIONS: tuple[str, ...] = (
+        "text", "meshes", "vertex_arrays", "triangles", "adjacency", "joints", "poses", "anims", "frames", "bounds", "comment", "extensions",
+        "frame_layout",
+    )
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.header = parse_header(buffer)
+        self.num_vertexes = self.header["num_vertexes"]
+
+    def _view(self, offset: int, count: int, dtype) -> np.ndarray:
+        if self.buffer is None:
+            raise ValueError("The IQM file is closed")
+
+        dtype = np.dtype(dtype)
+        if offset + count * dtype.itemsize > len(self.buffer):
+            raise IQMFormatError("A section extends past the end of the file")
+        return np.frombuffer(self.buffer, dtype=dtype, count=count, offset=offset)
+
+    @cached_property
+    def text(self) -> bytes:
+        # Strings are looked up often and the text section is small, so it's the one section that's copied.
+        return self._view(self.header["ofs_text"], self.header["num_text"], np.uint8).tobytes()
+
+    @cached_property
+    def meshes(self) -> np.ndarray:
+        return self._view(self.header["ofs_meshes"], self.header["num_meshes"], MESH_DTYPE)
+
+    @cached_property
+    def vertex_arrays(self) -> list[VertexArray]:
+        vertex_arrays = []
+        for vertex_array in self._view(self.header["ofs_vertexarrays"], self.header["num_vertexarrays"], VERTEXARRAY_DTYPE):
+            dtype = FORMAT_DTYPES.get(int(vertex_array["format"]))
+            if dtype is None:
+                raise IQMFormatError(f"Unknown vertex array format {vertex_array['format']}")
+
+            size = int(vertex_array["size"])
+            data = self._view(int(vertex_array["offset"]), self.num_vertexes * size, dtype).reshape(self.num_vertexes, size)
+            vertex_arrays.append(VertexArray(int(vertex_array["type"]), int(vertex_array["format"]), size, data, int(vertex_array["flags"])))
+
+        return vertex_arrays
+
+    @cached_property
+    def triangles(self) -> np.ndarray:
+        return self._view(self.header["ofs_triangles"], self.header["num_triangles"] * 3, TRIANGLE_DTYPE).reshape(-1, 3)
+
+    @cached_property
+    def adjacency(self) -> np.ndarray:
+        if not self.header["ofs_adjacency"]:
+            return None
+        return self._view(self.header["ofs_adjacency"], self.header["num_triangles"] * 3, TRIANGLE_DTYPE).reshape(-1, 3)
+
+    @cached_property
+    def joints(self) -> np.ndarray:
+        return self._view(self.header["ofs_joints"], self.header["num_joints"], JOINT_DTYPE)
+
+    @cached_property
+    def poses(self) -> np.ndarray:
+        return self._view(self.header["ofs_poses"], self.header["num_poses"], POSE_DTYPE)
+
+    @cached_property
+    def anims(self) -> np.ndarray:
+        return self._view(self.header["ofs_anims"], self.header["num_anims"], ANIM_DTYPE)
+
+    @cached_property
+    def frames(self) -> np.ndarray:
+        num_frames, num_framechannels = self.header["num_frames"], self.header["num_framechannels"]
+        return self._view(self.header["ofs_frames"], num_frames * num_framechannels, FRAME_DTYPE).reshape(num_frames, num_framechannels)
+
+    @cached_property
+    def bounds(self) -> np.ndarray:
+        if not self.header["ofs_bounds"]:
+            return None
+        return self._view(self.header["ofs_bounds"], self.header["num_frames"], BOUNDS_DTYPE)
+
+    @cached_property
+    def comment(self) -> bytes:
+        return self._view(self.header["ofs_comment"], self.header["num_comment"], np.uint8).tobytes()
+
+    @cached_property
+    def extensions(self) -> dict[str, memoryview]:
+        """The data of each extension, by name."""
+
+        extensions = {}
+        # Extensions form a linked list.
+        ofs_extension = self.header["ofs_extensions"]
+        for _ in range(self.header["num_extensions"]):
+            if not ofs_extension:
+                break
+            name, num_data, ofs_data, ofs_extension = EXTENSION_STRUCT.unpack_from(self.buffer, ofs_extension)
+            extensions[self.get_string(name)] = memoryview(self._view(ofs_data, num_data, np.uint8))
+
+        return extensions
+
+    def get_string(self, offset: int) -> str:
+        """Read a null-terminated string from the text section."""
+
+        end = self.text.index(b"\0", offset)
+        return self.text[offset:end].decode("utf-8", errors="replace")
+
+    def find_vertex_array(self, array_type: int) -> VertexArray:
+        """Find the first vertex array of array_type, or None if there isn't one."""
+
+        return next((vertex_array for vertex_array in self.vertex_arrays if vertex_array.type == array_type), None)
+
+    def decode_vertex_array(self, array_type: int) -> np.ndarray:
+        """The values of the first vertex array of array_type as 32-bit floats, or None if there isn't one.
+        Fixed point positions, and normals and tangents stored as integers, are converted back to their values.
+        """
+
+        vertex_array = self.find_vertex_array(array_type)
+        if vertex_array is None:
+            return None
+
+        data = vertex_array.data
+        quantization = self.extensions.get(QUANTIZED_POSITIONS_EXTENSION)
+        if array_type == IQM_POSITION and vertex_array.format == IQM_SHORT and quantization is not None:
+            quantization = np.frombuffer(quantization, POSITIONS_QUANTIZATION_DTYPE, count=1)[0]
+            return data * quantization["scale"] + quantization["offset"]
+
+        if array_type in (IQM_NORMAL, IQM_TANGENT) and vertex_array.format in (IQM_BYTE, IQM_SHORT):
+            return data * np.float32(1.0 / (BYTE_MAX if vertex_array.format == IQM_BYTE else SHORT_MAX))
+
+        return data.astype(np.float32)
+
+    @cached_property
+    def frame_layout(self) -> tuple[np.ndarray, list[tuple[np.ndarray, np.ndarray, np.ndarray]]]:
+        """The poses that decode the frame data (the ones of the IQM_COMPACT_FRAMES extension if there is one), and
+        each block of frame data as (frames, poses of its columns, channels of its columns).
+        """
+
+        compact_frames = self.extensions.get(COMPACT_FRAMES_EXTENSION)
+        if compact_frames is None:
+            blocks = [(self.frames, pose_channel_columns(self.poses))]
+            poses = self.poses
+        else:
+            version, num_frames, num_channels8, num_channels16 = COMPACT_FRAMES_HEADER.unpack_from(compact_frames)
+            if version != COMPACT_FRAMES_VERSION:
+                raise IQMFormatError(f"Unsupported {COMPACT_FRAMES_EXTENSION} version {version}")
+
+            offset = COMPACT_FRAMES_HEADER.size
+            poses = np.frombuffer(compact_frames, COMPACT_POSE_DTYPE, count=len(self.poses), offset=offset)
+            offset += poses.nbytes
+            frames8 = np.frombuffer(compact_frames, np.uint8, count=num_frames * num_channels8, offset=offset)
+            offset += frames8.nbytes + frames8.nbytes % 2
+            frames16 = np.frombuffer(compact_frames, FRAME_DTYPE, count=num_frames * num_channels16, offset=offset)
+            blocks = [
+                (frames8.reshape(num_frames, num_channels8), _compact_columns(poses, "channelmask8")),
+                (frames16.reshape(num_frames, num_channels16), _compact_columns(poses, None)),
+            ]
+
+        layout = []
+        for frames, columns in blocks:
+            pose_indices = np.array([pose_index for pose_index, _ in columns], dtype=np.int64)
+            channels = np.array([channel for _, channel in columns], dtype=np.int64)
+            layout.append((frames, pose_indices, channels))
+
+        return poses, layout
+
+    def decode_frames(self, first_frame: int = 0, num_frames: int = None) -> np.ndarray:
+        """Decode num_frames frames (by default, every frame) from first_frame into an array of channel values, of
+        shape (frames, poses, POSE_CHANNELS).
+        """
+
+        poses, layout = self.frame_layout
+        end_frame = self.header["num_frames"] if num_frames is None else first_frame + num_frames
+
+        values = np.repeat(poses["channeloffset"][np.newaxis], max(end_frame - first_frame, 0), axis=0)
+        for frames, pose_indices, channels in layout:
+            if len(channels):
+                values[:, pose_indices, channels] += frames[first_frame:end_frame] * poses["channelscale"][pose_indices, channels]
+
+        return values
+
+    def close(self):
+        """Release the views of the file. Arrays taken from it keep the file mapped until they are released too."""
+
+        for section in self.SECTIONS:
+            self.__dict__.pop(section, None)
+        if isinstance(self.buffer, mmap.mmap):
+            try:
+                self.buffer.close()
+            except BufferError:
+                # Views of the file are still referenced, the mapping is closed once they're garbage collected.
+                pass
+        self.buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_iqm(filepath: str) -> MappedIQM:
+    """Memory map the IQM file at filepath for reading."""
+
+    with open(filepath, "rb") as iqm_file:
+        try:
+            buffer = mmap.mmap(iqm_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped.
+            raise IQMFormatError("The file is too small to be an IQM file") from None
+
+    return MappedIQM(buffer)
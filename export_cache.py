@@ -0,0 +1,270 @@
+import hashlib
+import importlib
+import json
+import os
+import time
+from array import array
+import bpy
+from . import export_validation
+from .action_items_ui_list import parse_animation_specs
+
+# Bump this whenever the fingerprint changes, so entries written by older versions are treated as stale.
+CACHE_FORMAT_VERSION: int = 3
+
+# The cache lives in a hidden directory beside the exported files.
+CACHE_DIRECTORY_NAME: str = ".iqm_export_cache"
+
+# Value key of each attribute data_type, as used by foreach_get.
+ATTRIBUTE_VALUE_KEYS: dict[str, str] = {
+    "FLOAT": "value",
+    "INT": "value",
+    "INT8": "value",
+    "BOOLEAN": "value",
+    "FLOAT2": "vector",
+    "FLOAT_VECTOR": "vector",
+    "FLOAT_COLOR": "color",
+    "BYTE_COLOR": "color",
+    "QUATERNION": "value",
+}
+
+
+def _hash_text(hasher, *values):
+    """Hash values as text. Each value is terminated so that ("ab", "c") and ("a", "bc") hash differently."""
+
+    for value in values:
+        hasher.update(str(value).encode())
+        hasher.update(b"\0")
+
+
+def _hash_foreach(hasher, collection, attribute: str, item_size: int = 1, typecode: str = "f"):
+    """Read attribute from every item of a bpy_prop_collection in bulk, and hash the raw buffer."""
+
+    values = array(typecode, [0]) * (len(collection) * item_size)
+    collection.foreach_get(attribute, values)
+    hasher.update(values.tobytes())
+
+
+def _hash_rna_properties(hasher, struct):
+    """Hash the value of every simple property of struct, such as the settings of a modifier or constraint."""
+
+    for prop in struct.bl_rna.properties:
+        if prop.identifier == "rna_type" or prop.type == "COLLECTION":
+            continue
+
+        value = getattr(struct, prop.identifier, None)
+
+        if prop.type == "POINTER":
+            # Only referenced datablocks affect the output, nested structs are skipped.
+            value = value.name if isinstance(value, bpy.types.ID) else None
+        elif isinstance(value, set):
+            value = sorted(value)
+        elif getattr(prop, "is_array", False):
+            value = [tuple(row) if hasattr(row, "__len__") else row for row in value]
+
+        _hash_text(hasher, prop.identifier, value)
+
+
+def _hash_mesh(hasher, mesh):
+    _hash_text(hasher, mesh.name, len(mesh.vertices), len(mesh.edges), len(mesh.polygons), len(mesh.loops))
+
+    _hash_foreach(hasher, mesh.vertices, "co", 3)
+    _hash_foreach(hasher, mesh.loops, "vertex_index", typecode="i")
+    _hash_foreach(hasher, mesh.polygons, "loop_start", typecode="i")
+    _hash_foreach(hasher, mesh.polygons, "loop_total", typecode="i")
+    _hash_foreach(hasher, mesh.polygons, "material_index", typecode="i")
+    _hash_foreach(hasher, mesh.polygons, "use_smooth", typecode="b")
+
+    # Generic attributes cover UV maps, colors, and any other data added by the user.
+    for attribute in mesh.attributes:
+        _hash_text(hasher, attribute.name, attribute.data_type, attribute.domain)
+        value_key = ATTRIBUTE_VALUE_KEYS.get(attribute.data_type)
+        if value_key and len(attribute.data):
+            item_size = len(getattr(attribute.data[0], value_key)) if value_key != "value" else 1
+            if attribute.data_type == "QUATERNION":
+                item_size = 4
+            typecode = "i" if attribute.data_type in {"INT", "INT8"} else "b" if attribute.data_type == "BOOLEAN" else "f"
+            _hash_foreach(hasher, attribute.data, value_key, item_size, typecode)
+
+    for material in mesh.materials:
+        _hash_text(hasher, material.name if material else None)
+
+
+def _hash_object(hasher, obj):
+    _hash_text(hasher, obj.name, obj.type, obj.parent.name if obj.parent else None, obj.parent_type, obj.parent_bone)
+    hasher.update(array("f", (value for row in obj.matrix_world for value in row)).tobytes())
+
+    for modifier in obj.modifiers:
+        _hash_text(hasher, "modifier")
+        _hash_rna_properties(hasher, modifier)
+
+    for vertex_group in obj.vertex_groups:
+        _hash_text(hasher, vertex_group.index, vertex_group.name)
+
+    if obj.type == "MESH":
+        _hash_mesh(hasher, obj.data)
+        # The weights are read again rather than taken from the export checks' cache, which relies on depsgraph updates
+        # that background runs or unregistered handlers never see, so a stale entry would hide a change.
+        for values in export_validation.read_vertex_weights(obj.data, use_cache=False):
+            hasher.update(values.tobytes())
+
+    elif obj.type == "ARMATURE":
+        armature = obj.data
+        _hash_text(hasher, armature.name, *(f"{bone.name}>{bone.parent.name if bone.parent else ''}" for bone in armature.bones))
+        _hash_foreach(hasher, armature.bones, "head_local", 3)
+        _hash_foreach(hasher, armature.bones, "tail_local", 3)
+        _hash_foreach(hasher, armature.bones, "matrix_local", 16)
+        _hash_foreach(hasher, armature.bones, "use_deform", typecode="b")
+
+        for pose_bone in obj.pose.bones:
+            _hash_text(hasher, pose_bone.name, pose_bone.rotation_mode)
+            for constraint in pose_bone.constraints:
+                _hash_rna_properties(hasher, constraint)
+
+
+def _hash_action(hasher, action):
+    _hash_text(hasher, action.name, tuple(action.frame_range))
+
+    for fcurve in action.fcurves:
+        _hash_text(hasher, fcurve.data_path, fcurve.array_index, fcurve.extrapolation, len(fcurve.modifiers))
+        keyframe_points = fcurve.keyframe_points
+        _hash_foreach(hasher, keyframe_points, "co", 2)
+        _hash_foreach(hasher, keyframe_points, "handle_left", 2)
+        _hash_foreach(hasher, keyframe_points, "handle_right", 2)
+        _hash_foreach(hasher, keyframe_points, "interpolation", typecode="i")
+
+
+def fingerprint_collection(export_collection, animspecs: str, offset_matrix, export_options: dict, include_meshes: bool = True) -> str:
+    """Hash everything that affects the output of exporting export_collection.
+    The fingerprint covers the mesh and armature data of every object in the collection, the actions named in
+    animspecs, the offset matrix, and the options passed to exportIQM.
+    Mesh objects are left out with include_meshes=False, so editing a mesh doesn't invalidate animation-only files.
+    """
+
+    hasher = hashlib.sha256()
+    _hash_text(hasher, CACHE_FORMAT_VERSION, animspecs, sorted(export_options.items()))
+    hasher.update(array("f", (value for row in offset_matrix for value in row)).tobytes())
+
+    # A new version of the exporter may write different files from the same data.
+    # The exporter is imported on the first export, import it here too so fingerprints don't depend on whether it was.
+    try:
+        exporter_module = importlib.import_module("iqm_export")
+    except ImportError:
+        exporter_module = None
+    _hash_text(hasher, getattr(exporter_module, "bl_info", {}).get("version"))
+
+    for obj in sorted(export_collection.all_objects, key=lambda obj: obj.name):
+        if include_meshes or obj.type != "MESH":
+            _hash_object(hasher, obj)
+
+    for spec in parse_animation_specs(animspecs):
+        action = bpy.data.actions.get(spec.name)
+        _hash_text(hasher, spec)
+        if action:
+            _hash_action(hasher, action)
+
+    # The fps of animations that don't specify one comes from the scene.
+    _hash_text(hasher, bpy.context.scene.render.fps, bpy.context.scene.render.fps_base)
+
+    return hasher.hexdigest()
+
+
+def _entry_path(filepath: str) -> str:
+    file_directory, file_name = os.path.split(filepath)
+    return os.path.join(file_directory, CACHE_DIRECTORY_NAME, file_name + ".json")
+
+
+def is_up_to_date(filepath: str, fingerprint: str) -> bool:
+    """Check if filepath was exported from data matching fingerprint, and hasn't been modified since."""
+
+    entry_path = _entry_path(filepath)
+
+    try:
+        with open(entry_path) as entry_file:
+            entry = json.load(entry_file)
+        output_stat = os.stat(filepath)
+    except (OSError, ValueError):
+        return False
+
+    up_to_date = (
+        entry.get("version") == CACHE_FORMAT_VERSION
+        and entry.get("fingerprint") == fingerprint
+        and entry.get("output_size") == output_stat.st_size
+        and entry.get("output_mtime_ns") == output_stat.st_mtime_ns
+    )
+
+    if up_to_date:
+        # The modification time of the entry records when it was last used, for least-recently-used eviction.
+        os.utime(entry_path)
+
+    return up_to_date
+
+
+def store(filepath: str, fingerprint: str):
+    """Record that filepath has just been exported from data matching fingerprint."""
+
+    entry_path = _entry_path(filepath)
+    os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+    output_stat = os.stat(filepath)
+
+    entry = {
+        "version": CACHE_FORMAT_VERSION,
+        "fingerprint": fingerprint,
+        "output_size": output_stat.st_size,
+        "output_mtime_ns": output_stat.st_mtime_ns,
+        "created": time.time(),
+    }
+
+    # Write to a temporary file first, so that parallel batch workers never see a partial entry.
+    temp_path = f"{entry_path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as entry_file:
+        json.dump(entry, entry_file)
+    os.replace(temp_path, entry_path)
+
+
+def invalidate(filepath: str):
+    """Forget the cache entry of filepath, if there is one."""
+
+    try:
+        os.remove(_entry_path(filepath))
+    except FileNotFoundError:
+        pass
+
+
+def evict(file_directory: str, max_entries: int, max_age_days: float) -> int:
+    """Remove entries whose output no longer exists, entries unused for more than max_age_days,
+    then the least recently used entries until at most max_entries remain. Returns the number of removed entries.
+    A limit of 0 disables that limit.
+    """
+
+    cache_directory = os.path.join(file_directory, CACHE_DIRECTORY_NAME)
+    if not os.path.isdir(cache_directory):
+        return 0
+
+    entries: list[tuple[float, str]] = []
+    expired: list[str] = []
+    oldest_allowed = time.time() - max_age_days * 86400.0
+
+    with os.scandir(cache_directory) as directory_entries:
+        for directory_entry in directory_entries:
+            if not directory_entry.name.endswith(".json"):
+                continue
+
+            last_used = directory_entry.stat().st_mtime
+            output_path = os.path.join(file_directory, directory_entry.name[: -len(".json")])
+
+            if not os.path.isfile(output_path) or (max_age_days > 0 and last_used < oldest_allowed):
+                expired.append(directory_entry.path)
+            else:
+                entries.append((last_used, directory_entry.path))
+
+    if max_entries > 0 and len(entries) > max_entries:
+        entries.sort()
+        expired += [entry_path for _, entry_path in entries[: len(entries) - max_entries]]
+
+    for entry_path in expired:
+        try:
+            os.remove(entry_path)
+        except FileNotFoundError:
+            pass
+
+    return len(expired)
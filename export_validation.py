@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+import bpy
+from bpy.app.handlers import persistent
+from .action_items_ui_list import parse_animation_specs
+
+# NumPy is imported by the checks themselves, on the first export, so registering the add-on doesn't wait for it.
+if TYPE_CHECKING:
+    import numpy as np
+
+# IQM stores the bone indexes of vertices as unsigned bytes, and at most 4 weights per vertex.
+IQM_MAX_BONES: int = 256
+IQM_MAX_WEIGHTS_PER_VERTEX: int = 4
+
+# Faces with a smaller area (in local units squared) can't be triangulated into visible triangles.
+DEGENERATE_FACE_AREA: float = 1e-12
+
+# Problems list at most this many of the offending vertices or faces.
+MAX_LISTED_INDEXES: int = 5
+
+# The vertex weights of each mesh, keyed by its session_uid, as (groups per vertex, group indexes, weights). Reading
+# weights is the slow part of the checks, so they're kept until the mesh is edited.
+_weights_cache: dict[int, tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+
+def _format_indexes(indexes: np.ndarray) -> str:
+    """List the first few indexes, such as "3, 7, 12 and 40 more"."""
+
+    listed = ", ".join(str(index) for index in indexes[:MAX_LISTED_INDEXES])
+    if len(indexes) > MAX_LISTED_INDEXES:
+        return f"{listed} and {len(indexes) - MAX_LISTED_INDEXES} more"
+
+    return listed
+
+
+def find_armature(export_collection):
+    """The first armature of export_collection, which is the one exportIQM exports."""
+
+    return next((obj for obj in export_collection.all_objects if obj.type == "ARMATURE"), None)
+
+
+def is_skinned(obj, armature) -> bool:
+    """Check if obj is deformed by armature, through an armature modifier or an armature parent."""
+
+    if obj.parent == armature and obj.parent_type == "ARMATURE":
+        return True
+
+    return any(modifier.type == "ARMATURE" and modifier.object == armature for modifier in obj.modifiers)
+
+
+def read_vertex_weights(mesh, use_cache: bool = True) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """The vertex weights of mesh, as the number of groups of each vertex, and the flat group indexes and weights.
+    use_cache=False reads the weights again even if they were read since the last edit Blender reported.
+    """
+
+    import numpy as np
+
+    cached_weights = _weights_cache.get(mesh.session_uid) if use_cache else None
+    if cached_weights is not None and len(cached_weights[0]) == len(mesh.vertices):
+        return cached_weights
+
+    # Blender has no bulk accessor for vertex weights, so they're the one thing read element by element.
+    vertex_groups = [vertex.groups for vertex in mesh.vertices]
+    elements = [element for groups in vertex_groups for element in groups]
+
+    group_counts = np.fromiter(map(len, vertex_groups), dtype=np.int32, count=len(vertex_groups))
+    groups = np.fromiter((element.group for element in elements), dtype=np.int32, count=len(elements))
+    weights = np.fromiter((element.weight for element in elements), dtype=np.float32, count=len(elements))
+
+    _weights_cache[mesh.session_uid] = (group_counts, groups, weights)
+    return group_counts, groups, weights
+
+
+def read_bone_weights(mesh, bone_group_mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """The number of non-zero bone weights of each vertex of mesh, and their sum. bone_group_mask tells which vertex
+    groups (by index) are named after a bone.
+    """
+
+    import numpy as np
+
+    group_counts, groups, weights = read_vertex_weights(mesh)
+    vertex_count = len(group_counts)
+    vertex_indexes = np.repeat(np.arange(vertex_count), group_counts)
+    is_bone_weight = (weights > 0.0) & bone_group_mask[groups]
+
+    counts = np.bincount(vertex_indexes[is_bone_weight], minlength=vertex_count)
+    totals = np.bincount(vertex_indexes[is_bone_weight], weights=weights[is_bone_weight], minlength=vertex_count)
+    return counts, totals
+
+
+def check_mesh(obj, armature, max_weights_per_vertex: int) -> list[str]:
+    """Check the faces and vertex weights of the mesh of obj."""
+
+    import numpy as np
+
+    problems = []
+    mesh = obj.data
+
+    area = np.empty(len(mesh.polygons), dtype=np.float32)
+    mesh.polygons.foreach_get("area", area)
+    degenerate_faces = np.flatnonzero(area <= DEGENERATE_FACE_AREA)
+    if len(degenerate_faces):
+        problems.append(f"{obj.name}: {len(degenerate_faces)} faces have no area and can't be triangulated (faces {_format_indexes(degenerate_faces)})")
+
+    if armature is None or not is_skinned(obj, armature):
+        return problems
+
+    bone_names = armature.data.bones.keys()
+    bone_group_mask = np.array([vertex_group.name in bone_names for vertex_group in obj.vertex_groups], dtype=bool)
+    counts, totals = read_bone_weights(mesh, bone_group_mask)
+
+    overweighted_vertices = np.flatnonzero(counts > max_weights_per_vertex)
+    if len(overweighted_vertices):
+        problems.append(
+            f"{obj.name}: {len(overweighted_vertices)} vertices have more than {max_weights_per_vertex} bone weights "
+            f"(vertices {_format_indexes(overweighted_vertices)})"
+        )
+
+    unweighted_vertices = np.flatnonzero(totals <= 0.0)
+    if len(unweighted_vertices):
+        problems.append(f"{obj.name}: {len(unweighted_vertices)} vertices have no bone weights (vertices {_format_indexes(unweighted_vertices)})")
+
+    return problems
+
+
+def check_animations(animspecs: str) -> list[str]:
+    """Check that the actions of animspecs exist, and that their frame ranges are within the keys of the actions."""
+
+    problems = []
+
+    try:
+        specs = parse_animation_specs(animspecs)
+    except ValueError as error:
+        return [str(error)]
+
+    for spec in specs:
+        action = bpy.data.actions.get(spec.name)
+        if action is None:
+            problems.append(f"The action '{spec.name}' doesn't exist")
+            continue
+
+        # frame_range is the manual frame range of the action when it has one, and the range of its keys otherwise.
+        action_start, action_end = action.frame_range
+        frame_start = action_start if spec.frame_start is None else spec.frame_start
+        frame_end = action_end if spec.frame_end is None else spec.frame_end
+        if frame_start > frame_end:
+            problems.append(f"The animation '{spec.name}' starts at frame {frame_start:g}, after it ends at frame {frame_end:g}")
+        elif frame_start < action_start or frame_end > action_end:
+            problems.append(
+                f"The animation '{spec.name}' samples frames {frame_start:g}-{frame_end:g}, "
+                f"outside the frames {action_start:g}-{action_end:g} of its action"
+            )
+
+    return problems
+
+
+def find_limit_problems(settings, export_collection, animspecs: str) -> list[str]:
+    """Check export_collection and animspecs against the engine limits of the pipeline settings before exporting.
+    Meshes are read in bulk into arrays, so this takes a fraction of the time exportIQM would take to run into the
+    same problems.
+    """
+
+    problems = []
+    max_bones = min(settings.max_bones, IQM_MAX_BONES)
+    max_weights_per_vertex = min(settings.max_weights_per_vertex, IQM_MAX_WEIGHTS_PER_VERTEX)
+
+    armature = find_armature(export_collection)
+    if armature and len(armature.data.bones) > max_bones:
+        problems.append(f"{armature.name}: {len(armature.data.bones)} bones, more than the limit of {max_bones}")
+
+    # The meshes are checked without their modifiers, so the reported indexes match the vertices and faces to fix.
+    for obj in export_collection.all_objects:
+        if obj.type == "MESH":
+            problems += check_mesh(obj, armature, max_weights_per_vertex)
+
+    problems += check_animations(animspecs)
+    return problems
+
+
+@persistent
+def _depsgraph_update_post(scene, depsgraph):
+    if not depsgraph.id_type_updated("MESH"):
+        return
+
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Mesh):
+            _weights_cache.pop(update.id.original.session_uid, None)
+
+
+@persistent
+def _clear(*args):
+    _weights_cache.clear()
+
+
+handlers = [
+    (bpy.app.handlers.depsgraph_update_post, _depsgraph_update_post),
+    (bpy.app.handlers.load_post, _clear),
+    (bpy.app.handlers.undo_post, _clear),
+    (bpy.app.handlers.redo_post, _clear),
+]
+
+
+def register():
+    for handler_list, handler in handlers:
+        handler_list.append(handler)
+
+
+def unregister():
+    for handler_list, handler in handlers:
+        if handler in handler_list:
+            handler_list.remove(handler)
+
+    _clear()
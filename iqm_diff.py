@@ -0,0 +1,328 @@
+# Structural diff of two IQM files, to check an export and see what changed from the previous build without
+# importing either file into Blender.
+#
+# Usage: python iqm_diff.py OLD.iqm NEW.iqm [--tolerance 0.0001] [--json]
+#
+# Reports the changed header counts, meshes (by name), joints (by name), vertex arrays, animations (by name, down to
+# the frames whose poses moved more than the tolerance) and the size of each section. Files are read through
+# compact_format.open_iqm, so only the compared sections are read, and both the default and compact formats work.
+# The exit code is 0 when the files match within the tolerance, 1 when they differ, and 2 when a file can't be read.
+#
+# This module doesn't depend on bpy, so it can also be used by tools that run outside of Blender.
+
+import argparse
+import json
+import sys
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+
+if __package__:
+    from . import compact_format
+    from .iqm_format import HEADER_STRUCT, IQM_LOOP, IQMFormatError
+else:
+    import compact_format
+    from iqm_format import HEADER_STRUCT, IQM_LOOP, IQMFormatError
+
+# Values that differ by less than this are considered equal.
+DEFAULT_TOLERANCE: float = 1.0e-4
+
+# The header counts that are compared, and how they're reported.
+COUNT_NAMES: dict[str, str] = {
+    "num_meshes": "meshes",
+    "num_vertexes": "vertices",
+    "num_triangles": "triangles",
+    "num_joints": "joints",
+    "num_poses": "poses",
+    "num_anims": "animations",
+    "num_frames": "frames",
+    "num_framechannels": "frame channels",
+}
+
+VERTEX_ARRAY_NAMES: dict[int, str] = {0: "position", 1: "texcoord", 2: "normal", 3: "tangent", 4: "blendindexes", 5: "blendweights", 6: "color"}
+
+# The channels of a pose, in the order they're stored.
+CHANNEL_NAMES: tuple[str, ...] = ("translation",) * 3 + ("rotation",) * 4 + ("scale",) * 3
+
+
+@dataclass
+class IQMDiff:
+    """The differences between two IQM files, one line per difference."""
+
+    old_path: str
+    new_path: str
+    counts: list[str] = field(default_factory=list)
+    meshes: list[str] = field(default_factory=list)
+    joints: list[str] = field(default_factory=list)
+    vertex_arrays: list[str] = field(default_factory=list)
+    animations: list[str] = field(default_factory=list)
+    sections: dict[str, tuple[int, int]] = field(default_factory=dict)  # The old and new size of each section, in bytes.
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.counts or self.meshes or self.joints or self.vertex_arrays or self.animations)
+
+    def __str__(self) -> str:
+        lines = [f"{self.old_path} -> {self.new_path}"]
+        for title, differences in (
+            ("Counts", self.counts),
+            ("Meshes", self.meshes),
+            ("Joints", self.joints),
+            ("Vertex arrays", self.vertex_arrays),
+            ("Animations", self.animations),
+        ):
+            if differences:
+                lines.append(f"{title}:")
+                lines.extend(f"  {difference}" for difference in differences)
+
+        if not self.changed:
+            lines.append("No structural changes")
+
+        lines.append("Sections:")
+        for name, (old_size, new_size) in self.sections.items():
+            lines.append(f"  {name:<32} {old_size:>12,} -> {new_size:>12,} bytes{_format_delta(new_size - old_size)}")
+
+        return "\n".join(lines)
+
+
+def _format_delta(delta: float) -> str:
+    return f" ({delta:+,})" if delta else ""
+
+
+def _vertex_array_name(array_type: int) -> str:
+    return VERTEX_ARRAY_NAMES.get(array_type, f"custom {array_type}")
+
+
+def _names(model: compact_format.MappedIQM, records: np.ndarray) -> list[str]:
+    """The names of records (meshes, joints or anims), with repeated names numbered so each name is unique."""
+
+    names = []
+    seen: dict[str, int] = {}
+    for name_offset in records["name"]:
+        name = model.get_string(int(name_offset))
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name} #{seen[name]}")
+
+    return names
+
+
+def section_sizes(model: compact_format.MappedIQM) -> dict[str, int]:
+    """The size of each section of model, in bytes."""
+
+    header = model.header
+    sizes = {"header": HEADER_STRUCT.size, "text": header["num_text"], "meshes": model.meshes.nbytes}
+    for vertex_array in model.vertex_arrays:
+        sizes[f"vertex array ({_vertex_array_name(vertex_array.type)})"] = vertex_array.data.nbytes
+    sizes["triangles"] = model.triangles.nbytes
+    sizes["adjacency"] = model.adjacency.nbytes if model.adjacency is not None else 0
+    sizes["joints"] = model.joints.nbytes
+    sizes["poses"] = model.poses.nbytes
+    sizes["anims"] = model.anims.nbytes
+    sizes["frames"] = model.frames.nbytes
+    sizes["bounds"] = model.bounds.nbytes if model.bounds is not None else 0
+    sizes["comment"] = header["num_comment"]
+    for name, data in model.extensions.items():
+        sizes[f"extension ({name})"] = data.nbytes
+    sizes["file"] = len(model.buffer)
+
+    return sizes
+
+
+def _diff_counts(old: compact_format.MappedIQM, new: compact_format.MappedIQM) -> list[str]:
+    return [
+        f"{name}: {old.header[field_name]:,} -> {new.header[field_name]:,}{_format_delta(new.header[field_name] - old.header[field_name])}"
+        for field_name, name in COUNT_NAMES.items()
+        if old.header[field_name] != new.header[field_name]
+    ]
+
+
+def _diff_meshes(old: compact_format.MappedIQM, new: compact_format.MappedIQM) -> list[str]:
+    differences = []
+    old_meshes = dict(zip(_names(old, old.meshes), old.meshes))
+    new_meshes = dict(zip(_names(new, new.meshes), new.meshes))
+
+    for name in old_meshes.keys() - new_meshes.keys():
+        differences.append(f"{name}: removed")
+    for name in new_meshes.keys() - old_meshes.keys():
+        differences.append(f"{name}: added, {int(new_meshes[name]['num_vertexes']):,} vertices, {int(new_meshes[name]['num_triangles']):,} triangles")
+
+    for name in old_meshes.keys() & new_meshes.keys():
+        old_mesh, new_mesh = old_meshes[name], new_meshes[name]
+        changes = []
+        for field_name, label in (("num_vertexes", "vertices"), ("num_triangles", "triangles")):
+            old_count, new_count = int(old_mesh[field_name]), int(new_mesh[field_name])
+            if old_count != new_count:
+                changes.append(f"{label} {old_count:,} -> {new_count:,}{_format_delta(new_count - old_count)}")
+
+        old_material, new_material = old.get_string(int(old_mesh["material"])), new.get_string(int(new_mesh["material"]))
+        if old_material != new_material:
+            changes.append(f"material '{old_material}' -> '{new_material}'")
+
+        if changes:
+            differences.append(f"{name}: {', '.join(changes)}")
+
+    return sorted(differences)
+
+
+def _diff_joints(old: compact_format.MappedIQM, new: compact_format.MappedIQM, tolerance: float) -> list[str]:
+    differences = []
+    old_names, new_names = _names(old, old.joints), _names(new, new.joints)
+    old_joints, new_joints = dict(zip(old_names, old.joints)), dict(zip(new_names, new.joints))
+
+    def parent_name(names, joint) -> str:
+        return names[joint["parent"]] if joint["parent"] >= 0 else None
+
+    for name in old_joints.keys() - new_joints.keys():
+        differences.append(f"{name}: removed")
+    for name in new_joints.keys() - old_joints.keys():
+        differences.append(f"{name}: added under {parent_name(new_names, new_joints[name]) or 'the root'}")
+
+    for name in old_joints.keys() & new_joints.keys():
+        old_joint, new_joint = old_joints[name], new_joints[name]
+        changes = []
+        old_parent, new_parent = parent_name(old_names, old_joint), parent_name(new_names, new_joint)
+        if old_parent != new_parent:
+            changes.append(f"parent {old_parent or 'none'} -> {new_parent or 'none'}")
+
+        for field_name in ("translate", "rotate", "scale"):
+            change = float(np.abs(new_joint[field_name].astype(np.float64) - old_joint[field_name]).max())
+            if change > tolerance:
+                changes.append(f"rest {field_name} moved by {change:.6g}")
+
+        if changes:
+            differences.append(f"{name}: {', '.join(changes)}")
+
+    # The same joints in another order change the meaning of every blend index.
+    common_names = old_joints.keys() & new_joints.keys()
+    if [name for name in old_names if name in common_names] != [name for name in new_names if name in common_names]:
+        differences.append("joints were reordered")
+
+    return sorted(differences)
+
+
+def _diff_vertex_arrays(old: compact_format.MappedIQM, new: compact_format.MappedIQM, tolerance: float) -> list[str]:
+    differences = []
+    old_arrays = {vertex_array.type: vertex_array for vertex_array in old.vertex_arrays}
+    new_arrays = {vertex_array.type: vertex_array for vertex_array in new.vertex_arrays}
+
+    for array_type in sorted(old_arrays.keys() | new_arrays.keys()):
+        name = _vertex_array_name(array_type)
+        old_array, new_array = old_arrays.get(array_type), new_arrays.get(array_type)
+        if old_array is None or new_array is None:
+            differences.append(f"{name}: {'added' if old_array is None else 'removed'}")
+            continue
+
+        if (old_array.format, old_array.size) != (new_array.format, new_array.size):
+            differences.append(f"{name}: format {old_array.format} x {old_array.size} -> {new_array.format} x {new_array.size}")
+
+        # Values can only be compared vertex by vertex when the vertices are the same.
+        if old.num_vertexes == new.num_vertexes and old_array.size == new_array.size:
+            change = np.abs(new.decode_vertex_array(array_type) - old.decode_vertex_array(array_type))
+            changed_vertexes = int(np.count_nonzero(change.max(axis=1, initial=0.0) > tolerance))
+            if changed_vertexes:
+                differences.append(f"{name}: {changed_vertexes:,} of {old.num_vertexes:,} vertices changed, by up to {float(change.max()):.6g}")
+
+    if len(old.triangles) == len(new.triangles) and not np.array_equal(old.triangles, new.triangles):
+        changed_triangles = int(np.count_nonzero((old.triangles != new.triangles).any(axis=1)))
+        differences.append(f"triangles: {changed_triangles:,} of {len(old.triangles):,} triangles changed")
+
+    return differences
+
+
+def _diff_animations(old: compact_format.MappedIQM, new: compact_format.MappedIQM, tolerance: float) -> list[str]:
+    differences = []
+    old_anims = dict(zip(_names(old, old.anims), old.anims))
+    new_anims = dict(zip(_names(new, new.anims), new.anims))
+
+    for name in old_anims.keys() - new_anims.keys():
+        differences.append(f"{name}: removed")
+    for name in new_anims.keys() - old_anims.keys():
+        differences.append(f"{name}: added, {int(new_anims[name]['num_frames'])} frames")
+
+    # Poses are compared by joint name, so added or removed joints don't shift the others.
+    old_joint_indexes = {name: index for index, name in enumerate(_names(old, old.joints))}
+    new_joint_indexes = {name: index for index, name in enumerate(_names(new, new.joints))}
+    common_joints = [name for name in old_joint_indexes if name in new_joint_indexes]
+    if len(old.poses) != len(old.joints) or len(new.poses) != len(new.joints):
+        common_joints = []
+    old_pose_indexes = [old_joint_indexes[name] for name in common_joints]
+    new_pose_indexes = [new_joint_indexes[name] for name in common_joints]
+
+    for name in old_anims.keys() & new_anims.keys():
+        old_anim, new_anim = old_anims[name], new_anims[name]
+        changes = []
+        old_frame_count, new_frame_count = int(old_anim["num_frames"]), int(new_anim["num_frames"])
+        if old_frame_count != new_frame_count:
+            changes.append(f"frames {old_frame_count} -> {new_frame_count}{_format_delta(new_frame_count - old_frame_count)}")
+        if abs(float(old_anim["framerate"]) - float(new_anim["framerate"])) > tolerance:
+            changes.append(f"framerate {float(old_anim['framerate']):g} -> {float(new_anim['framerate']):g}")
+        if (old_anim["flags"] & IQM_LOOP) != (new_anim["flags"] & IQM_LOOP):
+            changes.append("now looping" if new_anim["flags"] & IQM_LOOP else "no longer looping")
+
+        if old_frame_count == new_frame_count and common_joints:
+            old_values = old.decode_frames(int(old_anim["first_frame"]), old_frame_count)[:, old_pose_indexes]
+            new_values = new.decode_frames(int(new_anim["first_frame"]), new_frame_count)[:, new_pose_indexes]
+            change = np.abs(new_values - old_values)
+            changed_frames = int(np.count_nonzero(change.max(axis=(1, 2), initial=0.0) > tolerance))
+            if changed_frames:
+                _, joint_index, channel = np.unravel_index(np.argmax(change), change.shape)
+                changes.append(
+                    f"{changed_frames} of {old_frame_count} frames changed, by up to {float(change.max()):.6g} "
+                    f"in the {CHANNEL_NAMES[channel]} of {common_joints[joint_index]}"
+                )
+
+        if changes:
+            differences.append(f"{name}: {', '.join(changes)}")
+
+    return sorted(differences)
+
+
+def diff_models(old: compact_format.MappedIQM, new: compact_format.MappedIQM, tolerance: float = DEFAULT_TOLERANCE, old_path: str = "", new_path: str = "") -> IQMDiff:
+    """Compare the structure and contents of two IQM files, as read by compact_format.open_iqm."""
+
+    old_sizes, new_sizes = section_sizes(old), section_sizes(new)
+    # Sections only one of the files has are listed after the others, and the whole file last.
+    section_names = [name for name in dict.fromkeys([*old_sizes, *new_sizes]) if name != "file"] + ["file"]
+    return IQMDiff(
+        old_path=old_path,
+        new_path=new_path,
+        counts=_diff_counts(old, new),
+        meshes=_diff_meshes(old, new),
+        joints=_diff_joints(old, new, tolerance),
+        vertex_arrays=_diff_vertex_arrays(old, new, tolerance),
+        animations=_diff_animations(old, new, tolerance),
+        sections={name: (old_sizes.get(name, 0), new_sizes.get(name, 0)) for name in section_names},
+    )
+
+
+def diff_files(old_path: str, new_path: str, tolerance: float = DEFAULT_TOLERANCE) -> IQMDiff:
+    """Compare the IQM files at old_path and new_path. Raises OSError or IQMFormatError if either can't be read."""
+
+    with compact_format.open_iqm(old_path) as old, compact_format.open_iqm(new_path) as new:
+        return diff_models(old, new, tolerance, old_path, new_path)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare the structure of two IQM files")
+    parser.add_argument("old", help="the previous build of the file")
+    parser.add_argument("new", help="the new build of the file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="values closer than this are considered equal")
+    parser.add_argument("--json", action="store_true", help="print the differences as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        diff = diff_files(args.old, args.new, args.tolerance)
+    except (OSError, IQMFormatError) as error:
+        print(f"Couldn't compare {args.old} and {args.new}: {error}", file=sys.stderr)
+        return 2
+
+    if args.json:
+        print(json.dumps({**asdict(diff), "changed": diff.changed}, indent=2))
+    else:
+        print(diff)
+
+    return 1 if diff.changed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
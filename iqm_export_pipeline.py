@@ -1,146 +1,702 @@
 import os
-from dataclasses import dataclass
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass, replace
 import traceback
+import zipfile
 import bpy
 from math import radians
-from mathutils import Euler, Matrix, Vector
+from mathutils import Euler, Matrix
+from bpy.app.handlers import persistent
 from bpy.types import Collection, Operator, Panel, PropertyGroup, Scene
-from bpy.props import EnumProperty, FloatVectorProperty, PointerProperty, StringProperty
-from iqm_export import exportIQM
-from .action_items_ui_list import SPLIT_FACTOR
+from bpy.props import BoolProperty, EnumProperty, FloatProperty, FloatVectorProperty, IntProperty, PointerProperty, StringProperty
+from .action_items_ui_list import SPLIT_FACTOR, parse_animation_specs
+from . import export_cache
+from . import export_validation
+from . import live_link
+from . import lod_export
+from . import output_staging
+from . import pk3_packaging
+from . import profiling
+from . import session_cache
+from . import validation_cache
 from .pipeline_presets import IQM_EXPORT_PIPELINE_PT_TransformOffsetPresets
 
 
-class IQM_EXPORT_PIPELINE_OT_Export(Operator):
-    """Run the exportIQM function with pre-defined pipeline options"""
+# Options passed to exportIQM for every export. The export cache fingerprints these too.
+EXPORT_OPTIONS: dict = {
+    "usemesh": True,
+    "usemods": True,
+    "useskel": True,
+    "usebbox": True,
+    "usecol": False,
+    "scale": 1.0,
+    "derigify": False,
+    "boneorder": None,
+}
+
+# The vertex formats written by compact_format, as (identifier, name, description) items of the Vertex Format setting.
+VERTEX_FORMATS: list[tuple[str, str, str]] = [
+    ("FLOAT", "Float", "Write vertex attributes as 32-bit floats, as exported"),
+    ("HALF", "Half", "Write positions and UVs as half floats, and normals and tangents as bytes. Readable by loaders that support IQM's half and byte formats"),
+    ("FIXED", "Fixed Point", "Like Half, but write positions as 16-bit fixed point within the model's bounds. Needs a loader that reads the IQM_QUANTIZED_POSITIONS extension"),
+]
 
-    bl_idname = "export.iqm_pipeline"
-    bl_label = "Export IQM via pipeline"
+# The default of the Cache Size setting, like vertex_cache.DEFAULT_CACHE_SIZE.
+DEFAULT_VERTEX_CACHE_SIZE: int = 16
 
-    @dataclass
-    class DecomposedTransforms:
-        """Cache location, rotation, and scale values before using them to compose a matrix.
-        Particularly useful for storing and recalling rotation_euler angles since Euler values
-        outside a -180 to 180 degree range aren't preserved through matrix composition/decomposition.
-        """
+# Stages of exportIQM that are timed when profiling. exportIQM looks these functions up in its module when it calls
+# them, so they can be wrapped from the outside. Functions missing from the installed exporter are skipped.
+EXPORTER_STAGES: dict[str, str] = {
+    "collectBones": "collect skeleton",
+    "collectMeshes": "collect meshes",
+    "collectAnims": "sample animations",
+    "collectAnim": "sample animation",
+    "IQMFile.export": "write",
+}
 
-        location: Vector
-        rotation_euler: Euler
-        scale: Vector
 
-    @classmethod
-    def poll(cls, context):
-        # Ensure the scene contains an instance of the iqm_export_pipeline_settings PropertyGroup.
-        if not hasattr(context.scene, "iqm_export_pipeline_settings"):
-            return False
+@dataclass
+class ExportJob:
+    """Everything needed to export a single collection, stored as plain values so a job can be
+    serialized and handed to a background Blender process.
+    """
 
-        settings = context.scene.iqm_export_pipeline_settings
-        export_collection = settings.export_collection
+    collection: str
+    filepath: str
+    animspecs: str
+    offset_location: tuple[float, float, float]
+    offset_rotation: tuple[float, float, float]
+    offset_scale: tuple[float, float, float]
+    use_cache: bool = False
+    export_mesh: bool = True  # False exports only the skeleton and animations, as in the split animation files.
+    profile: bool = False  # Time each stage of the export, and write a Chrome trace beside the exported file.
+    compression_tolerances: tuple[float, ...] = ()  # Translation, rotation and scale tolerances, empty to not compress.
+    decimate_ratio: float = 1.0  # The ratio of triangles kept in level of detail files, 1.0 exports the full meshes.
+    fast_sampling: bool = True  # Sample animations from their F-curves instead of setting the scene to every frame.
+    weld_vertices: bool = False  # Merge the exported vertices whose attributes are identical.
+    vertex_format: str = "FLOAT"  # "HALF" or "FIXED" quantize the vertex attributes (see compact_format).
+    compact_tolerances: tuple[float, ...] = ()  # Tolerances of 8-bit animation channels, empty to keep 16-bit frames.
+    vertex_cache_size: int = 0  # Reorder the triangles and vertices for a post-transform cache of this many vertices, 0 disables it.
+    report_changes: bool = False  # Compare the exported file with the one it replaces, see iqm_diff.
+    session_cache_mb: int = session_cache.DEFAULT_CAPACITY_MB  # Memory cap of the files kept for reuse by later jobs, 0 disables it.
 
-        # Check if an export collection has been selected, and if it has objects in it.
-        if not export_collection or not export_collection.all_objects:
-            return False
 
-        # Validate the action_list_source
-        if settings.action_list_source == "string":
-            # Make sure the action_list_string isn't blank
-            if not settings.action_list_string:
-                return False
+@dataclass
+class ExportResult:
+    """The outcome of running an ExportJob."""
 
-        elif settings.action_list_source == "action_list":
-            # Check if an export collection has been selected, and if it has at least one action_item in the action_items list.
-            if not export_collection or not hasattr(export_collection, "action_items") or not export_collection.action_items:
-                return False
+    collection: str
+    filepath: str
+    status: str = "exported"  # One of "exported", "skipped" (up-to-date in the export cache), or "failed".
+    seconds: float = 0.0
+    error: str = ""
+    profile_summary: str = ""  # One line of stage timings and counters, when the job was profiled.
+    trace_path: str = ""
+    compression_summary: str = ""  # The size savings of each compressed animation, one per line.
+    compact_summary: str = ""  # The size savings of the quantized vertices and animations, one per line.
+    vertex_cache_summary: str = ""  # The ACMR and ATVR of each mesh before and after vertex cache optimization, one per line.
+    change_summary: str = ""  # The structural differences from the replaced file, when the job reports changes.
 
-            # Make sure that all action_items have been assigned an action.
-            if any(action_item.action is None for action_item in export_collection.action_items):
-                return False
 
-        return True
+def is_collection_exportable(settings, export_collection) -> bool:
+    """Check if export_collection can be exported with the current pipeline settings."""
 
-    def execute(self, context):
-        settings = context.scene.iqm_export_pipeline_settings
+    return validation_cache.validate_collection(settings, export_collection).exportable
 
-        file_directory = os.path.abspath(settings.export_directory)
-        file_name = settings.export_collection.iqm_export_pipeline_file_name
-        file_extention = ".iqm"
 
-        animations_to_export = ""
-        if settings.action_list_source == "string":
-            animations_to_export = settings.action_list_string
-        elif settings.action_list_source == "action_list":
+def build_animation_specs(settings, export_collection) -> str:
+    """Build the comma (",") separated list of actions that exportIQM expects as its animspecs."""
+
+    if settings.action_list_source == "string":
+        return settings.action_list_string
+
+    if settings.action_list_source == "action_list":
+        return ", ".join(str(action_item) for action_item in export_collection.action_items)
+
+    return ""
+
+
+def build_offset_matrix(location, rotation, scale) -> Matrix:
+    """Compose the transform offset applied to the root objects of an export collection."""
+
+    return Matrix.LocRotScale(location, Euler(rotation, "XYZ"), scale)
+
+
+def get_compression_tolerances(settings) -> tuple[float, float, float]:
+    """The translation, rotation and scale tolerances of the pipeline settings, shared by animation compression and
+    8-bit animation channels.
+    """
+
+    return (
+        settings.compression_translation_tolerance,
+        settings.compression_rotation_tolerance,
+        settings.compression_scale_tolerance,
+    )
+
+
+def build_export_job(settings, export_collection) -> ExportJob:
+    """Capture the pipeline settings needed to export export_collection."""
+
+    file_directory = os.path.abspath(settings.export_directory)
+    file_name = export_collection.iqm_export_pipeline_file_name
+    file_extention = ".iqm"
+    tolerances = get_compression_tolerances(settings)
+
+    return ExportJob(
+        collection=export_collection.name,
+        filepath=os.path.join(file_directory, file_name + file_extention),
+        animspecs=build_animation_specs(settings, export_collection),
+        offset_location=tuple(settings.offset_location),
+        offset_rotation=tuple(settings.offset_rotation),
+        offset_scale=tuple(settings.offset_scale),
+        use_cache=settings.use_export_cache,
+        profile=settings.use_profiling,
+        compression_tolerances=tolerances if settings.use_animation_compression else (),
+        compact_tolerances=tolerances if settings.use_compact_animations else (),
+        vertex_format=settings.vertex_format,
+        fast_sampling=settings.use_fast_sampling,
+        weld_vertices=settings.use_vertex_welding,
+        vertex_cache_size=settings.vertex_cache_size if settings.use_vertex_cache_optimization else 0,
+        report_changes=settings.use_change_report,
+        session_cache_mb=settings.session_cache_size,
+    )
 
-            action_items = settings.export_collection.action_items
-            for i, action_item in enumerate(action_items):
-                animations_to_export += str(action_item)
-                if i < len(action_items) - 1:
-                    animations_to_export += ", "
 
-        print(f"Actions to export: {animations_to_export}")
+def split_export_job(job: ExportJob) -> list[ExportJob]:
+    """Split job into a job that exports the mesh and skeleton, and one job per animation that exports the skeleton
+    and that animation into its own file named file_name_action.iqm.
+    """
 
-        # Build the offset matrix.
-        offset_matrix = Matrix.LocRotScale(
-            settings.offset_location,
-            Euler(settings.offset_rotation, "XYZ"),
-            settings.offset_scale,
+    file_path_root, file_extention = os.path.splitext(job.filepath)
+    jobs = [replace(job, animspecs="")]
+
+    for spec in parse_animation_specs(job.animspecs):
+        animation_filepath = f"{file_path_root}_{bpy.path.clean_name(spec.name)}{file_extention}"
+        jobs.append(replace(job, filepath=animation_filepath, animspecs=str(spec), export_mesh=False))
+
+    return jobs
+
+
+def build_lod_jobs(job: ExportJob, lod_ratios: list[float]) -> list[ExportJob]:
+    """Build a job per ratio in lod_ratios that exports the decimated meshes and skeleton of job into
+    file_name_lod1.iqm, file_name_lod2.iqm, etc. The levels of detail share the animations of the full detail files.
+    """
+
+    return [
+        replace(
+            job,
+            filepath=lod_export.get_lod_filepath(job.filepath, level),
+            animspecs="",
+            export_mesh=True,
+            compression_tolerances=(),
+            decimate_ratio=ratio,
         )
+        for level, ratio in enumerate(lod_ratios, start=1)
+    ]
 
-        # Temporarily override the selected objects with the objects from the export_collection
-        with context.temp_override(selected_objects=settings.export_collection.all_objects):
-
-            try:
-                # Cache the original transforms, then offset them.
-                original_transforms: dict[self.DecomposedTransforms] = {}
-                for obj in context.selected_objects:
-                    # Don't offset objects that are children of other objects (avoids double-transformations).
-                    if obj.parent:
-                        continue
-
-                    original_transforms[obj.name] = self.DecomposedTransforms(
-                        obj.location.copy(),
-                        obj.rotation_euler.copy(),
-                        obj.scale.copy(),
-                    )
 
-                    new_transform = offset_matrix @ obj.matrix_local
-                    new_location, new_rotation, new_scale = new_transform.decompose()
+def build_export_jobs(settings, export_collection) -> list[ExportJob]:
+    """Build the jobs that export export_collection.
+    The "combined" animation export mode exports the mesh and every animation into a single file, while the "split"
+    mode exports each animation into its own file (see split_export_job). Each LOD ratio adds a level of detail file.
+    """
+
+    job = build_export_job(settings, export_collection)
+    if settings.animation_export_mode == "split" and job.animspecs:
+        jobs = split_export_job(job)
+    else:
+        jobs = [job]
+
+    return jobs + build_lod_jobs(job, lod_export.parse_lod_ratios(settings.lod_ratios))
+
+
+def load_exporter():
+    """Import the IQM exporter add-on. It's imported on the first export instead of when this add-on is registered,
+    so it doesn't slow down starting Blender.
+    """
+
+    import iqm_export
+
+    return iqm_export
+
+
+def get_export_options(job: ExportJob) -> dict:
+    """The options passed to exportIQM for job."""
+
+    return {**EXPORT_OPTIONS, "usemesh": job.export_mesh}
 
-                    obj.location = new_location
-                    obj.rotation_euler = new_rotation.to_euler("XYZ")
-                    obj.scale = new_scale
 
-                # Force an update so that the transforms are correctly offset in time for export.
-                context.view_layer.update()
+def get_cached_export_options(job: ExportJob) -> dict:
+    """The options of job that change the exported file besides the exported data, for the export and session caches."""
 
+    # Jobs sent to workers come back from JSON with lists instead of tuples, so keep the tolerances as a list.
+    return {
+        **get_export_options(job),
+        "compression_tolerances": list(job.compression_tolerances),
+        "decimate_ratio": job.decimate_ratio,
+        "weld_vertices": job.weld_vertices,
+        "vertex_cache_size": job.vertex_cache_size,
+        "vertex_format": job.vertex_format,
+        "compact_tolerances": list(job.compact_tolerances),
+    }
+
+
+def get_session_cache_key(job: ExportJob) -> tuple[tuple, frozenset[str]]:
+    """The session cache key of the file job exports, and the names of the datablocks it depends on."""
+
+    offset_matrix = build_offset_matrix(job.offset_location, job.offset_rotation, job.offset_scale)
+    return session_cache.build_key(
+        bpy.data.collections[job.collection],
+        job.animspecs,
+        offset_matrix,
+        get_cached_export_options(job),
+        include_meshes=job.export_mesh,
+    )
+
+
+def fingerprint_export_job(job: ExportJob) -> str:
+    """Fingerprint the data that job exports, for the export cache."""
+
+    offset_matrix = build_offset_matrix(job.offset_location, job.offset_rotation, job.offset_scale)
+    return export_cache.fingerprint_collection(
+        bpy.data.collections[job.collection],
+        job.animspecs,
+        offset_matrix,
+        get_cached_export_options(job),
+        include_meshes=job.export_mesh,
+    )
+
+
+def is_export_job_up_to_date(job: ExportJob) -> bool:
+    """Check if job would be skipped because its output is up to date in the export cache."""
+
+    return job.use_cache and export_cache.is_up_to_date(job.filepath, fingerprint_export_job(job))
+
+
+def describe_exporter_call(args, kwargs) -> dict:
+    """Name the action passed to an exporter stage, so each sampled animation gets its own labelled span."""
+
+    action = kwargs.get("action") or next((arg for arg in args if isinstance(arg, bpy.types.Action)), None)
+    return {"action": action.name} if action else {}
+
+
+def get_trace_path(filepath: str) -> str:
+    """The path of the Chrome trace written beside filepath when its export is profiled."""
+
+    return os.path.splitext(filepath)[0] + ".trace.json"
+
+
+def export_iqm_collection(
+    context,
+    export_collection,
+    filepath,
+    animations_to_export,
+    offset_matrix,
+    export_options=None,
+    profiler=None,
+    compression_tolerances=(),
+    decimate_ratio=1.0,
+    fast_sampling=True,
+    weld_vertices=False,
+    vertex_cache_size=0,
+    vertex_format="FLOAT",
+    compact_tolerances=(),
+) -> "tuple[list[animation_compression.AnimationSavings], list[vertex_cache.VertexCacheReport], list[compact_format.CompactReport]]":
+    """Export the objects of export_collection with exportIQM, then apply the offset matrix to the exported data.
+    When compression_tolerances (translation, rotation, scale) are given, the animations are compressed within them,
+    and the savings of each animation are returned. A decimate_ratio below 1.0 exports decimated meshes, for levels of detail.
+    fast_sampling samples the animations of rigs without constraints or drivers from their F-curves (see pose_sampler).
+    weld_vertices merges the exported vertices of each mesh whose attributes are identical (see vertex_welding).
+    A vertex_cache_size above 0 reorders the triangles and vertices of each mesh for a post-transform cache of that
+    many vertices (see vertex_cache), and the ACMR and ATVR of each mesh are returned along with the savings.
+    vertex_format ("HALF" or "FIXED") and compact_tolerances (translation, rotation, scale) write the compact format
+    (see compact_format), and the size savings of the quantized sections are returned too.
+    The objects in the scene are never modified, so there's nothing to restore if the export fails.
+    The file is written to a temporary file and only moved to filepath once it's complete, so readers never see
+    a partially written file, and a failed export leaves the previous file in place.
+    """
+
+    # The stages that edit the exported data use NumPy, which is imported on the first export instead of when this
+    # add-on is registered, like the exporter.
+    import numpy as np
+    from . import animation_compression
+    from . import compact_format
+    from . import iqm_format
+    from . import iqm_transform
+    from . import pose_sampler
+    from . import vertex_cache
+    from . import vertex_welding
+
+    profiler = profiler or profiling.NULL_PROFILER
+
+    # The commit span is opened at the end of the staged block and closed by this stack once the file is in place.
+    exporter = load_exporter()
+
+    with ExitStack() as commit_stack, output_staging.staged_output(filepath) as staging_path:
+        with ExitStack() as lod_stack:
+            # The frames set while sampling animations, and the copies of decimated meshes, aren't edits.
+            lod_stack.enter_context(session_cache.suspended_updates())
+
+            # Decimate the meshes of level of detail files while exportIQM reads them.
+            if decimate_ratio < 1.0:
+                decimated_count = lod_stack.enter_context(lod_export.decimated_meshes(exporter, export_collection, decimate_ratio))
+                profiler.count("meshes decimated", decimated_count)
+
+            # Sample the poses of animations directly, instead of evaluating the whole scene at every frame.
+            if fast_sampling:
+                lod_stack.enter_context(pose_sampler.sampled_animations(exporter, profiler))
+
+            # Temporarily override the selected objects with the objects from the export_collection
+            with context.temp_override(selected_objects=export_collection.all_objects):
                 # Export
-                exportIQM(
-                    context=bpy.context,
-                    filename=os.path.join(file_directory, file_name + file_extention),
-                    usemesh=True,
-                    usemods=True,
-                    useskel=True,
-                    usebbox=True,
-                    usecol=False,
-                    scale=1.0,
-                    animspecs=animations_to_export,
-                    matfun=(lambda prefix, image: prefix),
-                    derigify=False,
-                    boneorder=None,
-                )
-
-            except Exception:
-                print(traceback.format_exc())
-
-            finally:
-                # Reset the transforms
-                for obj_name, original in original_transforms.items():
-                    obj = bpy.data.objects[obj_name]
-
-                    obj.location = original.location
-                    obj.rotation_euler = original.rotation_euler
-                    obj.scale = original.scale
-
-        return {"FINISHED"}
+                with profiler.span("exportIQM"), profiler.instrument(exporter, EXPORTER_STAGES, describe_exporter_call):
+                    exporter.exportIQM(
+                        context=bpy.context,
+                        filename=staging_path,
+                        animspecs=animations_to_export,
+                        matfun=(lambda prefix, image: prefix),
+                        **(export_options or EXPORT_OPTIONS),
+                    )
+
+        # exportIQM reports some errors (such as a missing armature) by printing them instead of raising.
+        if not os.path.isfile(staging_path):
+            raise RuntimeError(f"exportIQM didn't write {filepath}, check the console for its error message")
+
+        if profiler.enabled:
+            header = iqm_format.read_header(staging_path)
+            profiler.count("vertices", header["num_vertexes"])
+            profiler.count("bones", header["num_joints"])
+            profiler.count("frames sampled", header["num_frames"])
+
+        # The stages below edit the exported data instead of the scene, so they share a single read and write.
+        offset = np.array(offset_matrix)
+        apply_offset = not iqm_transform.is_identity(offset)
+        savings: list[animation_compression.AnimationSavings] = []
+        cache_reports: list[vertex_cache.VertexCacheReport] = []
+        compact_reports: list[compact_format.CompactReport] = []
+        quantize = vertex_format != "FLOAT" or bool(compact_tolerances)
+
+        if apply_offset or compression_tolerances or weld_vertices or vertex_cache_size > 0 or quantize:
+            with profiler.span("read"):
+                model = iqm_format.read_iqm(staging_path)
+
+            # Weld first, so the offset transforms fewer vertices.
+            if weld_vertices:
+                with profiler.span("weld vertices"):
+                    profiler.count("vertices welded", vertex_welding.weld_vertices(model))
+
+            # Reorder after welding, since welding changes which triangles share vertices.
+            if vertex_cache_size > 0:
+                with profiler.span("optimize vertex cache"):
+                    cache_reports = vertex_cache.optimize_vertex_cache(model, vertex_cache_size)
+                profiler.count("triangles reordered", sum(report.triangles for report in cache_reports))
+
+            # Offset the exported vertices, root joints and animations, as if the root objects had been offset before exporting.
+            if apply_offset:
+                with profiler.span("offset"):
+                    iqm_transform.apply_offset(model, offset)
+                profiler.count("objects offset", sum(1 for obj in export_collection.all_objects if obj.parent is None))
+
+            # Compress after offsetting, so the tolerances are in exported units.
+            if compression_tolerances:
+                with profiler.span("compress animations"):
+                    savings = animation_compression.compress_animations(
+                        model, animation_compression.channel_tolerances(*compression_tolerances)
+                    )
+
+            # Quantize last, so every stage above works on the exported precision.
+            if quantize:
+                with profiler.span("quantize"):
+                    reports = [compact_format.quantize_vertices(model, vertex_format)]
+                    if compact_tolerances:
+                        reports.append(
+                            compact_format.quantize_frames(model, animation_compression.channel_tolerances(*compact_tolerances))
+                        )
+                # Sections with nothing to quantize have no report.
+                compact_reports = [report for report in reports if report]
+
+            with profiler.span("write"):
+                output_staging.write_buffered(staging_path, iqm_format.serialize_iqm(model))
+
+        profiler.count("bytes written", os.path.getsize(staging_path))
+
+        # Leaving the block flushes the staged file to disk and moves it into place.
+        commit_stack.enter_context(profiler.span("commit"))
+
+    return savings, cache_reports, compact_reports
+
+
+def describe_changes(previous_data: bytes, filepath: str) -> str:
+    """The structural differences between previous_data, the contents of a previous build, and the IQM file at filepath."""
+
+    from . import compact_format
+    from . import iqm_diff
+    from . import iqm_format
+
+    try:
+        with compact_format.open_iqm(filepath) as model:
+            changes = iqm_diff.diff_models(compact_format.MappedIQM(previous_data), model, old_path="previous build", new_path=filepath)
+    except iqm_format.IQMFormatError as error:
+        return f"Couldn't compare with the previous build: {error}"
+
+    return str(changes)
+
+
+def run_export_job(context, job: ExportJob, on_progress=None) -> ExportResult:
+    """Run an ExportJob, capturing any failure in the returned ExportResult instead of raising.
+    on_progress is called with the name and args of each stage as it starts, such as ("sample animation", {"action": "walk"}).
+    """
+
+    result = ExportResult(collection=job.collection, filepath=job.filepath)
+    start_time = time.perf_counter()
+
+    # Progress is reported from the profiler's spans, but the trace is only kept when profiling was asked for.
+    if job.profile or on_progress:
+        profiler = profiling.Profiler(os.path.basename(job.filepath), on_span_start=on_progress)
+    else:
+        profiler = profiling.NULL_PROFILER
+
+    try:
+        with profiler.span("export", collection=job.collection, animspecs=job.animspecs):
+            export_collection = bpy.data.collections[job.collection]
+            offset_matrix = build_offset_matrix(job.offset_location, job.offset_rotation, job.offset_scale)
+
+            fingerprint = None
+            if job.use_cache:
+                with profiler.span("fingerprint"):
+                    fingerprint = fingerprint_export_job(job)
+                    up_to_date = export_cache.is_up_to_date(job.filepath, fingerprint)
+
+                if up_to_date:
+                    result.status = "skipped"
+
+            if result.status != "skipped":
+                # Forget the previous entry first, so a failed export is never mistaken for an up-to-date one.
+                export_cache.invalidate(job.filepath)
+
+                # Keep the file that's about to be replaced, to compare the new one with.
+                previous_data = None
+                if job.report_changes and os.path.isfile(job.filepath):
+                    with open(job.filepath, "rb") as previous_file:
+                        previous_data = previous_file.read()
+
+                cache_key = cached_data = None
+                if job.session_cache_mb > 0:
+                    cache = session_cache.get_cache()
+                    cache.set_capacity(job.session_cache_mb << 20)
+                    cache_key, dependencies = get_session_cache_key(job)
+                    cached_data = cache.get(cache_key)
+
+                if cached_data is not None:
+                    # Another collection already exported the same datablocks with the same options in this session.
+                    with profiler.span("reuse"):
+                        output_staging.write_atomic(job.filepath, cached_data)
+                    profiler.count("bytes reused", len(cached_data))
+                else:
+                    savings, cache_reports, compact_reports = export_iqm_collection(
+                        context,
+                        export_collection,
+                        job.filepath,
+                        job.animspecs,
+                        offset_matrix,
+                        get_export_options(job),
+                        profiler,
+                        job.compression_tolerances,
+                        job.decimate_ratio,
+                        job.fast_sampling,
+                        job.weld_vertices and job.export_mesh,
+                        job.vertex_cache_size if job.export_mesh else 0,
+                        job.vertex_format,
+                        job.compact_tolerances,
+                    )
+                    result.compression_summary = "\n".join(str(animation_savings) for animation_savings in savings)
+                    result.vertex_cache_summary = "\n".join(str(report) for report in cache_reports)
+                    result.compact_summary = "\n".join(str(report) for report in compact_reports)
+
+                    if cache_key and os.path.getsize(job.filepath) <= cache.capacity_bytes:
+                        with open(job.filepath, "rb") as exported_file:
+                            cache.put(cache_key, exported_file.read(), dependencies)
+
+                if fingerprint:
+                    export_cache.store(job.filepath, fingerprint)
+
+                if previous_data is not None:
+                    with profiler.span("diff"):
+                        result.change_summary = describe_changes(previous_data, job.filepath)
+
+    except Exception:
+        result.status = "failed"
+        result.error = traceback.format_exc()
+
+    result.seconds = time.perf_counter() - start_time
+
+    if job.profile:
+        result.profile_summary = profiler.summary()
+        result.trace_path = get_trace_path(job.filepath)
+        try:
+            profiler.write_chrome_trace(result.trace_path)
+        except OSError as error:
+            print(f"Couldn't write the export trace {result.trace_path}: {error}")
+            result.trace_path = ""
+
+    return result
+
+
+def package_results(settings, results: list[ExportResult]) -> pk3_packaging.PackageSummary:
+    """Add the files of results that were exported or up to date to the package archive of the pipeline settings."""
+
+    files = {
+        settings.package_prefix + os.path.basename(result.filepath): result.filepath
+        for result in results
+        if result.status in {"exported", "skipped"}
+    }
+    return pk3_packaging.update_archive(bpy.path.abspath(settings.package_path), files, settings.package_compression_level)
+
+
+def find_limit_problems(settings, export_collection, jobs: list[ExportJob]) -> list[str]:
+    """Check the data exported by jobs against the engine limits of the pipeline settings, unless the checks are
+    disabled. Returns a description of each problem.
+    """
+
+    if not settings.use_limit_checks:
+        return []
+
+    start_time = time.perf_counter()
+    animspecs = ", ".join(job.animspecs for job in jobs if job.animspecs)
+    problems = export_validation.find_limit_problems(settings, export_collection, animspecs)
+    print(f"Checked the engine limits of {export_collection.name} in {time.perf_counter() - start_time:.2f}s")
+
+    return problems
+
+
+def report_limit_problems(operator, export_collection, problems: list[str]) -> set[str]:
+    """Print every problem found by find_limit_problems, and report the first one through operator.
+    Returns the set the operator should return.
+    """
+
+    for problem in problems:
+        print(f"{export_collection.name}: {problem}")
+
+    more = f" (and {len(problems) - 1} more problems, see the console)" if len(problems) > 1 else ""
+    operator.report({"ERROR"}, f"Can't export {export_collection.name}: {problems[0]}{more}")
+    return {"CANCELLED"}
+
+
+def update_watch_mode(settings, context):
+    # Imported here because watch_mode builds on this module.
+    from . import watch_mode
+
+    watch_mode.set_enabled(settings.use_watch_mode)
+
+
+def update_live_link(settings, context):
+    """Start, restart or stop the live link server to match the pipeline settings."""
+
+    if not settings.use_live_link:
+        live_link.stop_server()
+        return
+
+    try:
+        live_link.start_server(settings.live_link_address, settings.live_link_send_contents)
+    except (OSError, ValueError) as error:
+        live_link.stop_server()
+        print(f"Couldn't start the live link server on {settings.live_link_address}: {error}")
+
+
+def finish_export(operator, settings, jobs: list[ExportJob], results: list[ExportResult]) -> set[str]:
+    """Evict old export cache entries, then report the results of an export through operator.
+    Returns the set the operator should return.
+    """
+
+    if settings.use_export_cache:
+        export_cache.evict(os.path.dirname(jobs[0].filepath), settings.export_cache_max_entries, settings.export_cache_max_age_days)
+
+    failed_results = [result for result in results if result.status == "failed"]
+    for result in failed_results:
+        print(result.error)
+
+    for result in results:
+        if result.compression_summary:
+            print(f"{os.path.basename(result.filepath)} animation compression:\n{result.compression_summary}")
+        if result.vertex_cache_summary:
+            print(f"{os.path.basename(result.filepath)} vertex cache optimization:\n{result.vertex_cache_summary}")
+        if result.compact_summary:
+            print(f"{os.path.basename(result.filepath)} compact format:\n{result.compact_summary}")
+        if result.change_summary:
+            print(result.change_summary)
+        if result.profile_summary:
+            print(result.profile_summary)
+
+    if failed_results:
+        # The last line of the traceback holds the exception message.
+        error_message = failed_results[0].error.strip().splitlines()[-1]
+        operator.report({"ERROR"}, f"Failed to export {os.path.basename(failed_results[0].filepath)}: {error_message}")
+        return {"CANCELLED"}
+
+    # The exported files are already in place, so clients never receive a partially written file.
+    live_link.publish([result.filepath for result in results if result.status == "exported"])
+
+    # Only package complete exports, so the archive never mixes new files with the old files they were exported with.
+    if settings.use_packaging:
+        try:
+            package_summary = package_results(settings, results)
+        except (OSError, zipfile.BadZipFile) as error:
+            operator.report({"ERROR"}, f"Failed to update {os.path.basename(settings.package_path)}: {error}")
+            return {"CANCELLED"}
+
+        print(package_summary)
+        operator.report({"INFO"}, str(package_summary))
+
+    skipped_count = sum(1 for result in results if result.status == "skipped")
+    if skipped_count == len(results):
+        operator.report({"INFO"}, "Everything is up to date, skipped export")
+    elif skipped_count:
+        operator.report({"INFO"}, f"Exported {len(results) - skipped_count} files, {skipped_count} were up to date")
+
+    if settings.use_profiling:
+        # The full traces were written beside the exported files, report the slowest job's summary.
+        slowest_result = max(results, key=lambda result: result.seconds)
+        operator.report({"INFO"}, slowest_result.profile_summary)
+
+    return {"FINISHED"}
+
+
+class IQM_EXPORT_PIPELINE_OT_Export(Operator):
+    """Run the exportIQM function with pre-defined pipeline options"""
+
+    bl_idname = "export.iqm_pipeline"
+    bl_label = "Export IQM via pipeline"
+
+    @classmethod
+    def poll(cls, context):
+        # Ensure the scene contains an instance of the iqm_export_pipeline_settings PropertyGroup.
+        if not hasattr(context.scene, "iqm_export_pipeline_settings"):
+            return False
+
+        # poll() runs on every redraw, so use the cached validation instead of walking the collection.
+        settings = context.scene.iqm_export_pipeline_settings
+        return validation_cache.get_validation(settings).exportable
+
+    def execute(self, context):
+        # Imported here because batch_export builds on this module.
+        from .batch_export import run_export_jobs
+
+        settings = context.scene.iqm_export_pipeline_settings
+
+        jobs = build_export_jobs(settings, settings.export_collection)
+
+        # Fail before sampling any animations if the collection is over the engine limits.
+        problems = find_limit_problems(settings, settings.export_collection, jobs)
+        if problems:
+            return report_limit_problems(self, settings.export_collection, problems)
+
+        print(f"Actions to export: {build_animation_specs(settings, settings.export_collection)}")
+
+        # Split animation files are exported in parallel by background workers.
+        results = run_export_jobs(context, jobs, settings.batch_worker_count)
+
+        return finish_export(self, settings, jobs, results)
 
 
 class IQM_EXPORT_PIPELINE_SettingsProp(PropertyGroup):
@@ -162,12 +718,215 @@ class IQM_EXPORT_PIPELINE_SettingsProp(PropertyGroup):
 
     action_list_string: StringProperty(name="Animations", default="idle::::1, walk::::1, run::::1")
 
+    animation_export_mode: EnumProperty(
+        name="Animation Export Mode",
+        description="How animations are written",
+        items=[
+            ("combined", "Combined", "Export the mesh and every animation into a single file", 0, 0),
+            ("split", "Split", "Export the mesh and skeleton into one file, and each animation into its own file", 0, 1),
+        ],
+    )
+
     offset_location: FloatVectorProperty(name="Location offset", default=(0, 0, -24), subtype="TRANSLATION")
 
     offset_rotation: FloatVectorProperty(name="Rotation offset", default=(0, 0, radians(90)), subtype="EULER")
 
     offset_scale: FloatVectorProperty(name="Scale offset", default=(32, 32, 32), subtype="XYZ")
 
+    lod_ratios: StringProperty(
+        name="LOD Ratios",
+        description="Comma separated ratios of triangles to keep in each level of detail, such as 0.5, 0.25. Each one is exported beside the full detail file as file_name_lod1.iqm, file_name_lod2.iqm, etc",
+        default="",
+    )
+
+    use_watch_mode: BoolProperty(
+        name="Watch",
+        description="Re-export collections in the background shortly after their objects, meshes, armatures or actions are edited",
+        default=False,
+        update=update_watch_mode,
+    )
+
+    use_live_link: BoolProperty(
+        name="Live Link",
+        description="Send exported files to game clients connected to a local server, instead of having them poll the export directory",
+        default=False,
+        update=update_live_link,
+    )
+
+    live_link_address: StringProperty(
+        name="Address",
+        description="Where the live link server listens: host:port (127.0.0.1 only accepts local clients), or unix:/path/to/socket",
+        default=live_link.DEFAULT_ADDRESS,
+        update=update_live_link,
+    )
+
+    live_link_send_contents: BoolProperty(
+        name="Send Files",
+        description="Send the contents of exported files to clients. Otherwise clients are only sent the path and SHA-256 of each file",
+        default=True,
+        update=update_live_link,
+    )
+
+    use_limit_checks: BoolProperty(
+        name="Check Limits",
+        description="Check bone counts, vertex weights, faces and animation frame ranges before exporting, and stop if they're over the engine limits",
+        default=True,
+    )
+
+    max_bones: IntProperty(
+        name="Max Bones",
+        description="Maximum number of bones the engine supports (IQM can't store more than 256)",
+        default=256,
+        min=1,
+        max=export_validation.IQM_MAX_BONES,
+    )
+
+    max_weights_per_vertex: IntProperty(
+        name="Max Weights",
+        description="Maximum number of bones that can deform a single vertex (IQM can't store more than 4)",
+        default=4,
+        min=1,
+        max=export_validation.IQM_MAX_WEIGHTS_PER_VERTEX,
+    )
+
+    use_packaging: BoolProperty(
+        name="Package",
+        description="Add the exported files to a pk3 (zip) archive after exporting, only rewriting the entries that changed",
+        default=False,
+    )
+
+    package_path: StringProperty(name="Package File", subtype="FILE_PATH", default="//pak0.pk3")
+
+    package_prefix: StringProperty(
+        name="Package Folder",
+        description="Folder inside the package that the exported files are added to",
+        default="models/",
+    )
+
+    package_compression_level: IntProperty(
+        name="Compression",
+        description="Compression level of the entries written to the package, from 0 (stored) to 9 (smallest)",
+        default=6,
+        min=0,
+        max=9,
+    )
+
+    use_export_cache: BoolProperty(
+        name="Skip Unchanged",
+        description="Skip exporting collections whose data hasn't changed since the existing file was exported",
+        default=True,
+    )
+
+    session_cache_size: IntProperty(
+        name="Session Cache",
+        description="Memory (in MB) for keeping exported files, so collections that share the same datablocks reuse them instead of exporting them again (0 disables it)",
+        default=session_cache.DEFAULT_CAPACITY_MB,
+        min=0,
+        subtype="UNSIGNED",
+    )
+
+    export_cache_max_entries: IntProperty(
+        name="Max Cache Entries",
+        description="Maximum number of files remembered by the export cache (0 for no limit)",
+        default=1000,
+        min=0,
+    )
+
+    export_cache_max_age_days: FloatProperty(
+        name="Max Cache Age",
+        description="Forget files that haven't been exported or skipped for this many days (0 for no limit)",
+        default=30.0,
+        min=0.0,
+    )
+
+    batch_worker_count: IntProperty(
+        name="Workers",
+        description="Number of background Blender processes used by batch exports (0 uses one per CPU core)",
+        default=0,
+        min=0,
+    )
+
+    use_change_report: BoolProperty(
+        name="Report Changes",
+        description="Compare each exported file with the file it replaces, and print the changed counts, meshes, joints, vertices, animations and section sizes",
+        default=False,
+    )
+
+    use_profiling: BoolProperty(
+        name="Profile",
+        description="Time each stage of the export, and write a Chrome trace (file_name.trace.json) beside each exported file",
+        default=False,
+    )
+
+    use_animation_compression: BoolProperty(
+        name="Compress Animations",
+        description="Store channels that barely move as constants, and drop frames that can be interpolated from their neighbours within the tolerances",
+        default=False,
+    )
+
+    compression_translation_tolerance: FloatProperty(
+        name="Translation Tolerance",
+        description="Largest error allowed in bone translations, in exported units",
+        default=0.001,
+        min=0.0,
+        precision=4,
+    )
+
+    compression_rotation_tolerance: FloatProperty(
+        name="Rotation Tolerance",
+        description="Largest error allowed in the components of bone rotation quaternions",
+        default=0.0005,
+        min=0.0,
+        precision=4,
+    )
+
+    compression_scale_tolerance: FloatProperty(
+        name="Scale Tolerance",
+        description="Largest error allowed in bone scales",
+        default=0.001,
+        min=0.0,
+        precision=4,
+    )
+
+    use_vertex_welding: BoolProperty(
+        name="Weld Vertices",
+        description="Merge the exported vertices of each mesh whose position, normal, UVs, colors and weights are identical, such as the seams of mirrored meshes. Reads and rewrites the exported file, so it adds time to every export",
+        default=False,
+    )
+
+    vertex_format: EnumProperty(
+        name="Vertex Format",
+        description="Precision of the exported vertex attributes. Smaller formats make files smaller and faster to load",
+        items=VERTEX_FORMATS,
+        default="FLOAT",
+    )
+
+    use_compact_animations: BoolProperty(
+        name="Compact Animations",
+        description="Store the animation channels that stay within the tolerances in 8 bits instead of 16, in the IQM_COMPACT_FRAMES extension. Needs a loader that reads the extension",
+        default=False,
+    )
+
+    use_vertex_cache_optimization: BoolProperty(
+        name="Optimize Vertex Cache",
+        description="Reorder the exported triangles and vertices of each mesh so GPUs transform fewer vertices and draw less overdraw. Prints the ACMR and ATVR before and after. Takes about 3 s per million triangles",
+        default=False,
+    )
+
+    vertex_cache_size: IntProperty(
+        name="Cache Size",
+        description="Number of vertices in the post-transform cache of the targeted GPUs",
+        default=DEFAULT_VERTEX_CACHE_SIZE,
+        min=4,
+        max=64,
+    )
+
+    use_fast_sampling: BoolProperty(
+        name="Fast Sampling",
+        description="Sample the animations of rigs without constraints, drivers or NLA tracks from their F-curves, instead of evaluating the whole scene at every frame",
+        default=True,
+    )
+
 
 class IQM_EXPORT_PIPELINE_PT_Panel(Panel):
     """Creates a panel in the Output section of the Properties Editor"""
@@ -187,6 +946,19 @@ class IQM_EXPORT_PIPELINE_PT_Panel(Panel):
         row = layout.row()
         row.prop(settings.export_collection, "iqm_export_pipeline_file_name")
 
+        # Explain why the collection can't be exported. The validation is cached, so this costs nothing per redraw.
+        for problem in validation_cache.get_validation(settings).problems:
+            row = layout.row()
+            row.label(text=problem, icon="ERROR")
+
+        # Imported here because watch_mode builds on this module.
+        from . import watch_mode
+
+        row = layout.row()
+        row.prop(settings, "use_watch_mode", icon="HIDE_OFF")
+        if settings.use_watch_mode and watch_mode.get_status():
+            row.label(text=watch_mode.get_status())
+
 
 class IQM_EXPORT_PIPELINE_PT_AnimationsSubpanel(Panel):
     """Creates a subpanel in the IQM Export Pipeline for storing animation properties."""
@@ -206,6 +978,11 @@ class IQM_EXPORT_PIPELINE_PT_AnimationsSubpanel(Panel):
         row.label(text="Action list source:")
         row.prop(settings, "action_list_source", text="Action list source", expand=True)
 
+        if settings.action_list_source != "none":
+            row = layout.row(align=True)
+            row.label(text="Export mode:")
+            row.prop(settings, "animation_export_mode", expand=True)
+
         if settings.action_list_source == "string":
             row = layout.row()
             row.prop(settings, "action_list_string")
@@ -255,6 +1032,21 @@ class IQM_EXPORT_PIPELINE_PT_AnimationsSubpanel(Panel):
             col.operator("action_items.list_add", text="", icon="ADD")
             col.operator("action_items.list_remove", text="", icon="REMOVE")
 
+            row = layout.row()
+            row.operator("action_items.list_populate", icon="ARMATURE_DATA")
+
+        if settings.action_list_source != "none":
+            layout.prop(settings, "use_fast_sampling")
+            layout.prop(settings, "use_animation_compression")
+            layout.prop(settings, "use_compact_animations")
+
+            # The tolerances are shared by compression and compact animations.
+            col = layout.column(align=True)
+            col.enabled = settings.use_animation_compression or settings.use_compact_animations
+            col.prop(settings, "compression_translation_tolerance", text="Translation")
+            col.prop(settings, "compression_rotation_tolerance", text="Rotation")
+            col.prop(settings, "compression_scale_tolerance", text="Scale")
+
 
 class IQM_EXPORT_PIPELINE_PT_OutputSubpanel(Panel):
     """Creates a subpanel in the IQM Export Pipeline for storing output properties."""
@@ -273,7 +1065,68 @@ class IQM_EXPORT_PIPELINE_PT_OutputSubpanel(Panel):
         row.prop(settings, "export_directory")
 
         row = layout.row()
-        row.operator("export.iqm_pipeline", text="Export")
+        row.prop(settings, "lod_ratios")
+
+        row = layout.row()
+        row.prop(settings, "use_vertex_welding")
+
+        row = layout.row()
+        row.prop(settings, "vertex_format")
+
+        row = layout.row(align=True)
+        row.prop(settings, "use_vertex_cache_optimization")
+        sub = row.row(align=True)
+        sub.active = settings.use_vertex_cache_optimization
+        sub.prop(settings, "vertex_cache_size")
+
+        row = layout.row(align=True)
+        row.prop(settings, "use_limit_checks")
+        sub = row.row(align=True)
+        sub.active = settings.use_limit_checks
+        sub.prop(settings, "max_bones", text="Bones")
+        sub.prop(settings, "max_weights_per_vertex", text="Weights")
+
+        row = layout.row(align=True)
+        row.prop(settings, "use_packaging", text="")
+        sub = row.row(align=True)
+        sub.active = settings.use_packaging
+        sub.prop(settings, "package_path")
+
+        row = layout.row(align=True)
+        row.active = settings.use_packaging
+        row.prop(settings, "package_prefix", text="Folder")
+        row.prop(settings, "package_compression_level")
+
+        row = layout.row(align=True)
+        row.prop(settings, "use_live_link", text="")
+        sub = row.row(align=True)
+        sub.active = settings.use_live_link
+        sub.prop(settings, "live_link_address", text="Live Link")
+        sub.prop(settings, "live_link_send_contents", text="", icon="FILE")
+        if settings.use_live_link:
+            server = live_link.get_server()
+            row = layout.row()
+            row.label(text=f"{server.client_count} clients connected" if server else "Not listening, check the console", icon="LINKED")
+
+        row = layout.row(align=True)
+        row.prop(settings, "use_export_cache")
+        sub = row.row(align=True)
+        sub.active = settings.use_export_cache
+        sub.prop(settings, "export_cache_max_entries", text="Entries")
+        sub.prop(settings, "export_cache_max_age_days", text="Days")
+
+        row = layout.row()
+        row.prop(settings, "session_cache_size", text="Session Cache (MB)")
+
+        row = layout.row(align=True)
+        # The panel exports in the background so Blender stays responsive, scripts can call export.iqm_pipeline directly.
+        row.operator("export.iqm_pipeline_background", text="Export")
+        row.prop(settings, "use_profiling", text="", icon="TIME")
+        row.prop(settings, "use_change_report", text="", icon="MODIFIER")
+
+        row = layout.row(align=True)
+        row.prop(settings, "batch_worker_count")
+        row.operator("export.iqm_pipeline_batch", text="Batch Export")
 
 
 class IQM_EXPORT_PIPELINE_PT_TransformOffsetSubpanel(Panel):
@@ -302,9 +1155,13 @@ class IQM_EXPORT_PIPELINE_PT_TransformOffsetSubpanel(Panel):
         row.prop(settings, "offset_scale", expand=True)
 
 
+# Classes that store data. These are registered on their own by the headless command-line build (see cli.py).
+property_classes = [
+    IQM_EXPORT_PIPELINE_SettingsProp,
+]
+
 classes = [
     IQM_EXPORT_PIPELINE_OT_Export,
-    IQM_EXPORT_PIPELINE_SettingsProp,
     IQM_EXPORT_PIPELINE_PT_Panel,
     IQM_EXPORT_PIPELINE_PT_AnimationsSubpanel,
     IQM_EXPORT_PIPELINE_PT_TransformOffsetSubpanel,
@@ -312,17 +1169,50 @@ classes = [
 ]
 
 
-def register():
-    for class_to_register in classes:
+def register_properties():
+    for class_to_register in property_classes:
         bpy.utils.register_class(class_to_register)
 
     Scene.iqm_export_pipeline_settings = PointerProperty(type=IQM_EXPORT_PIPELINE_SettingsProp)
     Collection.iqm_export_pipeline_file_name = StringProperty(name="File Name", subtype="FILE_NAME", default="ExampleFile")
 
 
-def unregister():
-    for class_to_unregister in classes:
+def unregister_properties():
+    for class_to_unregister in property_classes:
         bpy.utils.unregister_class(class_to_unregister)
 
     del Scene.iqm_export_pipeline_settings
     del Collection.iqm_export_pipeline_file_name
+
+
+@persistent
+def _load_post(*args):
+    # The live link is saved with the scene, start or stop the server to match the loaded file.
+    update_live_link(bpy.context.scene.iqm_export_pipeline_settings, bpy.context)
+
+
+def register():
+    register_properties()
+
+    for class_to_register in classes:
+        bpy.utils.register_class(class_to_register)
+
+    validation_cache.register()
+    export_validation.register()
+    session_cache.register()
+    bpy.app.handlers.load_post.append(_load_post)
+
+
+def unregister():
+    if _load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_load_post)
+    live_link.stop_server()
+
+    session_cache.unregister()
+    export_validation.unregister()
+    validation_cache.unregister()
+
+    for class_to_unregister in classes:
+        bpy.utils.unregister_class(class_to_unregister)
+
+    unregister_properties()
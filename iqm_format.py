@@ -0,0 +1,445 @@
+# Reading and writing of Inter-Quake Model (.iqm) files, see https://github.com/lsalzman/iqm/blob/master/iqm.txt
+#
+# This module doesn't depend on bpy, so it can also be used by tools that run outside of Blender.
+
+import struct
+from dataclasses import dataclass, field
+import numpy as np
+
+IQM_MAGIC: bytes = b"INTERQUAKEMODEL\0"
+IQM_VERSION: int = 2
+
+HEADER_FIELDS: tuple[str, ...] = (
+    "version",
+    "filesize",
+    "flags",
+    "num_text",
+    "ofs_text",
+    "num_meshes",
+    "ofs_meshes",
+    "num_vertexarrays",
+    "num_vertexes",
+    "ofs_vertexarrays",
+    "num_triangles",
+    "ofs_triangles",
+    "ofs_adjacency",
+    "num_joints",
+    "ofs_joints",
+    "num_poses",
+    "ofs_poses",
+    "num_anims",
+    "ofs_anims",
+    "num_frames",
+    "num_framechannels",
+    "ofs_frames",
+    "ofs_bounds",
+    "num_comment",
+    "ofs_comment",
+    "num_extensions",
+    "ofs_extensions",
+)
+HEADER_STRUCT = struct.Struct("<16s27I")
+
+# Vertex array types.
+IQM_POSITION: int = 0
+IQM_TEXCOORD: int = 1
+IQM_NORMAL: int = 2
+IQM_TANGENT: int = 3
+IQM_BLENDINDEXES: int = 4
+IQM_BLENDWEIGHTS: int = 5
+IQM_COLOR: int = 6
+IQM_CUSTOM: int = 0x10
+
+# Vertex array formats.
+IQM_BYTE: int = 0
+IQM_UBYTE: int = 1
+IQM_SHORT: int = 2
+IQM_USHORT: int = 3
+IQM_INT: int = 4
+IQM_UINT: int = 5
+IQM_HALF: int = 6
+IQM_FLOAT: int = 7
+IQM_DOUBLE: int = 8
+
+FORMAT_DTYPES: dict[int, np.dtype] = {
+    IQM_BYTE: np.dtype("<i1"),
+    IQM_UBYTE: np.dtype("<u1"),
+    IQM_SHORT: np.dtype("<i2"),
+    IQM_USHORT: np.dtype("<u2"),
+    IQM_INT: np.dtype("<i4"),
+    IQM_UINT: np.dtype("<u4"),
+    IQM_HALF: np.dtype("<f2"),
+    IQM_FLOAT: np.dtype("<f4"),
+    IQM_DOUBLE: np.dtype("<f8"),
+}
+
+# Animation flags.
+IQM_LOOP: int = 1
+
+# Number of channels of a pose: translate (3), rotate (4, a quaternion stored as x, y, z, w) and scale (3).
+POSE_CHANNELS: int = 10
+
+MESH_DTYPE = np.dtype(
+    [
+        ("name", "<u4"),
+        ("material", "<u4"),
+        ("first_vertex", "<u4"),
+        ("num_vertexes", "<u4"),
+        ("first_triangle", "<u4"),
+        ("num_triangles", "<u4"),
+    ]
+)
+VERTEXARRAY_DTYPE = np.dtype([("type", "<u4"), ("flags", "<u4"), ("format", "<u4"), ("size", "<u4"), ("offset", "<u4")])
+JOINT_DTYPE = np.dtype([("name", "<u4"), ("parent", "<i4"), ("translate", "<f4", 3), ("rotate", "<f4", 4), ("scale", "<f4", 3)])
+POSE_DTYPE = np.dtype(
+    [
+        ("parent", "<i4"),
+        ("channelmask", "<u4"),
+        ("channeloffset", "<f4", POSE_CHANNELS),
+        ("channelscale", "<f4", POSE_CHANNELS),
+    ]
+)
+ANIM_DTYPE = np.dtype(
+    [("name", "<u4"), ("first_frame", "<u4"), ("num_frames", "<u4"), ("framerate", "<f4"), ("flags", "<u4")]
+)
+BOUNDS_DTYPE = np.dtype([("bbmin", "<f4", 3), ("bbmax", "<f4", 3), ("xyradius", "<f4"), ("radius", "<f4")])
+EXTENSION_STRUCT = struct.Struct("<4I")
+TRIANGLE_DTYPE = np.dtype("<u4")
+
+# Marks a triangle edge without a neighbour in the adjacency section.
+NO_NEIGHBOUR: int = 0xFFFFFFFF
+FRAME_DTYPE = np.dtype("<u2")
+
+# Channels whose range over all frames is smaller than this are stored as a constant, like the reference exporter does.
+CHANNEL_EPSILON: float = 1.0e-10
+
+
+class IQMFormatError(ValueError):
+    """Raised when a file isn't a valid IQM file."""
+
+
+@dataclass
+class VertexArray:
+    """A vertex array and its data, with one row of size components per vertex."""
+
+    type: int
+    format: int
+    size: int
+    data: np.ndarray
+    flags: int = 0
+
+
+@dataclass
+class Extension:
+    name: int
+    data: bytes
+
+
+@dataclass
+class IQMModel:
+    """The contents of an IQM file. Offsets are recomputed when the model is written, so sections can be edited freely."""
+
+    flags: int = 0
+    text: bytes = b"\0"
+    meshes: np.ndarray = field(default_factory=lambda: np.zeros(0, MESH_DTYPE))
+    num_vertexes: int = 0
+    vertex_arrays: list[VertexArray] = field(default_factory=list)
+    triangles: np.ndarray = field(default_factory=lambda: np.zeros((0, 3), TRIANGLE_DTYPE))
+    adjacency: np.ndarray = None
+    joints: np.ndarray = field(default_factory=lambda: np.zeros(0, JOINT_DTYPE))
+    poses: np.ndarray = field(default_factory=lambda: np.zeros(0, POSE_DTYPE))
+    anims: np.ndarray = field(default_factory=lambda: np.zeros(0, ANIM_DTYPE))
+    frames: np.ndarray = field(default_factory=lambda: np.zeros((0, 0), FRAME_DTYPE))
+    bounds: np.ndarray = None
+    comment: bytes = b""
+    extensions: list[Extension] = field(default_factory=list)
+
+    def get_string(self, offset: int) -> str:
+        """Read a null-terminated string from the text section."""
+
+        end = self.text.index(b"\0", offset)
+        return self.text[offset:end].decode("utf-8", errors="replace")
+
+    def add_string(self, string: str) -> int:
+        """Add a string to the text section (unless it's already there), and return its offset."""
+
+        encoded = string.encode("utf-8") + b"\0"
+        offset = self.text.find(encoded)
+        # Only reuse a match that starts a string, not one that ends a longer string.
+        while offset > 0 and self.text[offset - 1] != 0:
+            offset = self.text.find(encoded, offset + 1)
+        if offset >= 0:
+            return offset
+
+        offset = len(self.text)
+        self.text += encoded
+        return offset
+
+    def find_vertex_array(self, array_type: int) -> VertexArray:
+        """Find the first vertex array of array_type, or None if there isn't one."""
+
+        return next((vertex_array for vertex_array in self.vertex_arrays if vertex_array.type == array_type), None)
+
+
+def _read_array(buffer, offset: int, count: int, dtype) -> np.ndarray:
+    dtype = np.dtype(dtype)
+    if offset + count * dtype.itemsize > len(buffer):
+        raise IQMFormatError("A section extends past the end of the file")
+    return np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).copy()
+
+
+def parse_header(buffer) -> dict[str, int]:
+    """Parse the header of an IQM file."""
+
+    if len(buffer) < HEADER_STRUCT.size:
+        raise IQMFormatError("The file is too small to be an IQM file")
+
+    magic, *values = HEADER_STRUCT.unpack_from(buffer, 0)
+    if magic != IQM_MAGIC:
+        raise IQMFormatError("The file isn't an IQM file")
+
+    header = dict(zip(HEADER_FIELDS, values))
+    if header["version"] != IQM_VERSION:
+        raise IQMFormatError(f"Unsupported IQM version {header['version']}")
+
+    return header
+
+
+def parse_iqm(buffer) -> IQMModel:
+    """Parse the contents of an IQM file."""
+
+    header = parse_header(buffer)
+    model = IQMModel(flags=header["flags"], num_vertexes=header["num_vertexes"])
+
+    if header["num_text"]:
+        model.text = bytes(buffer[header["ofs_text"] : header["ofs_text"] + header["num_text"]])
+
+    model.meshes = _read_array(buffer, header["ofs_meshes"], header["num_meshes"], MESH_DTYPE)
+
+    vertex_arrays = _read_array(buffer, header["ofs_vertexarrays"], header["num_vertexarrays"], VERTEXARRAY_DTYPE)
+    for vertex_array in vertex_arrays:
+        dtype = FORMAT_DTYPES.get(int(vertex_array["format"]))
+        if dtype is None:
+            raise IQMFormatError(f"Unknown vertex array format {vertex_array['format']}")
+
+        size = int(vertex_array["size"])
+        data = _read_array(buffer, int(vertex_array["offset"]), header["num_vertexes"] * size, dtype)
+        model.vertex_arrays.append(
+            VertexArray(
+                type=int(vertex_array["type"]),
+                format=int(vertex_array["format"]),
+                size=size,
+                data=data.reshape(header["num_vertexes"], size),
+                flags=int(vertex_array["flags"]),
+            )
+        )
+
+    num_triangles = header["num_triangles"]
+    model.triangles = _read_array(buffer, header["ofs_triangles"], num_triangles * 3, TRIANGLE_DTYPE).reshape(-1, 3)
+    if header["ofs_adjacency"]:
+        model.adjacency = _read_array(buffer, header["ofs_adjacency"], num_triangles * 3, TRIANGLE_DTYPE).reshape(-1, 3)
+
+    model.joints = _read_array(buffer, header["ofs_joints"], header["num_joints"], JOINT_DTYPE)
+    model.poses = _read_array(buffer, header["ofs_poses"], header["num_poses"], POSE_DTYPE)
+    model.anims = _read_array(buffer, header["ofs_anims"], header["num_anims"], ANIM_DTYPE)
+
+    num_frames, num_framechannels = header["num_frames"], header["num_framechannels"]
+    model.frames = _read_array(buffer, header["ofs_frames"], num_frames * num_framechannels, FRAME_DTYPE)
+    model.frames = model.frames.reshape(num_frames, num_framechannels)
+    if header["ofs_bounds"]:
+        model.bounds = _read_array(buffer, header["ofs_bounds"], num_frames, BOUNDS_DTYPE)
+
+    if header["num_comment"]:
+        model.comment = bytes(buffer[header["ofs_comment"] : header["ofs_comment"] + header["num_comment"]])
+
+    # Extensions form a linked list.
+    ofs_extension = header["ofs_extensions"]
+    for _ in range(header["num_extensions"]):
+        if not ofs_extension:
+            break
+        name, num_data, ofs_data, ofs_extension = EXTENSION_STRUCT.unpack_from(buffer, ofs_extension)
+        model.extensions.append(Extension(name=name, data=bytes(buffer[ofs_data : ofs_data + num_data])))
+
+    return model
+
+
+def read_iqm(filepath: str) -> IQMModel:
+    with open(filepath, "rb") as iqm_file:
+        return parse_iqm(iqm_file.read())
+
+
+def read_header(filepath: str) -> dict[str, int]:
+    """Read only the header of an IQM file, which holds the number of vertices, joints, frames, etc."""
+
+    with open(filepath, "rb") as iqm_file:
+        return parse_header(iqm_file.read(HEADER_STRUCT.size))
+
+
+def _align(offset: int, alignment: int = 4) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def serialize_iqm(model: IQMModel) -> bytearray:
+    """Lay out the sections of model and return the contents of the IQM file."""
+
+    header = dict.fromkeys(HEADER_FIELDS, 0)
+    header["version"] = IQM_VERSION
+    header["flags"] = model.flags
+    sections: dict[int, bytes] = {}
+    offset = HEADER_STRUCT.size
+
+    def add_section(data: bytes) -> int:
+        nonlocal offset
+        offset = _align(offset)
+        section_offset = offset
+        sections[section_offset] = data
+        offset += len(data)
+        return section_offset
+
+    if model.text:
+        header["num_text"] = len(model.text)
+        header["ofs_text"] = add_section(model.text)
+
+    if model.meshes.size:
+        header["num_meshes"] = len(model.meshes)
+        header["ofs_meshes"] = add_section(model.meshes.astype(MESH_DTYPE).tobytes())
+
+    if model.vertex_arrays:
+        header["num_vertexes"] = model.num_vertexes
+        header["num_vertexarrays"] = len(model.vertex_arrays)
+        vertex_array_headers = np.zeros(len(model.vertex_arrays), VERTEXARRAY_DTYPE)
+        header["ofs_vertexarrays"] = add_section(vertex_array_headers.tobytes())
+
+        for i, vertex_array in enumerate(model.vertex_arrays):
+            data = np.ascontiguousarray(vertex_array.data, dtype=FORMAT_DTYPES[vertex_array.format])
+            if data.shape != (model.num_vertexes, vertex_array.size):
+                raise IQMFormatError(f"Vertex array {i} doesn't have {model.num_vertexes} rows of {vertex_array.size} values")
+
+            vertex_array_headers[i] = (vertex_array.type, vertex_array.flags, vertex_array.format, vertex_array.size, 0)
+            vertex_array_headers[i]["offset"] = add_section(data.tobytes())
+
+        # The headers were added before their offsets were known, so replace them.
+        sections[header["ofs_vertexarrays"]] = vertex_array_headers.tobytes()
+
+    if len(model.triangles):
+        header["num_triangles"] = len(model.triangles)
+        header["ofs_triangles"] = add_section(np.ascontiguousarray(model.triangles, TRIANGLE_DTYPE).tobytes())
+        if model.adjacency is not None:
+            header["ofs_adjacency"] = add_section(np.ascontiguousarray(model.adjacency, TRIANGLE_DTYPE).tobytes())
+
+    if model.joints.size:
+        header["num_joints"] = len(model.joints)
+        header["ofs_joints"] = add_section(model.joints.astype(JOINT_DTYPE).tobytes())
+
+    if model.poses.size:
+        header["num_poses"] = len(model.poses)
+        header["ofs_poses"] = add_section(model.poses.astype(POSE_DTYPE).tobytes())
+
+    if model.anims.size:
+        header["num_anims"] = len(model.anims)
+        header["ofs_anims"] = add_section(model.anims.astype(ANIM_DTYPE).tobytes())
+
+    if model.frames.size:
+        header["num_frames"], header["num_framechannels"] = model.frames.shape
+        header["ofs_frames"] = add_section(np.ascontiguousarray(model.frames, FRAME_DTYPE).tobytes())
+    elif len(model.frames):
+        # Animations where every channel is constant have frames but no frame channels.
+        header["num_frames"] = len(model.frames)
+
+    if model.bounds is not None and len(model.bounds):
+        header["num_frames"] = len(model.bounds)
+        header["ofs_bounds"] = add_section(model.bounds.astype(BOUNDS_DTYPE).tobytes())
+
+    if model.comment:
+        header["num_comment"] = len(model.comment)
+        header["ofs_comment"] = add_section(model.comment)
+
+    if model.extensions:
+        header["num_extensions"] = len(model.extensions)
+        extension_offsets = []
+        for extension in model.extensions:
+            extension_offsets.append((add_section(bytes(EXTENSION_STRUCT.size)), add_section(extension.data)))
+
+        header["ofs_extensions"] = extension_offsets[0][0]
+        for i, (extension, (header_offset, data_offset)) in enumerate(zip(model.extensions, extension_offsets)):
+            next_offset = extension_offsets[i + 1][0] if i + 1 < len(extension_offsets) else 0
+            sections[header_offset] = EXTENSION_STRUCT.pack(extension.name, len(extension.data), data_offset, next_offset)
+
+    header["filesize"] = offset
+
+    buffer = bytearray(offset)
+    HEADER_STRUCT.pack_into(buffer, 0, IQM_MAGIC, *(header[name] for name in HEADER_FIELDS))
+    for section_offset, data in sections.items():
+        buffer[section_offset : section_offset + len(data)] = data
+
+    return buffer
+
+
+def write_iqm(model: IQMModel, filepath: str):
+    with open(filepath, "wb") as iqm_file:
+        iqm_file.write(serialize_iqm(model))
+
+
+def pose_channel_columns(poses: np.ndarray) -> list[tuple[int, int]]:
+    """List the (pose, channel) that each column of the frame data belongs to, in the order they are stored."""
+
+    return [
+        (pose_index, channel)
+        for pose_index, channelmask in enumerate(poses["channelmask"])
+        for channel in range(POSE_CHANNELS)
+        if channelmask & (1 << channel)
+    ]
+
+
+def decode_frames(model: IQMModel) -> np.ndarray:
+    """Decode the frame data into an array of channel values, of shape (frames, poses, POSE_CHANNELS)."""
+
+    num_frames = len(model.frames)
+    values = np.repeat(model.poses["channeloffset"][np.newaxis].astype(np.float64), num_frames, axis=0)
+
+    columns = pose_channel_columns(model.poses)
+    if columns:
+        pose_indices, channels = (np.array(indices) for indices in zip(*columns))
+        scales = model.poses["channelscale"][pose_indices, channels].astype(np.float64)
+        values[:, pose_indices, channels] += model.frames.astype(np.float64) * scales
+
+    return values
+
+
+def encode_frames(model: IQMModel, values: np.ndarray, pose_indices=None):
+    """Quantize channel values of shape (frames, poses, POSE_CHANNELS) into the poses and frame data of model.
+    When pose_indices is given, only those poses are re-quantized, and the frame data of the others is kept as is.
+    """
+
+    num_frames = values.shape[0]
+    poses = model.poses.copy()
+    reencoded = set(range(len(poses)) if pose_indices is None else pose_indices)
+
+    old_columns = {column: i for i, column in enumerate(pose_channel_columns(model.poses))}
+    if num_frames:
+        minimums = values.min(axis=0)
+        maximums = values.max(axis=0)
+    else:
+        # Without frames every channel is constant, at the channel offset of its pose.
+        minimums = maximums = poses["channeloffset"].astype(np.float64)
+
+    for pose_index in reencoded:
+        ranges = maximums[pose_index] - minimums[pose_index]
+        animated = ranges >= CHANNEL_EPSILON
+        poses[pose_index]["channeloffset"] = minimums[pose_index]
+        poses[pose_index]["channelscale"] = np.where(animated, ranges / 65535.0, 0.0)
+        poses[pose_index]["channelmask"] = sum(1 << channel for channel in range(POSE_CHANNELS) if animated[channel])
+
+    columns = pose_channel_columns(poses)
+    frames = np.zeros((num_frames, len(columns)), FRAME_DTYPE)
+
+    for i, (pose_index, channel) in enumerate(columns):
+        if pose_index in reencoded:
+            pose = poses[pose_index]
+            quantized = (values[:, pose_index, channel] - pose["channeloffset"][channel]) / pose["channelscale"][channel]
+            frames[:, i] = np.clip(np.rint(quantized), 0, 65535)
+        else:
+            frames[:, i] = model.frames[:, old_columns[(pose_index, channel)]]
+
+    model.poses = poses
+    model.frames = frames
@@ -0,0 +1,184 @@
+# Transform stages that modify the contents of an exported IQM file, instead of the objects in the scene.
+#
+# This module doesn't depend on bpy, so it can also be used by tools that run outside of Blender.
+
+import numpy as np
+
+if __package__:
+    from .iqm_format import IQM_NORMAL, IQM_POSITION, IQM_TANGENT, IQMModel, decode_frames, encode_frames
+else:
+    from iqm_format import IQM_NORMAL, IQM_POSITION, IQM_TANGENT, IQMModel, decode_frames, encode_frames
+
+
+def quaternion_to_matrix(quaternions: np.ndarray) -> np.ndarray:
+    """Convert (x, y, z, w) quaternions of shape (..., 4) to rotation matrices of shape (..., 3, 3)."""
+
+    quaternions = quaternions / np.linalg.norm(quaternions, axis=-1, keepdims=True)
+    x, y, z, w = np.moveaxis(quaternions, -1, 0)
+
+    return np.stack(
+        [
+            np.stack([1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)], axis=-1),
+            np.stack([2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)], axis=-1),
+            np.stack([2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)], axis=-1),
+        ],
+        axis=-2,
+    )
+
+
+def matrix_to_quaternion(matrices: np.ndarray) -> np.ndarray:
+    """Convert rotation matrices of shape (..., 3, 3) to (x, y, z, w) quaternions of shape (..., 4)."""
+
+    m = matrices
+    m00, m11, m22 = m[..., 0, 0], m[..., 1, 1], m[..., 2, 2]
+
+    # Compute every branch of Shepperd's method, then pick the numerically stable one for each matrix.
+    candidates = np.stack(
+        [
+            np.stack([m[..., 2, 1] - m[..., 1, 2], m[..., 0, 2] - m[..., 2, 0], m[..., 1, 0] - m[..., 0, 1], 1 + m00 + m11 + m22], axis=-1),
+            np.stack([1 + m00 - m11 - m22, m[..., 0, 1] + m[..., 1, 0], m[..., 0, 2] + m[..., 2, 0], m[..., 2, 1] - m[..., 1, 2]], axis=-1),
+            np.stack([m[..., 0, 1] + m[..., 1, 0], 1 + m11 - m00 - m22, m[..., 1, 2] + m[..., 2, 1], m[..., 0, 2] - m[..., 2, 0]], axis=-1),
+            np.stack([m[..., 0, 2] + m[..., 2, 0], m[..., 1, 2] + m[..., 2, 1], 1 + m22 - m00 - m11, m[..., 1, 0] - m[..., 0, 1]], axis=-1),
+        ],
+        axis=-2,
+    )
+    branch = np.argmax(np.stack([m00 + m11 + m22, m00, m11, m22], axis=-1), axis=-1)
+    quaternions = np.take_along_axis(candidates, branch[..., np.newaxis, np.newaxis], axis=-2)[..., 0, :]
+
+    return quaternions / np.linalg.norm(quaternions, axis=-1, keepdims=True)
+
+
+def compose_matrices(translations: np.ndarray, rotations: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Compose translations (..., 3), quaternion rotations (..., 4) and scales (..., 3) into matrices of shape (..., 4, 4)."""
+
+    matrices = np.zeros(translations.shape[:-1] + (4, 4))
+    matrices[..., :3, :3] = quaternion_to_matrix(rotations) * scales[..., np.newaxis, :]
+    matrices[..., :3, 3] = translations
+    matrices[..., 3, 3] = 1.0
+    return matrices
+
+
+def decompose_matrices(matrices: np.ndarray):
+    """Decompose matrices of shape (..., 4, 4) into translations, quaternion rotations and scales.
+    Like mathutils.Matrix.decompose(), a negative determinant is represented by negating all three scales.
+    """
+
+    basis = matrices[..., :3, :3]
+    scales = np.linalg.norm(basis, axis=-2)
+    scales = np.where(np.linalg.det(basis)[..., np.newaxis] < 0, -scales, scales)
+
+    return matrices[..., :3, 3].copy(), matrix_to_quaternion(basis / scales[..., np.newaxis, :]), scales
+
+
+def make_quaternions_continuous(quaternions: np.ndarray) -> np.ndarray:
+    """Flip quaternions of shape (frames, 4) where needed, so consecutive frames are in the same hemisphere.
+    q and -q represent the same rotation, but interpolating between them takes the long way around.
+    """
+
+    if len(quaternions) < 2:
+        return quaternions
+
+    dots = np.einsum("ij,ij->i", quaternions[1:], quaternions[:-1])
+    signs = np.cumprod(np.concatenate([[1.0], np.where(dots < 0, -1.0, 1.0)]))
+    return quaternions * signs[:, np.newaxis]
+
+
+def is_identity(matrix: np.ndarray) -> bool:
+    return np.allclose(matrix, np.identity(4), rtol=0.0, atol=1.0e-7)
+
+
+def _transform_vertex_arrays(model: IQMModel, matrix: np.ndarray):
+    linear = matrix[:3, :3]
+    normal_matrix = np.linalg.inv(linear).T
+    mirrored = np.linalg.det(linear) < 0
+
+    for vertex_array in model.vertex_arrays:
+        data = vertex_array.data.astype(np.float64)
+
+        if vertex_array.type == IQM_POSITION:
+            data[:, :3] = data[:, :3] @ linear.T + matrix[:3, 3]
+
+        elif vertex_array.type == IQM_NORMAL:
+            data[:, :3] = data[:, :3] @ normal_matrix.T
+            data[:, :3] /= np.maximum(np.linalg.norm(data[:, :3], axis=1, keepdims=True), 1.0e-12)
+
+        elif vertex_array.type == IQM_TANGENT:
+            data[:, :3] = data[:, :3] @ linear.T
+            data[:, :3] /= np.maximum(np.linalg.norm(data[:, :3], axis=1, keepdims=True), 1.0e-12)
+            # The fourth component is the handedness of the bitangent, which a mirroring transform flips.
+            if mirrored and vertex_array.size == 4:
+                data[:, 3] = -data[:, 3]
+
+        else:
+            continue
+
+        vertex_array.data = data.astype(vertex_array.data.dtype)
+
+    if mirrored:
+        # A mirroring transform turns front faces into back faces, so swap the winding of every triangle.
+        # The neighbor across each edge moves along with the edge: (v0 v1, v1 v2, v2 v0) becomes (v0 v2, v2 v1, v1 v0).
+        model.triangles = model.triangles[:, [0, 2, 1]]
+        if model.adjacency is not None:
+            model.adjacency = model.adjacency[:, [2, 1, 0]]
+
+
+def _transform_bounds(model: IQMModel, matrix: np.ndarray):
+    bounds = model.bounds
+    linear = matrix[:3, :3]
+    translation = matrix[:3, 3]
+
+    # The new axis-aligned box has to contain all 8 transformed corners of the old box.
+    corner_selectors = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=bool)
+    corners = np.where(corner_selectors[np.newaxis], bounds["bbmax"][:, np.newaxis], bounds["bbmin"][:, np.newaxis])
+    corners = corners @ linear.T + translation
+
+    max_scale = np.abs(np.linalg.svd(linear, compute_uv=False)).max()
+    radius = bounds["radius"] * max_scale + np.linalg.norm(translation)
+
+    bounds["bbmin"] = corners.min(axis=1)
+    bounds["bbmax"] = corners.max(axis=1)
+    bounds["radius"] = radius
+    # Both the new box and the new sphere contain every vertex, so the smaller of the two estimates is still conservative.
+    box_xyradius = np.linalg.norm(np.maximum(np.abs(bounds["bbmin"][:, :2]), np.abs(bounds["bbmax"][:, :2])), axis=1)
+    bounds["xyradius"] = np.minimum(box_xyradius, radius)
+
+
+def apply_offset(model: IQMModel, matrix: np.ndarray) -> int:
+    """Transform an exported model by a 4x4 offset matrix, as if the matrix had been applied to every root object
+    before exporting: vertices, root joints, the root joint channels of every animation frame and the bounds all
+    move with the offset. Returns the number of transformed root joints.
+    """
+
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if is_identity(matrix):
+        return 0
+
+    _transform_vertex_arrays(model, matrix)
+
+    root_joints = np.flatnonzero(model.joints["parent"] < 0)
+    if len(root_joints):
+        joints = model.joints[root_joints]
+        joint_matrices = matrix @ compose_matrices(joints["translate"], joints["rotate"], joints["scale"])
+        translations, rotations, scales = decompose_matrices(joint_matrices)
+        model.joints["translate"][root_joints] = translations
+        model.joints["rotate"][root_joints] = rotations
+        model.joints["scale"][root_joints] = scales
+
+    root_poses = np.flatnonzero(model.poses["parent"] < 0)
+    if len(root_poses) and len(model.frames):
+        values = decode_frames(model)
+
+        for pose_index in root_poses:
+            channels = values[:, pose_index]
+            pose_matrices = matrix @ compose_matrices(channels[:, 0:3], channels[:, 3:7], channels[:, 7:10])
+            translations, rotations, scales = decompose_matrices(pose_matrices)
+            values[:, pose_index, 0:3] = translations
+            values[:, pose_index, 3:7] = make_quaternions_continuous(rotations)
+            values[:, pose_index, 7:10] = scales
+
+        encode_frames(model, values, pose_indices=root_poses)
+
+    if model.bounds is not None and len(model.bounds):
+        _transform_bounds(model, matrix)
+
+    return len(root_joints)
@@ -0,0 +1,286 @@
+# Live link: a local socket server that pushes freshly exported files to running game clients.
+#
+# Polling the export directory adds latency, and can pick up files that are still being written. Instead, the add-on
+# publishes each exported file once it has been moved into place, and the server sends it to every connected client:
+# - Exports that finish within BATCH_SECONDS of each other are sent together, and a file exported several times in
+#   that window is only sent once, with its latest contents.
+# - Each message is a 4-byte big-endian header length, a JSON header, then header["size"] bytes of file contents.
+#   Notification-only servers send the SHA-256 of the file with a size of 0, for clients that read the file themselves.
+#
+# The address is "host:port" for TCP (use 127.0.0.1 to only accept local clients), or "unix:/path/to/socket" for a Unix
+# domain socket. See live_link_client.py for a reference client.
+#
+# This module doesn't depend on bpy, so clients and benchmarks can run the same server outside of Blender.
+
+import hashlib
+import json
+import os
+import selectors
+import socket
+import struct
+import threading
+import time
+
+# Bumped whenever the message format changes, clients receive it in the hello message.
+PROTOCOL_VERSION: int = 1
+
+# Exports finishing within this many seconds of the first one are sent in the same batch.
+BATCH_SECONDS: float = 0.05
+
+# Sends to a client that stops reading give up after this many seconds, and the client is dropped.
+SEND_TIMEOUT: float = 5.0
+
+HEADER_LENGTH_STRUCT = struct.Struct(">I")
+
+DEFAULT_ADDRESS: str = "127.0.0.1:7870"
+
+
+def parse_address(address: str) -> tuple[int, object]:
+    """The socket family and socket address of "host:port" or "unix:/path/to/socket".
+    Raises ValueError if the address can't be parsed.
+    """
+
+    if address.startswith("unix:"):
+        if not hasattr(socket, "AF_UNIX"):
+            raise ValueError("Unix sockets aren't supported on this platform, use host:port instead")
+        return socket.AF_UNIX, address[len("unix:") :]
+
+    host, separator, port = address.rpartition(":")
+    if not separator or not port.isdigit():
+        raise ValueError(f"The live link address '{address}' should be host:port or unix:/path/to/socket")
+
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def encode_message(header: dict, payload: bytes = b"") -> bytes:
+    header_bytes = json.dumps({**header, "size": len(payload)}).encode()
+    return HEADER_LENGTH_STRUCT.pack(len(header_bytes)) + header_bytes + payload
+
+
+def _receive_exactly(sock: socket.socket, size: int) -> bytes | None:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+
+    return b"".join(chunks)
+
+
+def receive_message(sock: socket.socket) -> tuple[dict, bytes] | None:
+    """Read one message from sock, as its header and payload. Returns None once the other end has closed the socket."""
+
+    header_length = _receive_exactly(sock, HEADER_LENGTH_STRUCT.size)
+    if header_length is None:
+        return None
+
+    header_bytes = _receive_exactly(sock, HEADER_LENGTH_STRUCT.unpack(header_length)[0])
+    if header_bytes is None:
+        return None
+
+    header = json.loads(header_bytes)
+    payload = _receive_exactly(sock, header["size"]) if header["size"] else b""
+    if payload is None:
+        return None
+
+    return header, payload
+
+
+class LiveLinkServer:
+    """Accepts clients and sends them published files on a background thread."""
+
+    def __init__(self, address: str, send_contents: bool = True, batch_seconds: float = BATCH_SECONDS):
+        self.address = address
+        self.send_contents = send_contents
+        self.batch_seconds = batch_seconds
+        self.clients: list[socket.socket] = []
+        self.sent_count = 0
+
+        self._pending: dict[str, float] = {}  # Published paths, and when they were published (in time.time() seconds).
+        self._flush_time: float | None = None  # When the pending batch is sent, in time.monotonic() seconds.
+        self._lock = threading.Lock()
+        self._stopping = False
+
+        family, self._socket_address = parse_address(address)
+        self._is_unix_socket = family != socket.AF_INET
+        if self._is_unix_socket:
+            # A socket file left behind by a server that wasn't stopped would make binding fail.
+            try:
+                os.remove(self._socket_address)
+            except FileNotFoundError:
+                pass
+
+        self._listener = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            if not self._is_unix_socket:
+                self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._listener.bind(self._socket_address)
+            self._listener.listen()
+            if not self._is_unix_socket:
+                # Port 0 picks a free port, report the one that was picked.
+                host, port = self._listener.getsockname()[:2]
+                self.address = f"{host}:{port}"
+        except OSError:
+            self._listener.close()
+            raise
+
+        # Publishing writes to this pair, which wakes the server thread up from waiting on its sockets.
+        self._wake_receiver, self._wake_sender = socket.socketpair()
+        self._thread = threading.Thread(target=self._run, name="IQM live link", daemon=True)
+        self._thread.start()
+
+    @property
+    def client_count(self) -> int:
+        return len(self.clients)
+
+    def publish(self, filepaths: list[str]):
+        """Send filepaths to every client with the next batch. The files must be complete when this is called."""
+
+        if not filepaths:
+            return
+
+        with self._lock:
+            published_time = time.time()
+            for filepath in filepaths:
+                self._pending[os.path.abspath(filepath)] = published_time
+            if self._flush_time is None:
+                self._flush_time = time.monotonic() + self.batch_seconds
+
+        self._wake_sender.send(b"\0")
+
+    def stop(self):
+        """Disconnect every client and stop listening."""
+
+        self._stopping = True
+        self._wake_sender.send(b"\0")
+        self._thread.join()
+
+        for client in self.clients:
+            client.close()
+        self.clients.clear()
+        self._listener.close()
+        self._wake_receiver.close()
+        self._wake_sender.close()
+
+        if self._is_unix_socket:
+            try:
+                os.remove(self._socket_address)
+            except FileNotFoundError:
+                pass
+
+    def _run(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self._listener, selectors.EVENT_READ, "accept")
+        selector.register(self._wake_receiver, selectors.EVENT_READ, "wake")
+
+        try:
+            while not self._stopping:
+                with self._lock:
+                    flush_time = self._flush_time
+                timeout = None if flush_time is None else max(0.0, flush_time - time.monotonic())
+
+                for key, _ in selector.select(timeout):
+                    if key.data == "accept":
+                        client, _ = self._listener.accept()
+                        client.settimeout(SEND_TIMEOUT)
+                        if self._send(client, encode_message({"type": "hello", "version": PROTOCOL_VERSION})):
+                            self.clients.append(client)
+                            selector.register(client, selectors.EVENT_READ, "client")
+                    elif key.data == "wake":
+                        key.fileobj.recv(4096)
+                    else:
+                        # Clients don't send anything, so a readable client has disconnected.
+                        self._drop(key.fileobj, selector)
+
+                if flush_time is not None and time.monotonic() >= flush_time:
+                    self._flush(selector)
+        finally:
+            selector.close()
+
+    def _flush(self, selector):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._flush_time = None
+
+        messages = []
+        for filepath, published_time in sorted(pending.items()):
+            try:
+                with open(filepath, "rb") as published_file:
+                    contents = published_file.read()
+            except OSError as error:
+                print(f"Live link: couldn't read {filepath}: {error}")
+                continue
+
+            header = {
+                "type": "file",
+                "name": os.path.basename(filepath),
+                "path": filepath,
+                "sha256": hashlib.sha256(contents).hexdigest(),
+                "published": published_time,
+                "sent": time.time(),
+            }
+            messages.append(encode_message(header, contents if self.send_contents else b""))
+
+        if not messages:
+            return
+
+        batch = b"".join(messages)
+        for client in list(self.clients):
+            if not self._send(client, batch):
+                self._drop(client, selector)
+
+        self.sent_count += len(messages)
+
+    def _send(self, client: socket.socket, data: bytes) -> bool:
+        try:
+            client.sendall(data)
+        except OSError:
+            client.close()
+            return False
+
+        return True
+
+    def _drop(self, client: socket.socket, selector):
+        if client in self.clients:
+            self.clients.remove(client)
+        try:
+            selector.unregister(client)
+        except (KeyError, ValueError):
+            pass
+        client.close()
+
+
+# The server started by the add-on, if any.
+_server: LiveLinkServer | None = None
+
+
+def get_server() -> LiveLinkServer | None:
+    return _server
+
+
+def start_server(address: str, send_contents: bool = True) -> LiveLinkServer:
+    """Start the add-on's server, replacing the running one. Raises OSError or ValueError if it can't listen on address."""
+
+    global _server
+
+    stop_server()
+    _server = LiveLinkServer(address, send_contents)
+    return _server
+
+
+def stop_server():
+    global _server
+
+    if _server:
+        _server.stop()
+        _server = None
+
+
+def publish(filepaths: list[str]):
+    """Send filepaths to the clients of the add-on's server, if it's running."""
+
+    if _server:
+        _server.publish(filepaths)
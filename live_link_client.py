@@ -0,0 +1,90 @@
+# Reference client of the live link server (see live_link.py), and a stand-in consumer for measuring latency.
+#
+# Usage: python live_link_client.py [--address 127.0.0.1:7870] [--output-directory DIRECTORY]
+#
+# Prints a line per received file with the time from publishing to receiving it. With --output-directory, received
+# files are written there atomically, which is how a game that can't link against a socket library could pick them up.
+#
+# This module doesn't depend on bpy, and only uses the standard library.
+
+import argparse
+import os
+import socket
+import time
+
+if __package__:
+    from . import live_link
+else:
+    import live_link
+
+
+def connect(address: str, timeout: float = 5.0) -> socket.socket:
+    """Connect to the live link server at address, and check its hello message.
+    Raises OSError if it can't connect, and ValueError if the server speaks another protocol version.
+    """
+
+    family, socket_address = live_link.parse_address(address)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_address)
+        message = live_link.receive_message(sock)
+    except OSError:
+        sock.close()
+        raise
+
+    if message is None or message[0].get("version") != live_link.PROTOCOL_VERSION:
+        sock.close()
+        raise ValueError(f"The server at {address} doesn't speak live link protocol version {live_link.PROTOCOL_VERSION}")
+
+    sock.settimeout(None)
+    return sock
+
+
+def iter_files(sock: socket.socket):
+    """Iterate the files sent by the server, as (header, contents, seconds from publishing to receiving), until it
+    disconnects. Notification-only servers send empty contents.
+    """
+
+    while True:
+        message = live_link.receive_message(sock)
+        if message is None:
+            return
+
+        header, contents = message
+        if header["type"] == "file":
+            yield header, contents, time.time() - header["published"]
+
+
+def save_file(output_directory: str, header: dict, contents: bytes) -> str:
+    """Write contents to output_directory under the name of the file, through a temporary file."""
+
+    filepath = os.path.join(output_directory, os.path.basename(header["name"]))
+    temp_path = f"{filepath}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as output_file:
+        output_file.write(contents)
+    os.replace(temp_path, filepath)
+    return filepath
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Receive the files exported by the IQM Export Pipeline live link")
+    parser.add_argument("--address", default=live_link.DEFAULT_ADDRESS, help="host:port or unix:/path/to/socket of the server")
+    parser.add_argument("--output-directory", default="", help="write the received files to this directory")
+    args = parser.parse_args(argv)
+
+    if args.output_directory:
+        os.makedirs(args.output_directory, exist_ok=True)
+
+    with connect(args.address) as sock:
+        print(f"Connected to {args.address}")
+        for header, contents, latency in iter_files(sock):
+            if args.output_directory and contents:
+                save_file(args.output_directory, header, contents)
+            print(f"{header['name']}: {len(contents)} bytes, sha256 {header['sha256'][:12]}, {latency * 1000.0:.1f} ms after export")
+
+    print("The server disconnected")
+
+
+if __name__ == "__main__":
+    main()
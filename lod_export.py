@@ -0,0 +1,118 @@
+import os
+from contextlib import contextmanager
+import bpy
+
+# Name of the temporary Decimate modifiers, and of the collection holding the decimated copies of the meshes.
+LOD_MODIFIER_NAME: str = "IQM Export Pipeline LOD"
+
+
+def parse_lod_ratios(lod_ratios: str) -> list[float]:
+    """Parse a comma (",") separated list of triangle ratios, such as "0.5, 0.25", one per level of detail.
+    Raises ValueError if a ratio isn't a number between 0 and 1.
+    """
+
+    ratios = []
+    for text in lod_ratios.split(","):
+        text = text.strip()
+        if not text:
+            continue
+
+        try:
+            ratio = float(text)
+        except ValueError:
+            raise ValueError(f"The LOD ratio '{text}' isn't a number")
+
+        if not 0.0 < ratio < 1.0:
+            raise ValueError(f"The LOD ratio {text} must be between 0 and 1")
+
+        ratios.append(ratio)
+
+    return ratios
+
+
+def get_lod_filepath(filepath: str, level: int) -> str:
+    """The path of level of detail number level of filepath, such as file_name_lod1.iqm."""
+
+    file_path_root, file_extention = os.path.splitext(filepath)
+    return f"{file_path_root}_lod{level}{file_extention}"
+
+
+class _DecimatedObject:
+    """Forwards every attribute to a mesh object, except its evaluated version, which is the one of a decimated copy.
+    The exporter still reads the name, modifiers and materials of the original object.
+    """
+
+    def __init__(self, target, duplicate):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_duplicate", duplicate)
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    def evaluated_get(self, depsgraph):
+        return self._duplicate.evaluated_get(depsgraph)
+
+
+class _DecimatedContext:
+    """Forwards every attribute to a context, except its selected objects, which stand in for their decimated copies."""
+
+    def __init__(self, target, duplicates: dict):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_duplicates", duplicates)
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    @property
+    def selected_objects(self):
+        objects = self._target.selected_objects
+        return [_DecimatedObject(obj, self._duplicates[obj]) if obj in self._duplicates else obj for obj in objects]
+
+
+@contextmanager
+def decimated_meshes(exporter, export_collection, ratio: float):
+    """Make exporter read the mesh objects of export_collection decimated to ratio of their triangles until the
+    block finishes. Each mesh object is copied with a Decimate modifier at the end of its modifier stack, and the
+    copies are linked to a temporary collection so the depsgraph evaluates them. The exporter's collectMeshes reads
+    the evaluated meshes of the copies in place of the originals, so the objects of the scene are never edited.
+    """
+
+    collect_meshes = getattr(exporter, "collectMeshes", None)
+    if collect_meshes is None:
+        yield 0
+        return
+
+    scene = bpy.context.scene
+    lod_collection = bpy.data.collections.new(LOD_MODIFIER_NAME)
+    duplicates = {}
+    try:
+        scene.collection.children.link(lod_collection)
+        for obj in export_collection.all_objects:
+            if obj.type != "MESH":
+                continue
+
+            # The copy shares the mesh data, and keeps the transform, parent and modifiers of the original.
+            duplicate = obj.copy()
+            lod_collection.objects.link(duplicate)
+            modifier = duplicate.modifiers.new(LOD_MODIFIER_NAME, "DECIMATE")
+            modifier.decimate_type = "COLLAPSE"
+            modifier.ratio = ratio
+            duplicates[obj] = duplicate
+
+        def collect_decimated_meshes(context, *args, **kwargs):
+            return collect_meshes(_DecimatedContext(context, duplicates), *args, **kwargs)
+
+        exporter.collectMeshes = collect_decimated_meshes
+        yield len(duplicates)
+
+    finally:
+        exporter.collectMeshes = collect_meshes
+        for duplicate in duplicates.values():
+            bpy.data.objects.remove(duplicate)
+        bpy.data.collections.remove(lod_collection)
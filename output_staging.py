@@ -0,0 +1,105 @@
+import os
+import re
+import uuid
+from contextlib import contextmanager
+
+# Size of the write buffer used for staged files. Exported models are written with a few large writes instead of
+# many small ones.
+STAGING_BUFFER_SIZE: int = 1 << 20
+
+
+def get_staging_path(filepath: str) -> str:
+    """A unique temporary path in the same directory as filepath, so it can be renamed over filepath atomically.
+    The file extension is kept, since exportIQM picks the file format from it. The leading "." hides the file from
+    most directory watchers.
+    """
+
+    file_directory, file_name = os.path.split(filepath)
+    file_root, file_extention = os.path.splitext(file_name)
+    return os.path.join(file_directory, f".{file_root}.{uuid.uuid4().hex[:12]}.tmp{file_extention}")
+
+
+def remove_staging_files(filepath: str) -> int:
+    """Remove the temporary files left behind by exports of filepath that were killed before they could clean up,
+    such as cancelled background workers. Returns the number of removed files.
+    """
+
+    file_directory, file_name = os.path.split(filepath)
+    file_root, file_extention = os.path.splitext(file_name)
+    staging_name = re.compile(rf"\.{re.escape(file_root)}\.[0-9a-f]{{12}}\.tmp{re.escape(file_extention)}")
+
+    removed_count = 0
+    with os.scandir(file_directory or ".") as directory_entries:
+        for directory_entry in directory_entries:
+            if staging_name.fullmatch(directory_entry.name):
+                try:
+                    os.remove(directory_entry.path)
+                    removed_count += 1
+                except FileNotFoundError:
+                    pass
+
+    return removed_count
+
+
+def _fsync_directory(directory: str):
+    # Directories can't be opened for syncing on Windows, where the rename is durable without it.
+    if os.name == "nt":
+        return
+
+    directory_fd = os.open(directory or ".", os.O_RDONLY)
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)
+
+
+def commit_staged_file(staging_path: str, filepath: str):
+    """Flush a staged file to disk, then atomically move it into place."""
+
+    with open(staging_path, "rb+") as staged_file:
+        os.fsync(staged_file.fileno())
+
+    os.replace(staging_path, filepath)
+    _fsync_directory(os.path.dirname(filepath))
+
+
+@contextmanager
+def staged_output(filepath: str):
+    """Yield a temporary path to write the contents of filepath to.
+    When the block finishes, the temporary file is flushed to disk and renamed over filepath, so readers only ever
+    see the previous file or the complete new one. If the block raises, the temporary file is removed and filepath
+    is left untouched.
+    """
+
+    staging_path = get_staging_path(filepath)
+
+    try:
+        yield staging_path
+
+        if not os.path.isfile(staging_path):
+            raise FileNotFoundError(f"Nothing was written to {filepath}, check the console for errors")
+
+        commit_staged_file(staging_path, filepath)
+
+    except BaseException:
+        try:
+            os.remove(staging_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def write_buffered(filepath: str, data):
+    """Write data (any bytes-like object) to filepath using large buffered writes."""
+
+    view = memoryview(data).cast("B")
+    with open(filepath, "wb", buffering=STAGING_BUFFER_SIZE) as output_file:
+        for start in range(0, len(view), STAGING_BUFFER_SIZE):
+            output_file.write(view[start : start + STAGING_BUFFER_SIZE])
+
+
+def write_atomic(filepath: str, data):
+    """Write data to filepath through a staged temporary file."""
+
+    with staged_output(filepath) as staging_path:
+        write_buffered(staging_path, data)
@@ -1,3 +1,5 @@
+import ast
+import json
 import os
 import shutil
 import filecmp
@@ -7,17 +9,90 @@ from bl_ui.utils import PresetPanel
 from bl_operators.presets import AddPresetBase, ExecutePreset
 
 
+# The settings that a transform offset preset assigns.
+PRESET_VALUES: tuple[str, ...] = ("offset_location", "offset_rotation", "offset_scale")
+
+# Written to the presets install directory after installing, to recognize the bundled presets it was installed from.
+PRESETS_STAMP_FILE_NAME: str = ".bundled_presets_stamp.json"
+
+
+def get_bundled_presets_dir() -> str:
+    return os.path.join(os.path.dirname(os.path.realpath(__file__)), "presets")
+
+
+def get_presets_install_dir() -> str:
+    return os.path.join(bpy.utils.user_resource("SCRIPTS"), "presets", "iqm_export_pipeline")
+
+
+def find_preset(preset: str) -> str:
+    """Find a preset by name (such as "Quake") in the installed and bundled presets, or by the path of a preset file."""
+
+    if preset.endswith(".py"):
+        if os.path.isfile(preset):
+            return preset
+        raise FileNotFoundError(f"Preset file not found: {preset}")
+
+    for presets_dir in (get_presets_install_dir(), get_bundled_presets_dir()):
+        preset_file = os.path.join(presets_dir, preset + ".py")
+        if os.path.isfile(preset_file):
+            return preset_file
+
+    raise FileNotFoundError(f"No preset named '{preset}' is installed or bundled with the add-on")
+
+
+def read_preset(preset_file: str) -> dict[str, tuple]:
+    """Read the values a preset file assigns, without executing it (executing a preset would modify the scene)."""
+
+    with open(preset_file) as file:
+        tree = ast.parse(file.read(), filename=preset_file)
+
+    values: dict[str, tuple] = {}
+    for node in ast.walk(tree):
+        # Presets assign literals, such as: scene.iqm_export_pipeline_settings.offset_scale = (32.0, 32.0, 32.0)
+        if isinstance(node, ast.Assign) and len(node.targets) == 1:
+            target = node.targets[0]
+            if isinstance(target, ast.Attribute) and target.attr in PRESET_VALUES:
+                values[target.attr] = tuple(ast.literal_eval(node.value))
+
+    return values
+
+
+def get_bundled_presets_stamp() -> dict[str, list[int]]:
+    """The size and modification time of each bundled preset. Installing a new version of the add-on, or editing a
+    bundled preset, changes the stamp.
+    """
+
+    with os.scandir(get_bundled_presets_dir()) as directory_entries:
+        return {
+            directory_entry.name: [directory_entry.stat().st_size, directory_entry.stat().st_mtime_ns]
+            for directory_entry in sorted(directory_entries, key=lambda directory_entry: directory_entry.name)
+            if directory_entry.name.endswith(".py") and directory_entry.is_file()
+        }
+
+
 def install_presets():
     # https://sinestesia.co/blog/tutorials/using-blenders-presets-in-python/
-    bundled_presets_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "presets")
-    presets_install_dir = os.path.join(bpy.utils.user_resource("SCRIPTS"), "presets", "iqm_export_pipeline")
+    bundled_presets_dir = get_bundled_presets_dir()
+    presets_install_dir = get_presets_install_dir()
+    stamp_path = os.path.join(presets_install_dir, PRESETS_STAMP_FILE_NAME)
+
+    # This runs on every start of Blender, so skip comparing the presets when they were installed from the same
+    # bundled presets and are all still installed, which only costs reading the stamp and checking the files exist.
+    # A bundled preset the user deleted is installed again.
+    bundled_presets_stamp = get_bundled_presets_stamp()
+    try:
+        with open(stamp_path) as stamp_file:
+            if json.load(stamp_file) == bundled_presets_stamp and all(
+                os.path.isfile(os.path.join(presets_install_dir, preset_file)) for preset_file in bundled_presets_stamp
+            ):
+                return
+    except (OSError, ValueError):
+        pass
 
     if not os.path.isdir(presets_install_dir):
         os.makedirs(presets_install_dir)
 
-    bundled_presets = os.listdir(bundled_presets_dir)
-
-    for preset_file in bundled_presets:
+    for preset_file in bundled_presets_stamp:
 
         bundled_file = os.path.join(bundled_presets_dir, preset_file)
         installed_file = os.path.join(presets_install_dir, preset_file)
@@ -31,6 +106,9 @@ def install_presets():
         # Copy the file, overwrite the out-of-date file if it exists.
         shutil.copy2(os.path.join(bundled_presets_dir, preset_file), presets_install_dir)
 
+    with open(stamp_path, "w") as stamp_file:
+        json.dump(bundled_presets_stamp, stamp_file)
+
 
 class IQM_EXPORT_PIPELINE_MT_TransformOffsetPresets(Menu):
     bl_label = "Transform Offset Presets"
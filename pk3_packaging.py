@@ -0,0 +1,302 @@
+# Incremental packaging of exported files into a Quake-style pk3 (zip) archive.
+#
+# Rebuilding a large archive to replace one model rewrites every entry. Instead, the archive is updated in place:
+# - A sidecar manifest (archive.pk3.manifest.json) remembers the SHA-256 of every entry this module wrote, so
+#   unchanged files are recognized without reading the archive. When the archive was modified by another tool, the
+#   CRC-32 and size in its central directory are compared instead.
+# - Changed entries are dropped from the central directory, and their new contents are streamed to the end of the
+#   entry data, followed by a new central directory. Nothing before the first rewritten byte is touched.
+# - The space left behind by replaced entries is reclaimed when it's at the end of the entry data, which is where the
+#   previous update put them, and the archive is compacted once the remaining dead space gets too large.
+#
+# zipfile can't remove entries or copy them without recompressing, so this relies on a few of its attributes
+# (filelist, NameToInfo, start_dir and _didModify) that have been stable across Python 3 versions.
+#
+# This module doesn't depend on bpy, so it can also be used by tools that run outside of Blender.
+
+import hashlib
+import json
+import os
+import shutil
+import struct
+import time
+import zipfile
+import zlib
+from copy import copy
+from dataclasses import dataclass, field
+
+if __package__:
+    from . import output_staging
+else:
+    import output_staging
+
+# Bumped whenever the manifest format changes, which makes existing manifests untrusted.
+MANIFEST_VERSION: int = 1
+
+# Size of the chunks streamed into and copied between archives.
+COPY_CHUNK_SIZE: int = 1 << 20
+
+# Compact the archive once more than this share of it is dead space.
+COMPACT_DEAD_RATIO: float = 0.25
+
+LOCAL_HEADER_STRUCT = struct.Struct("<4s5H3L2H")
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+ZIP64_LIMIT = 0xFFFFFFFF
+
+
+@dataclass
+class PackageSummary:
+    archive_path: str
+    written: list[str] = field(default_factory=list)
+    unchanged_count: int = 0
+    compacted: bool = False
+    seconds: float = 0.0
+
+    def __str__(self) -> str:
+        archive_name = os.path.basename(self.archive_path)
+        if not self.written:
+            return f"{archive_name} is up to date ({self.unchanged_count} entries unchanged)"
+
+        compacted = ", compacted" if self.compacted else ""
+        return f"Updated {archive_name}: {len(self.written)} entries written, {self.unchanged_count} unchanged{compacted} ({self.seconds:.2f}s)"
+
+
+def get_manifest_path(archive_path: str) -> str:
+    return archive_path + ".manifest.json"
+
+
+def _load_manifest(archive_path: str) -> dict:
+    """The manifest of archive_path, with an empty entry table if it's missing, outdated, or doesn't describe the
+    archive as it is on disk.
+    """
+
+    try:
+        with open(get_manifest_path(archive_path)) as manifest_file:
+            manifest = json.load(manifest_file)
+        archive_stat = os.stat(archive_path)
+    except (OSError, ValueError):
+        return {"entries": {}}
+
+    if (
+        manifest.get("version") != MANIFEST_VERSION
+        or manifest.get("archive_size") != archive_stat.st_size
+        or manifest.get("archive_mtime_ns") != archive_stat.st_mtime_ns
+    ):
+        return {"entries": {}}
+
+    return manifest
+
+
+def _save_manifest(archive_path: str, entries: dict):
+    archive_stat = os.stat(archive_path)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "archive_size": archive_stat.st_size,
+        "archive_mtime_ns": archive_stat.st_mtime_ns,
+        "entries": dict(sorted(entries.items())),
+    }
+    output_staging.write_atomic(get_manifest_path(archive_path), json.dumps(manifest, indent=1).encode())
+
+
+def _hash_file(filepath: str) -> tuple[str, int]:
+    """The SHA-256 and CRC-32 of the contents of filepath."""
+
+    hasher = hashlib.sha256()
+    crc = 0
+    with open(filepath, "rb") as source_file:
+        while chunk := source_file.read(COPY_CHUNK_SIZE):
+            hasher.update(chunk)
+            crc = zlib.crc32(chunk, crc)
+
+    return hasher.hexdigest(), crc
+
+
+def _get_entry_end(archive_file, info: zipfile.ZipInfo) -> int:
+    """The offset just past the local header, data and data descriptor of the entry described by info."""
+
+    archive_file.seek(info.header_offset)
+    local_header = LOCAL_HEADER_STRUCT.unpack(archive_file.read(LOCAL_HEADER_STRUCT.size))
+    if local_header[0] != LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+
+    name_length, extra_length = local_header[-2:]
+    entry_end = info.header_offset + LOCAL_HEADER_STRUCT.size + name_length + extra_length + info.compress_size
+
+    # Entries written to unseekable streams are followed by a data descriptor holding their CRC and sizes.
+    if info.flag_bits & 0x08:
+        archive_file.seek(entry_end)
+        has_signature = archive_file.read(4) == DATA_DESCRIPTOR_SIGNATURE
+        is_zip64 = info.compress_size >= ZIP64_LIMIT or info.file_size >= ZIP64_LIMIT
+        entry_end += (4 if has_signature else 0) + (20 if is_zip64 else 12)
+
+    return entry_end
+
+
+def _get_live_size(archive: zipfile.ZipFile) -> int:
+    """Estimate the bytes used by the entries of archive from its central directory, assuming each local header holds
+    the same extra field as the central directory.
+    """
+
+    return sum(
+        LOCAL_HEADER_STRUCT.size + len(info.filename.encode()) + len(info.extra) + info.compress_size for info in archive.filelist
+    )
+
+
+def _find_changed_entries(archive: zipfile.ZipFile | None, files: dict[str, str], manifest: dict) -> tuple[dict, list[str]]:
+    """Compare the files to package with the entries of archive.
+    Returns the manifest entries of the files, and the names of the entries that need to be written.
+    """
+
+    infos = {info.filename: info for info in archive.infolist()} if archive else {}
+    entries = {}
+    changed_names = []
+
+    for arcname, source_path in sorted(files.items()):
+        source_stat = os.stat(source_path)
+        previous_entry = manifest["entries"].get(arcname)
+
+        # A file with the same size and modification time as when it was packaged hasn't changed since, don't hash it again.
+        if previous_entry and (previous_entry["size"], previous_entry["mtime_ns"]) == (source_stat.st_size, source_stat.st_mtime_ns):
+            digest, crc = previous_entry["sha256"], None
+        else:
+            digest, crc = _hash_file(source_path)
+
+        entries[arcname] = {"sha256": digest, "size": source_stat.st_size, "mtime_ns": source_stat.st_mtime_ns}
+
+        info = infos.get(arcname)
+        if info is None:
+            changed_names.append(arcname)
+        elif previous_entry:
+            if previous_entry["sha256"] != digest:
+                changed_names.append(arcname)
+        elif (info.CRC, info.file_size) != (crc, source_stat.st_size):
+            # Without a trusted manifest entry, fall back on the CRC-32 stored in the archive.
+            changed_names.append(arcname)
+
+    return entries, changed_names
+
+
+def _write_entries(archive: zipfile.ZipFile, files: dict[str, str], names: list[str]):
+    """Stream the files named names into archive, without reading them into memory."""
+
+    for arcname in names:
+        with open(files[arcname], "rb") as source_file, archive.open(arcname, "w", force_zip64=True) as entry_file:
+            shutil.copyfileobj(source_file, entry_file, COPY_CHUNK_SIZE)
+
+
+def _update_in_place(archive_path: str, files: dict[str, str], changed_names: list[str], compression: int, compression_level: int) -> bool:
+    """Replace the changed entries of the archive at archive_path. Returns whether the archive needs compacting.
+    If writing fails, the archive is restored to how it was.
+    """
+
+    with open(archive_path, "r+b") as archive_file:
+        archive = zipfile.ZipFile(archive_file, "a", compression=compression, compresslevel=compression_level)
+
+        # Drop the entries being replaced from the central directory.
+        for arcname in changed_names:
+            info = archive.NameToInfo.pop(arcname, None)
+            if info is not None:
+                archive.filelist.remove(info)
+
+        # Reclaim everything after the last live entry. Replaced entries usually end up there, since the previous
+        # update appended them.
+        last_info = max(archive.filelist, key=lambda info: info.header_offset, default=None)
+        write_offset = _get_entry_end(archive_file, last_info) if last_info else 0
+
+        # Keep the bytes being overwritten (the reclaimed entries and the old central directory) to roll back to.
+        archive_file.seek(write_offset)
+        rollback_data = archive_file.read()
+        archive_file.seek(write_offset)
+        archive.start_dir = write_offset
+
+        try:
+            _write_entries(archive, files, changed_names)
+            needs_compacting = archive.start_dir - _get_live_size(archive) > COMPACT_DEAD_RATIO * archive.start_dir
+            archive._didModify = True
+            archive.close()
+            archive_file.flush()
+            os.fsync(archive_file.fileno())
+
+        except BaseException:
+            # Don't let closing the archive write a central directory, then put back the original bytes.
+            archive._didModify = False
+            archive.close()
+            archive_file.seek(write_offset)
+            archive_file.write(rollback_data)
+            archive_file.truncate()
+            raise
+
+    return needs_compacting
+
+
+def _write_new_archive(archive_path: str, files: dict[str, str], compression: int, compression_level: int):
+    with output_staging.staged_output(archive_path) as staging_path:
+        with zipfile.ZipFile(staging_path, "w", compression=compression, compresslevel=compression_level) as archive:
+            _write_entries(archive, files, sorted(files))
+
+
+def compact_archive(archive_path: str):
+    """Rewrite the archive at archive_path without dead space. Entries are copied as they are, without recompressing."""
+
+    with zipfile.ZipFile(archive_path) as source, output_staging.staged_output(archive_path) as staging_path:
+        with open(staging_path, "wb") as target_file:
+            target = zipfile.ZipFile(target_file, "w")
+
+            for info in sorted(source.infolist(), key=lambda info: info.header_offset):
+                entry_end = _get_entry_end(source.fp, info)
+
+                target_info = copy(info)
+                target_info.header_offset = target_file.tell()
+                source.fp.seek(info.header_offset)
+                remaining = entry_end - info.header_offset
+                while remaining:
+                    chunk = source.fp.read(min(remaining, COPY_CHUNK_SIZE))
+                    if not chunk:
+                        raise zipfile.BadZipFile(f"{info.filename} is truncated")
+                    target_file.write(chunk)
+                    remaining -= len(chunk)
+
+                target.filelist.append(target_info)
+                target.NameToInfo[target_info.filename] = target_info
+
+            target.start_dir = target_file.tell()
+            target._didModify = True
+            target.close()
+
+
+def update_archive(archive_path: str, files: dict[str, str], compression_level: int = 6) -> PackageSummary:
+    """Add or replace the entries of the archive at archive_path with files, a dict of {entry name: file path}.
+    Only entries whose contents changed are written. Entries that aren't in files are kept. compression_level is 0
+    (stored) to 9 (smallest).
+    """
+
+    start_time = time.perf_counter()
+    summary = PackageSummary(archive_path)
+    compression = zipfile.ZIP_DEFLATED if compression_level else zipfile.ZIP_STORED
+
+    if os.path.isfile(archive_path):
+        manifest = _load_manifest(archive_path)
+        with zipfile.ZipFile(archive_path) as archive:
+            entries, changed_names = _find_changed_entries(archive, files, manifest)
+    else:
+        manifest = {"entries": {}}
+        entries, changed_names = _find_changed_entries(None, files, manifest)
+
+    summary.written = changed_names
+    summary.unchanged_count = len(files) - len(changed_names)
+
+    if not os.path.isfile(archive_path):
+        os.makedirs(os.path.dirname(os.path.abspath(archive_path)), exist_ok=True)
+        _write_new_archive(archive_path, files, compression, compression_level)
+    elif changed_names:
+        summary.compacted = _update_in_place(archive_path, files, changed_names, compression, compression_level)
+        if summary.compacted:
+            compact_archive(archive_path)
+
+    # Keep the manifest entries of files packaged by earlier runs, and remember the current state of the archive.
+    if changed_names or entries != {name: manifest["entries"].get(name) for name in entries}:
+        _save_manifest(archive_path, {**manifest["entries"], **entries})
+
+    summary.seconds = time.perf_counter() - start_time
+    return summary
@@ -0,0 +1,376 @@
+# Direct sampling of bone poses from the F-curves of actions.
+#
+# exportIQM samples each animation by setting the scene to every frame, which re-evaluates the whole depsgraph,
+# including the meshes and modifiers that don't affect the pose. For rigs whose bones are only driven by their
+# actions (no constraints, drivers or NLA tracks), the pose can be computed directly instead:
+# - The F-curves of the action are evaluated for each bone channel, and composed into basis matrices in bulk.
+# - The basis matrices are composed with the rest pose down the hierarchy, one depth level at a time.
+#
+# The sampler is handed to the exporter's own collectAnim through stand-ins of the context and armature, so the
+# exporter still decides what to write from the pose matrices, and frame changes only move the sampler. Rigs the
+# sampler can't reproduce fall back on scene.frame_set. The first sampled pose of each rig is also compared against
+# the evaluated pose, so a rig feature that isn't recognized falls back too instead of exporting the wrong pose.
+
+from contextlib import contextmanager
+import bpy
+import numpy as np
+from mathutils import Matrix
+from .action_index import BONE_DATA_PATH_PATTERN, iter_action_fcurves
+
+# The pose bone channels sampled from F-curves, and their number of components.
+CHANNEL_SIZES: dict[str, int] = {
+    "location": 3,
+    "rotation_quaternion": 4,
+    "rotation_euler": 3,
+    "rotation_axis_angle": 4,
+    "scale": 3,
+}
+
+# Animated object properties that move the armature itself, which only the depsgraph evaluates.
+OBJECT_TRANSFORM_PATHS: frozenset[str] = frozenset(
+    {
+        "location",
+        "rotation_euler",
+        "rotation_quaternion",
+        "rotation_axis_angle",
+        "scale",
+        "delta_location",
+        "delta_rotation_euler",
+        "delta_rotation_quaternion",
+        "delta_scale",
+    }
+)
+
+# Largest difference allowed between a sampled pose matrix and the evaluated one, relative to the size of the rig.
+VERIFY_TOLERANCE: float = 1e-4
+
+
+def _axis_rotations(axis: int, angles: np.ndarray) -> np.ndarray:
+    """Rotation matrices of angles (radians) about the X (0), Y (1) or Z (2) axis."""
+
+    matrices = np.zeros((len(angles), 3, 3))
+    first, second = (axis + 1) % 3, (axis + 2) % 3
+    cos, sin = np.cos(angles), np.sin(angles)
+    matrices[:, axis, axis] = 1.0
+    matrices[:, first, first] = cos
+    matrices[:, first, second] = -sin
+    matrices[:, second, first] = sin
+    matrices[:, second, second] = cos
+    return matrices
+
+
+def quaternions_to_matrices(quaternions: np.ndarray) -> np.ndarray:
+    """Rotation matrices of (w, x, y, z) quaternions, which are normalized first like Blender does."""
+
+    lengths = np.linalg.norm(quaternions, axis=1, keepdims=True)
+    identity = np.array([1.0, 0.0, 0.0, 0.0])
+    quaternions = np.where(lengths > 0.0, quaternions / np.where(lengths > 0.0, lengths, 1.0), identity)
+    w, x, y, z = quaternions.T
+
+    return np.stack(
+        [
+            np.stack([1.0 - 2.0 * (y * y + z * z), 2.0 * (x * y - w * z), 2.0 * (x * z + w * y)], axis=1),
+            np.stack([2.0 * (x * y + w * z), 1.0 - 2.0 * (x * x + z * z), 2.0 * (y * z - w * x)], axis=1),
+            np.stack([2.0 * (x * z - w * y), 2.0 * (y * z + w * x), 1.0 - 2.0 * (x * x + y * y)], axis=1),
+        ],
+        axis=1,
+    )
+
+
+def eulers_to_matrices(eulers: np.ndarray, order: str) -> np.ndarray:
+    """Rotation matrices of euler angles applied in order, such as "XYZ" (X first, then Y, then Z)."""
+
+    matrices = np.broadcast_to(np.eye(3), (len(eulers), 3, 3))
+    for axis_name in order:
+        axis = "XYZ".index(axis_name)
+        matrices = _axis_rotations(axis, eulers[:, axis]) @ matrices
+
+    return matrices
+
+
+def axis_angles_to_matrices(axis_angles: np.ndarray) -> np.ndarray:
+    """Rotation matrices of (angle, x, y, z) axis angles. A zero axis is no rotation."""
+
+    angles = axis_angles[:, 0]
+    lengths = np.linalg.norm(axis_angles[:, 1:], axis=1, keepdims=True)
+    axes = axis_angles[:, 1:] / np.where(lengths > 0.0, lengths, 1.0)
+    angles = np.where(lengths[:, 0] > 0.0, angles, 0.0)
+
+    # Rodrigues' rotation formula.
+    cross = np.zeros((len(axes), 3, 3))
+    cross[:, 0, 1], cross[:, 0, 2], cross[:, 1, 2] = -axes[:, 2], axes[:, 1], -axes[:, 0]
+    cross -= cross.transpose(0, 2, 1)
+    sin = np.sin(angles)[:, None, None]
+    cos = np.cos(angles)[:, None, None]
+    return np.eye(3) + sin * cross + (1.0 - cos) * (cross @ cross)
+
+
+def find_fallback_reason(armature, action) -> str:
+    """Why the poses of armature playing action can't be sampled from its F-curves, or "" if they can."""
+
+    if armature.data.pose_position != "POSE":
+        return "the armature is in its rest position"
+
+    if armature.parent or armature.constraints:
+        return "the armature is parented or constrained"
+
+    for animation_data in (armature.animation_data, armature.data.animation_data):
+        if animation_data and animation_data.drivers:
+            return "the armature has drivers"
+
+    if armature.animation_data and any(not track.mute for track in armature.animation_data.nla_tracks):
+        return "the armature has NLA tracks"
+
+    for pose_bone in armature.pose.bones:
+        if pose_bone.constraints:
+            return f"the bone '{pose_bone.name}' has constraints"
+
+        bone = pose_bone.bone
+        if not bone.use_inherit_rotation or bone.inherit_scale != "FULL" or not bone.use_local_location or bone.use_relative_parent:
+            return f"the bone '{pose_bone.name}' doesn't fully inherit the transform of its parent"
+
+    for fcurve in iter_action_fcurves(action):
+        if fcurve.data_path in OBJECT_TRANSFORM_PATHS:
+            return "the action moves the armature object"
+
+        # Connected bones are pinned to the tail of their parent, keying them anything but zero is left to the depsgraph.
+        match = BONE_DATA_PATH_PATTERN.match(fcurve.data_path)
+        if match and fcurve.data_path[match.end() :] == ".location":
+            bone = armature.data.bones.get(bpy.utils.unescape_identifier(match.group(1)))
+            if bone and bone.use_connect and any(point.co[1] != 0.0 for point in fcurve.keyframe_points):
+                return f"the connected bone '{bone.name}' has a location"
+
+    return ""
+
+
+class PoseSampler:
+    """Computes the pose matrices (in armature space, like PoseBone.matrix) of an armature from the F-curves of an action."""
+
+    def __init__(self, armature):
+        self.armature = armature
+        pose_bones = list(armature.pose.bones)
+        self.bone_indexes = {pose_bone.name: index for index, pose_bone in enumerate(pose_bones)}
+
+        parent_indexes = [self.bone_indexes[pose_bone.parent.name] if pose_bone.parent else -1 for pose_bone in pose_bones]
+        rest_matrices = np.array([np.array(pose_bone.bone.matrix_local) for pose_bone in pose_bones]).reshape(-1, 4, 4)
+
+        # The rest transform of each bone relative to its parent, which the pose of the parent moves.
+        self.offsets = rest_matrices.copy()
+        for index, parent_index in enumerate(parent_indexes):
+            if parent_index >= 0:
+                self.offsets[index] = np.linalg.inv(rest_matrices[parent_index]) @ rest_matrices[index]
+
+        # Group the bones by depth, so each level is composed with the already posed level above it.
+        depths = np.array([len(pose_bone.parent_recursive) for pose_bone in pose_bones], dtype=np.int32)
+        parent_indexes = np.array(parent_indexes, dtype=np.int32)
+        self.levels = []
+        for depth in range(depths.max() + 1 if len(depths) else 0):
+            level_indexes = np.flatnonzero(depths == depth)
+            self.levels.append((level_indexes, parent_indexes[level_indexes]))
+
+        # Channels without F-curves keep their current values, as they do when the scene changes frames.
+        self.channels = {
+            name: np.array([tuple(getattr(pose_bone, name)) for pose_bone in pose_bones], dtype=np.float64).reshape(-1, size)
+            for name, size in CHANNEL_SIZES.items()
+        }
+        rotation_modes = np.array([pose_bone.rotation_mode for pose_bone in pose_bones])
+        self.rotation_groups = {mode: np.flatnonzero(rotation_modes == mode) for mode in set(rotation_modes.tolist())}
+
+        self.fcurves = []
+        self.action = None
+        self.frame = None
+        self._poses: dict[float, np.ndarray] = {}
+
+    def set_action(self, action):
+        """Sample action from now on."""
+
+        self.action = action
+        self.frame = None
+        self._poses.clear()
+        self.fcurves = []
+
+        for fcurve in iter_action_fcurves(action):
+            match = BONE_DATA_PATH_PATTERN.match(fcurve.data_path)
+            if not match or fcurve.mute or (fcurve.group and fcurve.group.mute):
+                continue
+
+            bone_index = self.bone_indexes.get(bpy.utils.unescape_identifier(match.group(1)))
+            channel = fcurve.data_path[match.end() + 1 :]
+            if bone_index is not None and channel in CHANNEL_SIZES and fcurve.array_index < CHANNEL_SIZES[channel]:
+                self.fcurves.append((fcurve, self.channels[channel], bone_index, fcurve.array_index))
+
+    def get_frame(self) -> float:
+        """The frame being sampled: the last frame set through the stand-in scene, or the frame of the scene."""
+
+        if self.frame is not None:
+            return self.frame
+
+        scene = bpy.context.scene
+        return scene.frame_current + scene.frame_subframe
+
+    def sample(self, frame: float) -> np.ndarray:
+        """The pose matrices of every bone at frame, as an array of shape (bones, 4, 4)."""
+
+        poses = self._poses.get(frame)
+        if poses is not None:
+            return poses
+
+        for fcurve, values, bone_index, array_index in self.fcurves:
+            values[bone_index, array_index] = fcurve.evaluate(frame)
+
+        rotations = np.empty((len(self.offsets), 3, 3))
+        for mode, indexes in self.rotation_groups.items():
+            if mode == "QUATERNION":
+                rotations[indexes] = quaternions_to_matrices(self.channels["rotation_quaternion"][indexes])
+            elif mode == "AXIS_ANGLE":
+                rotations[indexes] = axis_angles_to_matrices(self.channels["rotation_axis_angle"][indexes])
+            else:
+                rotations[indexes] = eulers_to_matrices(self.channels["rotation_euler"][indexes], mode)
+
+        # The basis matrix of each bone is location @ rotation @ scale.
+        basis = np.zeros((len(self.offsets), 4, 4))
+        basis[:, :3, :3] = rotations * self.channels["scale"][:, None, :]
+        basis[:, :3, 3] = self.channels["location"]
+        basis[:, 3, 3] = 1.0
+        local = self.offsets @ basis
+
+        poses = np.empty_like(local)
+        for level_indexes, level_parent_indexes in self.levels:
+            if level_parent_indexes[0] < 0:
+                poses[level_indexes] = local[level_indexes]
+            else:
+                poses[level_indexes] = poses[level_parent_indexes] @ local[level_indexes]
+
+        self._poses[frame] = poses
+        return poses
+
+    def matches_evaluated_pose(self, frame: int) -> bool:
+        """Check the sampled pose at frame against the pose the depsgraph evaluates, which changes the frame of the scene."""
+
+        bpy.context.scene.frame_set(frame)
+        evaluated = np.array([np.array(pose_bone.matrix) for pose_bone in self.armature.pose.bones]).reshape(-1, 4, 4)
+        sampled = self.sample(float(frame))
+
+        size = max(1.0, float(np.abs(evaluated[:, :3, 3]).max(initial=0.0)))
+        return bool(np.allclose(sampled, evaluated, rtol=0.0, atol=VERIFY_TOLERANCE * size))
+
+
+class _StandIn:
+    """Forwards every attribute to target, except the ones the subclass overrides."""
+
+    def __init__(self, target, sampler: PoseSampler):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_sampler", sampler)
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+
+class _SampledScene(_StandIn):
+    def frame_set(self, frame, subframe=0.0):
+        self._sampler.frame = float(frame) + subframe
+
+    @property
+    def frame_current(self):
+        return int(self._sampler.get_frame())
+
+
+class _SampledContext(_StandIn):
+    @property
+    def scene(self):
+        return _SampledScene(self._target.scene, self._sampler)
+
+
+class _SampledPoseBone(_StandIn):
+    def __init__(self, target, sampler: PoseSampler, index: int):
+        super().__init__(target, sampler)
+        object.__setattr__(self, "_index", index)
+
+    @property
+    def matrix(self):
+        return Matrix(self._sampler.sample(self._sampler.get_frame())[self._index].tolist())
+
+
+class _SampledPoseBones(_StandIn):
+    def _wrap(self, pose_bone):
+        return _SampledPoseBone(pose_bone, self._sampler, self._sampler.bone_indexes[pose_bone.name])
+
+    def __getitem__(self, key):
+        return self._wrap(self._target[key])
+
+    def get(self, key, default=None):
+        pose_bone = self._target.get(key)
+        return self._wrap(pose_bone) if pose_bone is not None else default
+
+    def __iter__(self):
+        return (self._wrap(pose_bone) for pose_bone in self._target)
+
+    def __len__(self):
+        return len(self._target)
+
+    def __contains__(self, key):
+        return key in self._target
+
+
+class _SampledPose(_StandIn):
+    @property
+    def bones(self):
+        return _SampledPoseBones(self._target.bones, self._sampler)
+
+
+class _SampledArmature(_StandIn):
+    @property
+    def pose(self):
+        return _SampledPose(self._target.pose, self._sampler)
+
+    def evaluated_get(self, depsgraph):
+        # The sampled pose is already the evaluated one.
+        return self
+
+
+@contextmanager
+def sampled_animations(exporter, profiler):
+    """Temporarily replace the collectAnim function of exporter with one that samples poses from F-curves, falling
+    back on the original (which sets the scene to each frame) for rigs the sampler can't reproduce.
+    """
+
+    collect_anim = getattr(exporter, "collectAnim", None)
+    if collect_anim is None:
+        yield
+        return
+
+    # Rigs are keyed by their armature object, and set to None once one of their poses didn't match the evaluated one.
+    samplers: dict[str, PoseSampler | None] = {}
+
+    def sample_anim(context, armature, scale, bones, action, *args, **kwargs):
+        reason = find_fallback_reason(armature, action)
+        sampler = samplers.get(armature.name_full, False)
+        if not reason and sampler is None:
+            reason = "an earlier sampled pose didn't match the evaluated one"
+
+        if not reason and sampler is False:
+            sampler = PoseSampler(armature)
+            sampler.set_action(action)
+            armature.animation_data.action = action
+            if not sampler.matches_evaluated_pose(int(action.frame_range[0])):
+                reason = "the sampled pose didn't match the evaluated one"
+                sampler = None
+            samplers[armature.name_full] = sampler
+
+        if reason:
+            print(f"Sampling '{action.name}' frame by frame, because {reason}")
+            profiler.count("animations sampled frame by frame")
+            return collect_anim(context, armature, scale, bones, action, *args, **kwargs)
+
+        sampler.set_action(action)
+        profiler.count("animations sampled from F-curves")
+        return collect_anim(_SampledContext(context, sampler), _SampledArmature(armature, sampler), scale, bones, action, *args, **kwargs)
+
+    exporter.collectAnim = sample_anim
+    try:
+        yield
+    finally:
+        exporter.collectAnim = collect_anim
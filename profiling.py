@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+
+class Profiler:
+    """Records nested timing spans and counters of an export.
+    The recording can be written as Chrome trace-event JSON, which can be opened in chrome://tracing or Perfetto.
+    """
+
+    enabled: bool = True
+
+    def __init__(self, name: str, on_span_start=None):
+        self.name = name
+        self.on_span_start = on_span_start  # Called with the name and args of every span as it starts, to report progress.
+        self.events: list[dict] = []
+        self.counters: dict[str, float] = {}
+        self._start_time = time.perf_counter()
+        self._depth = 0
+
+    def _timestamp(self, perf_counter_time: float) -> float:
+        # Trace events are timed in microseconds.
+        return (perf_counter_time - self._start_time) * 1.0e6
+
+    @contextmanager
+    def span(self, name: str, **args):
+        """Time the enclosed block. Spans opened inside the block are nested under this one."""
+
+        if self.on_span_start:
+            self.on_span_start(name, args)
+
+        start_time = time.perf_counter()
+        depth = self._depth
+        self._depth += 1
+
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            end_time = time.perf_counter()
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": "iqm_export_pipeline",
+                    "ph": "X",
+                    "ts": self._timestamp(start_time),
+                    "dur": (end_time - start_time) * 1.0e6,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": {"depth": depth, **args},
+                }
+            )
+
+    def count(self, name: str, value: float = 1):
+        """Add value to a counter."""
+
+        self.counters[name] = self.counters.get(name, 0) + value
+        self.events.append(
+            {
+                "name": name,
+                "ph": "C",
+                "ts": self._timestamp(time.perf_counter()),
+                "pid": os.getpid(),
+                "args": {name: self.counters[name]},
+            }
+        )
+
+    def _wrap(self, function, span_name: str, describe=None):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with self.span(span_name, **(describe(args, kwargs) if describe else {})):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    @contextmanager
+    def instrument(self, module, function_spans: dict[str, str], describe=None):
+        """Temporarily wrap functions of module (or methods, as "Class.method") in spans named by function_spans.
+        Functions that don't exist in module are ignored, so different versions of a module can be instrumented.
+        describe is called with the args and kwargs of each wrapped call, and returns a dict of span args.
+        """
+
+        patched: list[tuple[object, str, object]] = []
+
+        for function_path, span_name in function_spans.items():
+            owner = module
+            *owner_names, function_name = function_path.split(".")
+            for owner_name in owner_names:
+                owner = getattr(owner, owner_name, None)
+
+            function = getattr(owner, function_name, None)
+            if function is None:
+                continue
+
+            patched.append((owner, function_name, function))
+            setattr(owner, function_name, self._wrap(function, span_name, describe))
+
+        try:
+            yield
+        finally:
+            for owner, function_name, function in reversed(patched):
+                setattr(owner, function_name, function)
+
+    def to_chrome_trace(self) -> dict:
+        metadata = {"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": self.name}}
+        return {
+            "traceEvents": [metadata, *sorted(self.events, key=lambda event: event["ts"])],
+            "displayTimeUnit": "ms",
+            "otherData": {"counters": self.counters},
+        }
+
+    def write_chrome_trace(self, filepath: str):
+        with open(filepath, "w") as trace_file:
+            json.dump(self.to_chrome_trace(), trace_file)
+
+    def summary(self) -> str:
+        """A one-line summary: the total time, the time of each top-level stage, and the counters."""
+
+        spans = [event for event in self.events if event["ph"] == "X"]
+        total = sum(event["dur"] for event in spans if event["args"]["depth"] == 0) / 1.0e6
+
+        stage_durations: dict[str, float] = {}
+        for event in sorted(spans, key=lambda event: event["ts"]):
+            if event["args"]["depth"] == 1:
+                stage_durations[event["name"]] = stage_durations.get(event["name"], 0.0) + event["dur"] / 1.0e6
+
+        stages = ", ".join(f"{name} {duration:.2f}s" for name, duration in stage_durations.items())
+        counters = ", ".join(f"{value:,.0f} {name}" for name, value in self.counters.items())
+        return f"{self.name}: {total:.2f}s ({stages})" + (f" | {counters}" if counters else "")
+
+
+class NullProfiler(Profiler):
+    """A profiler that records nothing, used when profiling is disabled."""
+
+    enabled: bool = False
+
+    def __init__(self):
+        super().__init__("")
+
+    def span(self, name: str, **args):
+        return nullcontext()
+
+    def count(self, name: str, value: float = 1):
+        pass
+
+    def instrument(self, module, function_spans: dict[str, str], describe=None):
+        return nullcontext()
+
+
+NULL_PROFILER = NullProfiler()
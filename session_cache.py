@@ -0,0 +1,196 @@
+# In-session cache of exported files, shared by collections that export the same datablocks.
+#
+# Variant collections (skins, attachments) often link the same armature, meshes and actions, so several jobs write
+# byte-identical files, such as the split animation files of a shared armature. The first job keeps the bytes it
+# wrote (after the offset and compression stages), and the jobs after it reuse them instead of running exportIQM.
+#
+# Unlike the export cache, entries are keyed by the identity of the datablocks rather than a hash of their contents,
+# so looking an entry up doesn't read any mesh data. Edits are caught by a depsgraph handler instead, which drops the
+# entries that depend on the edited datablocks. Entries are evicted least recently used first, under a memory cap.
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import bpy
+from bpy.app.handlers import persistent
+from .action_items_ui_list import parse_animation_specs
+
+# The default memory cap of the cache, in megabytes.
+DEFAULT_CAPACITY_MB: int = 256
+
+
+class SessionCache:
+    """Exported file contents keyed by the datablocks they were exported from, evicted least recently used first."""
+
+    def __init__(self, capacity_bytes: int):
+        self.capacity_bytes = capacity_bytes
+        self.size_bytes = 0
+        self._entries: OrderedDict[tuple, tuple[bytes, frozenset[str]]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: tuple, data: bytes, dependencies: frozenset[str]):
+        """Keep data under key until one of dependencies (datablock names) is edited. Data larger than the whole
+        cache isn't kept.
+        """
+
+        self.remove(key)
+        if len(data) > self.capacity_bytes:
+            return
+
+        self._entries[key] = (data, dependencies)
+        self.size_bytes += len(data)
+        self.evict()
+
+    def remove(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= len(entry[0])
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in its capacity."""
+
+        while self.size_bytes > self.capacity_bytes:
+            self.remove(next(iter(self._entries)))
+
+    def set_capacity(self, capacity_bytes: int):
+        self.capacity_bytes = capacity_bytes
+        self.evict()
+
+    def invalidate(self, changed_names: set[str]):
+        """Drop the entries that depend on any of changed_names."""
+
+        for key in [key for key, (_, dependencies) in self._entries.items() if not dependencies.isdisjoint(changed_names)]:
+            self.remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self.size_bytes = 0
+
+
+_cache = SessionCache(DEFAULT_CAPACITY_MB << 20)
+
+# The number of blocks the depsgraph handler is suspended by, see suspended_updates.
+_suspended_count: int = 0
+
+
+def get_cache() -> SessionCache:
+    return _cache
+
+
+@contextmanager
+def suspended_updates():
+    """Ignore depsgraph updates until the block finishes. Exports set the scene to every frame while sampling
+    animations, which re-evaluates the animated objects without editing them. The export blocks the main thread, so
+    the user can't make edits that would be missed meanwhile.
+    """
+
+    global _suspended_count
+    _suspended_count += 1
+    try:
+        yield
+    finally:
+        _suspended_count -= 1
+
+
+def _modifier_state(obj) -> tuple:
+    """The modifiers of obj that are enabled, and the datablocks they reference. Their other settings are caught by
+    the depsgraph handler, since changing them updates the geometry of obj.
+    """
+
+    return tuple(
+        (modifier.name, modifier.type, getattr(getattr(modifier, "object", None), "name_full", None))
+        for modifier in obj.modifiers
+        if modifier.show_viewport
+    )
+
+
+def build_key(export_collection, animspecs: str, offset_matrix, export_options: dict, include_meshes: bool = True) -> tuple[tuple, frozenset[str]]:
+    """The key of the file exported from export_collection, and the names of the datablocks it depends on.
+    Mesh objects are left out with include_meshes=False, like export_cache.fingerprint_collection does.
+    """
+
+    objects = sorted(
+        (obj for obj in export_collection.all_objects if include_meshes or obj.type != "MESH"),
+        key=lambda obj: obj.name_full,
+    )
+    action_names = tuple(spec.name for spec in parse_animation_specs(animspecs))
+    scene = bpy.context.scene
+
+    key = (
+        animspecs,
+        tuple(sorted((name, repr(value)) for name, value in export_options.items())),
+        tuple(value for row in offset_matrix for value in row),
+        tuple(
+            (
+                obj.name_full,
+                obj.data.name_full if obj.data else None,
+                obj.parent.name_full if obj.parent else None,
+                obj.parent_type,
+                obj.parent_bone,
+                tuple(value for row in obj.matrix_world for value in row),
+                _modifier_state(obj),
+            )
+            for obj in objects
+        ),
+        # The fps of animations that don't specify one comes from the scene.
+        scene.render.fps,
+        scene.render.fps_base,
+    )
+
+    dependencies = {obj.name_full for obj in objects}
+    dependencies.update(obj.data.name_full for obj in objects if obj.data)
+    dependencies.update(slot.material.name_full for obj in objects for slot in obj.material_slots if slot.material)
+    dependencies.update(action_names)
+    return key, frozenset(dependencies)
+
+
+@persistent
+def _depsgraph_update_post(scene, depsgraph):
+    if _suspended_count or not len(_cache):
+        return
+
+    changed_names = set()
+    for update in depsgraph.updates:
+        changed_id = update.id.original
+        # Selecting objects updates them without moving or changing them.
+        if isinstance(changed_id, bpy.types.Object) and not (update.is_updated_transform or update.is_updated_geometry):
+            continue
+        changed_names.add(changed_id.name_full)
+
+    if changed_names:
+        _cache.invalidate(changed_names)
+
+
+@persistent
+def _clear(*args):
+    _cache.clear()
+
+
+handlers = [
+    (bpy.app.handlers.depsgraph_update_post, _depsgraph_update_post),
+    (bpy.app.handlers.load_post, _clear),
+    (bpy.app.handlers.undo_post, _clear),
+    (bpy.app.handlers.redo_post, _clear),
+]
+
+
+def register():
+    for handler_list, handler in handlers:
+        handler_list.append(handler)
+
+
+def unregister():
+    for handler_list, handler in handlers:
+        if handler in handler_list:
+            handler_list.remove(handler)
+
+    _clear()
@@ -0,0 +1,11 @@
+# pytest plugin for the tests (see pytest.ini). The repository root is the add-on package, whose __init__ imports bpy,
+# and pytest imports a package to set up the tests below it, so the root is collected as a plain directory instead.
+# The tested stages don't depend on bpy, and are imported as top-level modules, like tools outside of Blender do.
+
+import pytest
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collect_directory(path, parent):
+    if path == parent.config.rootpath:
+        return pytest.Dir.from_parent(parent, path=path)
@@ -0,0 +1,92 @@
+# Small IQM models for the tests, built in memory instead of exported from Blender.
+
+import numpy as np
+
+import iqm_format
+
+
+def find_neighbours(triangles: np.ndarray) -> np.ndarray:
+    """The adjacency section of triangles, found edge by edge: the triangle across each edge (v0 v1, v1 v2, v2 v0),
+    which has the same edge in the opposite direction, or NO_NEIGHBOUR.
+    """
+
+    edges = {}
+    for triangle_index, triangle in enumerate(triangles.tolist()):
+        for corner in range(3):
+            edges[(triangle[corner], triangle[(corner + 1) % 3])] = triangle_index
+
+    adjacency = np.full((len(triangles), 3), iqm_format.NO_NEIGHBOUR, dtype=iqm_format.TRIANGLE_DTYPE)
+    for triangle_index, triangle in enumerate(triangles.tolist()):
+        for corner in range(3):
+            neighbour = edges.get((triangle[(corner + 1) % 3], triangle[corner]))
+            if neighbour is not None and neighbour != triangle_index:
+                adjacency[triangle_index, corner] = neighbour
+
+    return adjacency
+
+
+def face_normals(model: iqm_format.IQMModel) -> np.ndarray:
+    """The unit normal of each triangle of model, from its winding."""
+
+    corners = model.find_vertex_array(iqm_format.IQM_POSITION).data[model.triangles.astype(np.int64)].astype(np.float64)
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    return normals / np.linalg.norm(normals, axis=1, keepdims=True)
+
+
+def make_grid_model(grid_size: int = 8, frame_count: int = 24, bone_count: int = 4, looping: bool = True) -> iqm_format.IQMModel:
+    """A flat grid of grid_size by grid_size quads in a single mesh, skinned to a chain of bone_count bones, with one
+    animation of frame_count frames that moves and rotates every bone smoothly.
+    """
+
+    model = iqm_format.IQMModel()
+
+    coordinates = np.linspace(0.0, 1.0, grid_size + 1)
+    x, y = np.meshgrid(coordinates, coordinates)
+    positions = np.stack([x.ravel(), y.ravel(), np.zeros(x.size)], axis=1).astype(np.float32)
+    vertex_count = len(positions)
+    normals = np.tile(np.array([0.0, 0.0, 1.0], dtype=np.float32), (vertex_count, 1))
+
+    model.num_vertexes = vertex_count
+    model.vertex_arrays = [
+        iqm_format.VertexArray(iqm_format.IQM_POSITION, iqm_format.IQM_FLOAT, 3, positions),
+        iqm_format.VertexArray(iqm_format.IQM_NORMAL, iqm_format.IQM_FLOAT, 3, normals),
+        iqm_format.VertexArray(iqm_format.IQM_TEXCOORD, iqm_format.IQM_FLOAT, 2, positions[:, :2].copy()),
+    ]
+
+    # Two counter-clockwise triangles per quad, seen from +Z.
+    corners = np.arange(vertex_count).reshape(grid_size + 1, grid_size + 1)
+    bottom_left, bottom_right = corners[:-1, :-1].ravel(), corners[:-1, 1:].ravel()
+    top_left, top_right = corners[1:, :-1].ravel(), corners[1:, 1:].ravel()
+    model.triangles = np.concatenate(
+        [np.stack([bottom_left, bottom_right, top_right], axis=1), np.stack([bottom_left, top_right, top_left], axis=1)]
+    ).astype(iqm_format.TRIANGLE_DTYPE)
+    model.adjacency = find_neighbours(model.triangles)
+
+    model.meshes = np.zeros(1, iqm_format.MESH_DTYPE)
+    model.meshes[0] = (model.add_string("grid"), model.add_string("material"), 0, vertex_count, 0, len(model.triangles))
+
+    joints = np.zeros(bone_count, iqm_format.JOINT_DTYPE)
+    for bone_index in range(bone_count):
+        joints[bone_index] = (model.add_string(f"bone_{bone_index}"), bone_index - 1, (0.0, 0.0, 1.0), (0.0, 0.0, 0.0, 1.0), (1.0, 1.0, 1.0))
+    model.joints = joints
+
+    model.poses = np.zeros(bone_count, iqm_format.POSE_DTYPE)
+    model.poses["parent"] = joints["parent"]
+
+    phases = np.linspace(0.0, 2.0 * np.pi, frame_count, endpoint=not looping)[:, np.newaxis] + np.arange(bone_count)
+    values = np.zeros((frame_count, bone_count, iqm_format.POSE_CHANNELS))
+    values[:, :, 0] = 0.5 * np.sin(phases)
+    values[:, :, 2] = 1.0
+    values[:, :, 5] = np.sin(0.25 * np.cos(phases))
+    values[:, :, 6] = np.cos(0.25 * np.cos(phases))
+    values[:, :, 7:10] = 1.0
+    iqm_format.encode_frames(model, values)
+
+    model.anims = np.zeros(1, iqm_format.ANIM_DTYPE)
+    model.anims[0] = (model.add_string("wave"), 0, frame_count, 24.0, iqm_format.IQM_LOOP if looping else 0)
+
+    model.bounds = np.zeros(frame_count, iqm_format.BOUNDS_DTYPE)
+    model.bounds["bbmax"] = (1.0, 1.0, 0.0)
+    model.bounds["xyradius"] = model.bounds["radius"] = np.sqrt(2.0)
+
+    return model
@@ -0,0 +1,63 @@
+import numpy as np
+
+import animation_compression
+import iqm_format
+from iqm_models import make_grid_model
+
+TOLERANCES = animation_compression.channel_tolerances(0.001, 0.0005, 0.001)
+
+
+def test_encode_frames_without_frames():
+    model = make_grid_model()
+    channel_offsets = model.poses["channeloffset"].copy()
+
+    iqm_format.encode_frames(model, np.zeros((0, len(model.poses), iqm_format.POSE_CHANNELS)))
+
+    assert model.frames.shape[0] == 0
+    assert not model.poses["channelmask"].any()
+    np.testing.assert_array_equal(model.poses["channeloffset"], channel_offsets)
+    assert iqm_format.decode_frames(model).shape == (0, len(model.poses), iqm_format.POSE_CHANNELS)
+
+
+def test_compress_animations_without_frames():
+    model = make_grid_model()
+    iqm_format.encode_frames(model, np.zeros((0, len(model.poses), iqm_format.POSE_CHANNELS)))
+    model.anims["num_frames"] = 0
+
+    assert animation_compression.compress_animations(model, TOLERANCES) == []
+
+
+def test_constant_channels_are_removed():
+    model = make_grid_model()
+    channels_before = model.frames.shape[1]
+
+    animation_compression.compress_animations(model, TOLERANCES)
+
+    # Only the X translation and the X and Y rotation of each bone are animated.
+    assert channels_before == model.frames.shape[1] == 3 * len(model.poses)
+
+    values = iqm_format.decode_frames(make_grid_model())
+    values[:, :, 0] = 0.0
+    model = make_grid_model()
+    iqm_format.encode_frames(model, values)
+    animation_compression.compress_animations(model, TOLERANCES)
+    assert model.frames.shape[1] == 2 * len(model.poses)
+
+
+def test_compression_error_is_within_tolerance():
+    for looping in (True, False):
+        model = make_grid_model(frame_count=97 if not looping else 96, looping=looping)
+        original_values = iqm_format.decode_frames(model)
+        frame_count = len(original_values)
+
+        savings = animation_compression.compress_animations(model, np.full(iqm_format.POSE_CHANNELS, 0.01))
+        assert savings[0].frames_after < savings[0].frames_before
+
+        kept_values = iqm_format.decode_frames(model)
+        step = frame_count // len(kept_values) if looping else (frame_count - 1) // (len(kept_values) - 1)
+        assert model.anims[0]["framerate"] == 24.0 / step
+
+        rebuilt_values = animation_compression._reconstruct(kept_values, step, frame_count, looping)
+        # The kept frames are quantized again over their new range, which can add half a step of 16 bits.
+        quantization_error = (original_values.max(axis=0) - original_values.min(axis=0)) / 65535.0
+        assert np.all(np.abs(rebuilt_values - original_values) <= 0.01 + quantization_error)
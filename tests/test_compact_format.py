@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+import animation_compression
+import compact_format
+import iqm_format
+from iqm_models import make_grid_model
+
+
+def write_and_open(model, tmp_path):
+    filepath = str(tmp_path / "compact.iqm")
+    iqm_format.write_iqm(model, filepath)
+    return compact_format.open_iqm(filepath)
+
+
+@pytest.mark.parametrize("vertex_format", ["HALF", "FIXED"])
+def test_quantized_vertices_decode_within_their_precision(vertex_format, tmp_path):
+    model = make_grid_model()
+    positions = model.find_vertex_array(iqm_format.IQM_POSITION).data.astype(np.float64)
+    normals = model.find_vertex_array(iqm_format.IQM_NORMAL).data.astype(np.float64)
+    texcoords = model.find_vertex_array(iqm_format.IQM_TEXCOORD).data.astype(np.float64)
+
+    report = compact_format.quantize_vertices(model, vertex_format)
+    assert report.bytes_after < report.bytes_before
+
+    with write_and_open(model, tmp_path) as mapped_model:
+        position_error = np.abs(mapped_model.decode_vertex_array(iqm_format.IQM_POSITION) - positions).max()
+        # Half floats keep 11 significant bits, fixed point splits the range of each axis into 65535 steps.
+        assert position_error <= (2.0**-11 if vertex_format == "HALF" else 1.0 / 65535.0)
+        assert position_error <= report.max_error + 1e-7
+        assert np.abs(mapped_model.decode_vertex_array(iqm_format.IQM_NORMAL) - normals).max() <= 0.5 / compact_format.BYTE_MAX
+        assert np.abs(mapped_model.decode_vertex_array(iqm_format.IQM_TEXCOORD) - texcoords).max() <= 2.0**-11
+
+
+def test_float_vertices_are_left_alone():
+    model = make_grid_model()
+
+    assert compact_format.quantize_vertices(model, "FLOAT") is None
+    assert all(vertex_array.format == iqm_format.IQM_FLOAT for vertex_array in model.vertex_arrays)
+
+
+def test_compact_frames_decode_within_tolerance(tmp_path):
+    model = make_grid_model(frame_count=240)
+    values = iqm_format.decode_frames(model)
+    tolerances = animation_compression.channel_tolerances(0.001, 0.001, 0.001)
+
+    report = compact_format.quantize_frames(model, tolerances)
+    assert report.bytes_after < report.bytes_before
+
+    with write_and_open(model, tmp_path) as mapped_model:
+        poses, _ = mapped_model.frame_layout
+        # The rotation channels move little enough to fit in 8 bits, the translation doesn't.
+        assert np.all(poses["channelmask8"] & (1 << 5))
+        assert not np.any(poses["channelmask8"] & 1)
+
+        decoded_values = mapped_model.decode_frames()
+        assert np.all(np.abs(decoded_values - values) <= np.maximum(tolerances, (values.max(axis=0) - values.min(axis=0)) / 65535.0))
+        np.testing.assert_array_equal(mapped_model.decode_frames(first_frame=4, num_frames=3), decoded_values[4:7])
+
+    # Loaders that don't read the extension see every pose hold its first frame.
+    np.testing.assert_allclose(iqm_format.decode_frames(model)[-1], values[0], atol=1e-6)
+
+
+def test_mapped_model_reads_the_default_format(tmp_path):
+    model = make_grid_model()
+
+    with write_and_open(model, tmp_path) as mapped_model:
+        np.testing.assert_array_equal(mapped_model.triangles, model.triangles)
+        np.testing.assert_array_equal(mapped_model.joints, model.joints)
+        np.testing.assert_array_equal(mapped_model.decode_vertex_array(iqm_format.IQM_POSITION), model.vertex_arrays[0].data)
+        np.testing.assert_allclose(mapped_model.decode_frames(), iqm_format.decode_frames(model), atol=1e-6)
+        assert mapped_model.get_string(int(mapped_model.meshes[0]["name"])) == "grid"
@@ -0,0 +1,64 @@
+import json
+
+import numpy as np
+
+import iqm_diff
+import iqm_format
+from iqm_models import make_grid_model
+
+
+def write_model(model, filepath) -> str:
+    iqm_format.write_iqm(model, str(filepath))
+    return str(filepath)
+
+
+def test_identical_files_exit_with_0(tmp_path, capsys):
+    old_path = write_model(make_grid_model(), tmp_path / "old.iqm")
+    new_path = write_model(make_grid_model(), tmp_path / "new.iqm")
+
+    assert iqm_diff.main([old_path, new_path]) == 0
+    assert "No structural changes" in capsys.readouterr().out
+
+
+def test_changed_files_exit_with_1(tmp_path, capsys):
+    old_path = write_model(make_grid_model(), tmp_path / "old.iqm")
+    model = make_grid_model()
+    model.find_vertex_array(iqm_format.IQM_POSITION).data[0] += 1.0
+    model.joints["translate"][1] = (0.0, 0.0, 2.0)
+    new_path = write_model(model, tmp_path / "new.iqm")
+
+    assert iqm_diff.main([old_path, new_path, "--json"]) == 1
+    differences = json.loads(capsys.readouterr().out)
+    assert differences["changed"]
+    assert differences["vertex_arrays"] and differences["joints"]
+    assert not differences["counts"]
+
+
+def test_changes_below_the_tolerance_are_ignored(tmp_path):
+    old_path = write_model(make_grid_model(), tmp_path / "old.iqm")
+    model = make_grid_model()
+    model.find_vertex_array(iqm_format.IQM_POSITION).data[0] += 1.0e-6
+    new_path = write_model(model, tmp_path / "new.iqm")
+
+    assert not iqm_diff.diff_files(old_path, new_path).changed
+    assert iqm_diff.diff_files(old_path, new_path, tolerance=1.0e-8).changed
+
+
+def test_different_counts_are_reported(tmp_path):
+    old_path = write_model(make_grid_model(grid_size=4), tmp_path / "old.iqm")
+    new_path = write_model(make_grid_model(grid_size=5), tmp_path / "new.iqm")
+
+    diff = iqm_diff.diff_files(old_path, new_path)
+
+    assert any(difference.startswith("vertices") for difference in diff.counts)
+    old_size, new_size = diff.sections["vertex array (position)"]
+    assert old_size < new_size
+
+
+def test_unreadable_files_exit_with_2(tmp_path, capsys):
+    old_path = write_model(make_grid_model(), tmp_path / "old.iqm")
+    (tmp_path / "not_iqm.iqm").write_bytes(np.arange(64, dtype=np.uint8).tobytes())
+
+    assert iqm_diff.main([old_path, str(tmp_path / "not_iqm.iqm")]) == 2
+    assert iqm_diff.main([old_path, str(tmp_path / "missing.iqm")]) == 2
+    assert "Couldn't compare" in capsys.readouterr().err
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+import iqm_format
+from iqm_models import make_grid_model
+
+
+def assert_models_equal(model, other):
+    assert model.num_vertexes == other.num_vertexes
+    assert model.get_string(int(model.meshes[0]["name"])) == other.get_string(int(other.meshes[0]["name"]))
+    for section in ("meshes", "triangles", "adjacency", "joints", "poses", "anims", "frames", "bounds"):
+        np.testing.assert_array_equal(getattr(model, section), getattr(other, section), err_msg=section)
+
+    assert len(model.vertex_arrays) == len(other.vertex_arrays)
+    for vertex_array, other_array in zip(model.vertex_arrays, other.vertex_arrays):
+        assert (vertex_array.type, vertex_array.format, vertex_array.size) == (other_array.type, other_array.format, other_array.size)
+        np.testing.assert_array_equal(vertex_array.data, other_array.data)
+
+
+def test_write_and_read_round_trip(tmp_path):
+    model = make_grid_model()
+    filepath = str(tmp_path / "grid.iqm")
+
+    iqm_format.write_iqm(model, filepath)
+    read_model = iqm_format.read_iqm(filepath)
+
+    assert_models_equal(model, read_model)
+    assert iqm_format.read_header(filepath)["num_frames"] == len(model.frames)
+    assert bytes(iqm_format.serialize_iqm(read_model)) == bytes(iqm_format.serialize_iqm(model))
+
+
+def test_decode_frames_matches_encoded_values():
+    model = make_grid_model()
+    values = iqm_format.decode_frames(model)
+
+    iqm_format.encode_frames(model, values)
+
+    ranges = values.max(axis=0) - values.min(axis=0)
+    assert np.all(np.abs(iqm_format.decode_frames(model) - values) <= ranges / 65535.0 + 1e-12)
+
+
+def test_add_string_reuses_whole_strings_only():
+    model = iqm_format.IQMModel()
+    bone = model.add_string("bone")
+    upper_bone = model.add_string("upper_bone")
+
+    assert model.add_string("bone") == bone
+    assert model.get_string(upper_bone) == "upper_bone"
+
+
+def test_parse_rejects_other_files():
+    with pytest.raises(iqm_format.IQMFormatError):
+        iqm_format.parse_iqm(b"not an IQM file at all, but long enough to hold a header" * 4)
@@ -0,0 +1,51 @@
+import numpy as np
+
+import iqm_format
+import iqm_transform
+from iqm_models import face_normals, find_neighbours, make_grid_model
+
+
+def offset_matrix(translation=(0.0, 0.0, 0.0), scale=(1.0, 1.0, 1.0)) -> np.ndarray:
+    matrix = np.diag([*scale, 1.0])
+    matrix[:3, 3] = translation
+    return matrix
+
+
+def test_identity_offset_changes_nothing():
+    model = make_grid_model()
+    data = bytes(iqm_format.serialize_iqm(model))
+
+    assert iqm_transform.apply_offset(model, np.identity(4)) == 0
+    assert bytes(iqm_format.serialize_iqm(model)) == data
+
+
+def test_translation_moves_vertices_root_joint_and_bounds():
+    model = make_grid_model()
+    positions = model.find_vertex_array(iqm_format.IQM_POSITION).data.copy()
+    values = iqm_format.decode_frames(model)
+
+    assert iqm_transform.apply_offset(model, offset_matrix(translation=(1.0, 2.0, 3.0))) == 1
+
+    np.testing.assert_allclose(model.find_vertex_array(iqm_format.IQM_POSITION).data, positions + (1.0, 2.0, 3.0), atol=1e-6)
+    np.testing.assert_allclose(model.joints["translate"][0], (1.0, 2.0, 4.0), atol=1e-6)
+    np.testing.assert_allclose(model.bounds["bbmin"], np.tile((1.0, 2.0, 3.0), (len(model.bounds), 1)), atol=1e-6)
+
+    # Only the root pose moves, the child poses are relative to it.
+    moved_values = iqm_format.decode_frames(model)
+    np.testing.assert_allclose(moved_values[:, 0, 0:3], values[:, 0, 0:3] + (1.0, 2.0, 3.0), atol=1e-4)
+    np.testing.assert_allclose(moved_values[:, 1:], values[:, 1:], atol=1e-4)
+
+
+def test_mirroring_offset_flips_the_winding():
+    model = make_grid_model()
+    triangles = model.triangles.copy()
+
+    iqm_transform.apply_offset(model, offset_matrix(scale=(-1.0, 1.0, 1.0)))
+
+    # The triangles still face along their vertex normals, which the mirror doesn't flip since the grid lies in XY.
+    normals = model.find_vertex_array(iqm_format.IQM_NORMAL).data[model.triangles[:, 0]]
+    assert np.all(np.einsum("ij,ij->i", face_normals(model), normals) > 0.99)
+    np.testing.assert_array_equal(model.triangles, triangles[:, [0, 2, 1]])
+
+    # The neighbour across each edge moved along with the edge.
+    np.testing.assert_array_equal(model.adjacency, find_neighbours(model.triangles))
@@ -0,0 +1,84 @@
+import os
+import zipfile
+
+import pk3_packaging
+
+
+def write_files(directory, contents: dict[str, bytes]) -> dict[str, str]:
+    """Write contents ({entry name: bytes}) to files in directory, and return the files argument of update_archive."""
+
+    files = {}
+    for name, data in contents.items():
+        filepath = os.path.join(directory, name.replace("/", "_"))
+        with open(filepath, "wb") as file:
+            file.write(data)
+        files[name] = filepath
+    return files
+
+
+def read_archive(archive_path: str) -> dict[str, bytes]:
+    with zipfile.ZipFile(archive_path) as archive:
+        assert archive.testzip() is None
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+def model_contents(seed: int, size: int = 4096) -> bytes:
+    return bytes((seed * 31 + index * 7) % 251 for index in range(size))
+
+
+def test_new_archive_contains_every_file(tmp_path):
+    contents = {"models/knight.iqm": model_contents(1), "models/knight_lod1.iqm": model_contents(2)}
+    archive_path = str(tmp_path / "build" / "models.pk3")
+
+    summary = pk3_packaging.update_archive(archive_path, write_files(tmp_path, contents))
+
+    assert sorted(summary.written) == sorted(contents)
+    assert read_archive(archive_path) == contents
+    assert os.path.isfile(pk3_packaging.get_manifest_path(archive_path))
+
+
+def test_only_changed_entries_are_written(tmp_path):
+    contents = {"models/knight.iqm": model_contents(1), "models/archer.iqm": model_contents(2), "models/mage.iqm": model_contents(3)}
+    archive_path = str(tmp_path / "models.pk3")
+    pk3_packaging.update_archive(archive_path, write_files(tmp_path, contents))
+
+    summary = pk3_packaging.update_archive(archive_path, write_files(tmp_path, contents))
+    assert summary.written == [] and summary.unchanged_count == 3
+
+    contents["models/archer.iqm"] = model_contents(4, size=5000)
+    summary = pk3_packaging.update_archive(archive_path, write_files(tmp_path, {"models/archer.iqm": contents["models/archer.iqm"]}))
+    assert summary.written == ["models/archer.iqm"]
+    # Entries that weren't passed in are kept.
+    assert read_archive(archive_path) == contents
+
+
+def test_repeated_updates_compact_the_archive(tmp_path):
+    contents = {"models/knight.iqm": model_contents(1, size=20000), "models/archer.iqm": model_contents(2, size=20000)}
+    archive_path = str(tmp_path / "models.pk3")
+    pk3_packaging.update_archive(archive_path, write_files(tmp_path, contents), compression_level=0)
+
+    compacted = False
+    for seed in range(3, 10):
+        contents["models/knight.iqm"] = model_contents(seed, size=20000)
+        contents["models/archer.iqm"] = model_contents(seed + 100, size=20000)
+        summary = pk3_packaging.update_archive(archive_path, write_files(tmp_path, {"models/knight.iqm": contents["models/knight.iqm"]}), compression_level=0)
+        compacted |= summary.compacted
+        pk3_packaging.update_archive(archive_path, write_files(tmp_path, {"models/archer.iqm": contents["models/archer.iqm"]}), compression_level=0)
+        assert read_archive(archive_path) == contents
+
+    assert compacted
+    assert os.path.getsize(archive_path) < 4 * 20000
+
+
+def test_archives_without_a_manifest_are_compared_by_crc(tmp_path):
+    contents = {"models/knight.iqm": model_contents(1), "models/archer.iqm": model_contents(2)}
+    archive_path = str(tmp_path / "models.pk3")
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in contents.items():
+            archive.writestr(name, data)
+
+    contents["models/archer.iqm"] = model_contents(3)
+    summary = pk3_packaging.update_archive(archive_path, write_files(tmp_path, contents))
+
+    assert summary.written == ["models/archer.iqm"]
+    assert read_archive(archive_path) == contents
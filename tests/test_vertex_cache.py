@@ -0,0 +1,62 @@
+import numpy as np
+
+import iqm_format
+import vertex_cache
+from iqm_models import find_neighbours, make_grid_model
+
+
+def count_misses_one_by_one(indexes, cache_size: int) -> int:
+    """A FIFO cache simulated index by index, to check the vectorized count against."""
+
+    cache = []
+    misses = 0
+    for vertex in indexes:
+        if vertex not in cache:
+            cache.append(vertex)
+            misses += 1
+            if len(cache) > cache_size:
+                cache.pop(0)
+    return misses
+
+
+def shuffled_grid_model(grid_size: int = 24):
+    model = make_grid_model(grid_size=grid_size)
+    order = np.random.default_rng(0).permutation(len(model.triangles))
+    model.triangles = model.triangles[order]
+    model.adjacency = find_neighbours(model.triangles)
+    return model
+
+
+def test_count_cache_misses_matches_a_fifo_cache():
+    rng = np.random.default_rng(0)
+    for cache_size in (1, 3, 16):
+        for _ in range(20):
+            indexes = rng.integers(0, 40, 300)
+            assert vertex_cache.count_cache_misses(indexes, cache_size) == count_misses_one_by_one(indexes.tolist(), cache_size)
+
+    assert vertex_cache.count_cache_misses(np.zeros(0, dtype=np.int64), 16) == 0
+
+
+def test_tipsify_misses_fewer_than_the_input_order():
+    model = shuffled_grid_model()
+    triangles = model.triangles.astype(np.int64)
+
+    order, cluster_starts = vertex_cache.tipsify(triangles, model.num_vertexes, 16)
+
+    assert sorted(order.tolist()) == list(range(len(triangles)))
+    assert cluster_starts[0] == 0
+    assert vertex_cache.count_cache_misses(triangles[order].ravel(), 16) < vertex_cache.count_cache_misses(triangles.ravel(), 16)
+
+
+def test_optimize_vertex_cache_keeps_the_mesh():
+    model = shuffled_grid_model()
+    positions = model.find_vertex_array(iqm_format.IQM_POSITION).data
+    corners_before = {tuple(sorted(map(tuple, positions[triangle]))) for triangle in model.triangles.astype(np.int64)}
+
+    (report,) = vertex_cache.optimize_vertex_cache(model, 16)
+
+    assert report.acmr_after < report.acmr_before
+    assert report.atvr_after >= 1.0
+    positions = model.find_vertex_array(iqm_format.IQM_POSITION).data
+    assert {tuple(sorted(map(tuple, positions[triangle]))) for triangle in model.triangles.astype(np.int64)} == corners_before
+    np.testing.assert_array_equal(model.adjacency, find_neighbours(model.triangles))
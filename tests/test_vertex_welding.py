@@ -0,0 +1,67 @@
+import numpy as np
+
+import iqm_format
+import vertex_welding
+from iqm_models import find_neighbours, make_grid_model
+
+
+def unweld(model):
+    """Give every corner of every triangle its own vertex, like a mesh with split normals everywhere."""
+
+    corners = model.triangles.astype(np.int64).ravel()
+    for vertex_array in model.vertex_arrays:
+        vertex_array.data = vertex_array.data[corners]
+    model.num_vertexes = len(corners)
+    model.meshes[0]["num_vertexes"] = len(corners)
+    model.triangles = np.arange(len(corners)).reshape(-1, 3).astype(iqm_format.TRIANGLE_DTYPE)
+    model.adjacency = find_neighbours(model.triangles)
+
+
+def test_identical_vertices_are_welded():
+    model = make_grid_model(grid_size=4)
+    vertex_count = model.num_vertexes
+    positions = model.find_vertex_array(iqm_format.IQM_POSITION).data[model.triangles.astype(np.int64)]
+    unweld(model)
+
+    assert vertex_welding.weld_vertices(model) == 4 * 4 * 2 * 3 - vertex_count
+    assert model.num_vertexes == vertex_count
+    assert model.meshes[0]["num_vertexes"] == vertex_count
+    # Every triangle still has the same corners.
+    np.testing.assert_array_equal(model.find_vertex_array(iqm_format.IQM_POSITION).data[model.triangles.astype(np.int64)], positions)
+
+
+def test_welding_rebuilds_adjacency():
+    model = make_grid_model(grid_size=4)
+    unweld(model)
+    # Without shared vertices, no triangle has a neighbour.
+    assert np.all(model.adjacency == iqm_format.NO_NEIGHBOUR)
+
+    vertex_welding.weld_vertices(model)
+
+    np.testing.assert_array_equal(model.adjacency, find_neighbours(model.triangles))
+    assert np.any(model.adjacency != iqm_format.NO_NEIGHBOUR)
+
+
+def test_vertices_with_different_attributes_are_kept():
+    model = make_grid_model(grid_size=4)
+    unweld(model)
+    # Give each triangle its own UVs, so no two corners match.
+    texcoords = model.find_vertex_array(iqm_format.IQM_TEXCOORD)
+    texcoords.data = texcoords.data + np.repeat(np.arange(len(model.triangles)), 3)[:, np.newaxis].astype(np.float32)
+
+    assert vertex_welding.weld_vertices(model) == 0
+
+
+def test_build_adjacency_matches_edge_by_edge_search():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        triangles = np.array([rng.choice(12, 3, replace=False) for _ in range(30)], dtype=iqm_format.TRIANGLE_DTYPE)
+        adjacency = vertex_welding.build_adjacency(triangles)
+
+        # Edges shared by more than two triangles can have several valid neighbours, so check the found ones are valid.
+        expected = find_neighbours(triangles)
+        assert np.array_equal(adjacency == iqm_format.NO_NEIGHBOUR, expected == iqm_format.NO_NEIGHBOUR)
+        for triangle_index, corner in zip(*np.nonzero(adjacency != iqm_format.NO_NEIGHBOUR)):
+            start, end = triangles[triangle_index, corner], triangles[triangle_index, (corner + 1) % 3]
+            neighbour = triangles[adjacency[triangle_index, corner]]
+            assert any(neighbour[i] == end and neighbour[(i + 1) % 3] == start for i in range(3))
@@ -0,0 +1,168 @@
+from dataclasses import dataclass, field
+import bpy
+from bpy.app.handlers import persistent
+from . import action_items_ui_list
+from .lod_export import parse_lod_ratios
+
+# The panel lists at most this many action items that are missing an action.
+MAX_LISTED_PROBLEMS: int = 5
+
+
+@dataclass
+class ValidationResult:
+    """Whether a collection can be exported with the current settings, and what's stopping it if it can't."""
+
+    problems: list[str] = field(default_factory=list)
+    missing_action_indexes: list[int] = field(default_factory=list)
+    action_item_count: int = 0
+
+    @property
+    def exportable(self) -> bool:
+        return not self.problems
+
+
+def validate_collection(settings, export_collection) -> ValidationResult:
+    """Check if export_collection can be exported with the pipeline settings. This walks the collection, so prefer the
+    cached get_validation() wherever it runs often, such as poll() and draw().
+    """
+
+    result = ValidationResult()
+
+    # Check if an export collection has been selected, and if it has objects in it.
+    if not export_collection:
+        result.problems.append("Select a collection to export")
+        return result
+
+    if not export_collection.all_objects:
+        result.problems.append(f"The collection '{export_collection.name}' has no objects")
+
+    try:
+        parse_lod_ratios(settings.lod_ratios)
+    except ValueError as error:
+        result.problems.append(str(error))
+
+    if settings.use_packaging and not settings.package_path:
+        result.problems.append("Choose a package file, or turn off packaging")
+
+    if hasattr(export_collection, "action_items"):
+        result.action_item_count = len(export_collection.action_items)
+
+    # Validate the action_list_source
+    if settings.action_list_source == "string":
+        # Make sure the action_list_string isn't blank
+        if not settings.action_list_string:
+            result.problems.append("The animation list is empty")
+
+        # Malformed frames or fps would otherwise fail while building the export jobs.
+        try:
+            action_items_ui_list.parse_animation_specs(settings.action_list_string)
+        except ValueError as error:
+            result.problems.append(str(error))
+
+    elif settings.action_list_source == "action_list":
+        # Check if the export collection has at least one action_item in the action_items list.
+        if not result.action_item_count:
+            result.problems.append("The action list is empty")
+            return result
+
+        # Make sure that all action_items have been assigned an action.
+        result.missing_action_indexes = [
+            index for index, action_item in enumerate(export_collection.action_items) if action_item.action is None
+        ]
+        for index in result.missing_action_indexes[:MAX_LISTED_PROBLEMS]:
+            result.problems.append(f"Action item {index + 1} has no action")
+        if len(result.missing_action_indexes) > MAX_LISTED_PROBLEMS:
+            result.problems.append(f"...and {len(result.missing_action_indexes) - MAX_LISTED_PROBLEMS} more items without an action")
+
+    return result
+
+
+# Results are cached until something that could change them is edited. Settings that are cheap to read are part of
+# the key, so only changes to the contents of collections need to invalidate the cache.
+_cache: dict[tuple, ValidationResult] = {}
+
+# Incremented on every invalidation, so other caches can tell when the action items may have changed.
+_generation: int = 0
+
+_msgbus_owner = object()
+_subscription_keys: list = []
+
+
+def get_generation() -> int:
+    return _generation
+
+
+@persistent
+def invalidate(*args):
+    """Forget every cached result. Accepts and ignores the arguments passed by msgbus and handlers."""
+
+    global _generation
+    _cache.clear()
+    _generation += 1
+
+
+def get_validation(settings) -> ValidationResult:
+    """The cached validation of the export collection of settings."""
+
+    export_collection = settings.export_collection
+    key = (
+        settings.as_pointer(),
+        export_collection.as_pointer() if export_collection else 0,
+        settings.action_list_source,
+        settings.action_list_string,
+        settings.lod_ratios,
+        settings.use_packaging and not settings.package_path,
+    )
+
+    result = _cache.get(key)
+    if result is None:
+        result = _cache[key] = validate_collection(settings, export_collection)
+
+    return result
+
+
+def subscribe_rna(key):
+    """Invalidate the cache whenever the property described by key (as in bpy.msgbus.subscribe_rna) is changed.
+    Subscriptions are remade after a file is loaded, which clears them.
+    """
+
+    _subscription_keys.append(key)
+    bpy.msgbus.subscribe_rna(key=key, owner=_msgbus_owner, args=(), notify=invalidate)
+
+
+@persistent
+def _depsgraph_update_post(scene, depsgraph):
+    # Linking objects to or unlinking them from a collection updates the collection. Moving objects doesn't, and is
+    # by far the most common update, so it's not worth invalidating for.
+    if depsgraph.id_type_updated("COLLECTION") or depsgraph.id_type_updated("ACTION"):
+        invalidate()
+
+
+@persistent
+def _load_post(*args):
+    invalidate()
+    for key in _subscription_keys:
+        bpy.msgbus.subscribe_rna(key=key, owner=_msgbus_owner, args=(), notify=invalidate)
+
+
+handlers = [
+    (bpy.app.handlers.depsgraph_update_post, _depsgraph_update_post),
+    (bpy.app.handlers.load_post, _load_post),
+    (bpy.app.handlers.undo_post, invalidate),
+    (bpy.app.handlers.redo_post, invalidate),
+]
+
+
+def register():
+    for handler_list, handler in handlers:
+        handler_list.append(handler)
+
+
+def unregister():
+    for handler_list, handler in handlers:
+        if handler in handler_list:
+            handler_list.remove(handler)
+
+    bpy.msgbus.clear_by_owner(_msgbus_owner)
+    _subscription_keys.clear()
+    invalidate()
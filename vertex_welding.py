@@ -0,0 +1,97 @@
+# Vertex welding stage that removes duplicate vertices from an exported IQM file.
+#
+# The exporter builds its vertices from the loops of each mesh, and only merges loops of the same source vertex, so
+# coincident vertices (such as the seams of mirrored or arrayed meshes, or split edges that ended up with the same
+# normals) are written once per source vertex. This stage merges every vertex whose attributes are byte-for-byte
+# identical to an earlier vertex of the same mesh, in bulk:
+# - The vertex arrays are viewed as one row of raw bytes per vertex, prefixed with the index of the vertex's mesh.
+# - np.unique over those rows finds the first occurrence of every distinct vertex, and the triangles are remapped to it.
+# Vertices are only merged when every attribute matches exactly, so the welded model renders identically. Welding
+# makes triangles share edges they didn't share before, so the adjacency section is rebuilt from the welded triangles.
+#
+# This module doesn't depend on bpy, so it can also be used by tools that run outside of Blender.
+
+import numpy as np
+
+if __package__:
+    from .iqm_format import NO_NEIGHBOUR, TRIANGLE_DTYPE, IQMModel
+else:
+    from iqm_format import NO_NEIGHBOUR, TRIANGLE_DTYPE, IQMModel
+
+
+def _vertex_mesh_indexes(model: IQMModel) -> np.ndarray:
+    """The index of the mesh each vertex belongs to, or -1 for vertices outside of every mesh."""
+
+    mesh_indexes = np.full(model.num_vertexes, -1, dtype=np.int32)
+    for mesh_index, mesh in enumerate(model.meshes):
+        mesh_indexes[mesh["first_vertex"] : mesh["first_vertex"] + mesh["num_vertexes"]] = mesh_index
+
+    return mesh_indexes
+
+
+def build_adjacency(triangles: np.ndarray) -> np.ndarray:
+    """The adjacency section of triangles: for each edge (v0 v1, v1 v2, v2 v0) of each triangle, the index of a
+    triangle with the same edge in the opposite direction, or NO_NEIGHBOUR if there isn't one.
+    """
+
+    triangles = triangles.astype(np.int64)
+    vertex_count = int(triangles.max()) + 1 if triangles.size else 0
+    edge_starts = triangles.ravel()
+    edge_ends = triangles[:, [1, 2, 0]].ravel()
+
+    # Look up the reversed key of every edge among the sorted edge keys.
+    edge_keys = edge_starts * vertex_count + edge_ends
+    order = np.argsort(edge_keys, kind="stable")
+    sorted_keys = edge_keys[order]
+    reversed_keys = edge_ends * vertex_count + edge_starts
+    positions = np.minimum(np.searchsorted(sorted_keys, reversed_keys), max(len(sorted_keys) - 1, 0))
+
+    adjacency = np.full(len(edge_keys), NO_NEIGHBOUR, dtype=np.int64)
+    if len(edge_keys):
+        neighbours = order[positions] // 3
+        # Degenerate edges (from a vertex to itself) would find their own triangle.
+        found = (sorted_keys[positions] == reversed_keys) & (neighbours != np.arange(len(edge_keys)) // 3)
+        adjacency[found] = neighbours[found]
+
+    return adjacency.reshape(-1, 3).astype(TRIANGLE_DTYPE)
+
+
+def weld_vertices(model: IQMModel) -> int:
+    """Merge the vertices of each mesh of model whose attributes are identical. Returns the number of removed vertices."""
+
+    vertex_count = model.num_vertexes
+    if not vertex_count or not model.vertex_arrays:
+        return 0
+
+    # One row of raw bytes per vertex: its mesh index, then the value of every vertex array.
+    columns = [_vertex_mesh_indexes(model).view(np.uint8).reshape(vertex_count, -1)]
+    for vertex_array in model.vertex_arrays:
+        columns.append(np.ascontiguousarray(vertex_array.data).reshape(vertex_count, -1).view(np.uint8))
+    rows = np.ascontiguousarray(np.concatenate(columns, axis=1))
+    keys = rows.view(np.dtype((np.void, rows.shape[1]))).ravel()
+
+    _, first_indexes, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    if len(first_indexes) == vertex_count:
+        return 0
+
+    # Keep the first occurrence of each vertex, in the original order, so the meshes stay contiguous ranges.
+    kept_vertexes = np.sort(first_indexes)
+    new_indexes = np.empty(len(first_indexes), dtype=np.int64)
+    new_indexes[np.argsort(first_indexes)] = np.arange(len(first_indexes))
+    vertex_remap = new_indexes[inverse.ravel()]
+
+    for vertex_array in model.vertex_arrays:
+        vertex_array.data = vertex_array.data[kept_vertexes]
+
+    if len(model.meshes):
+        first_vertexes = model.meshes["first_vertex"].astype(np.int64)
+        end_vertexes = first_vertexes + model.meshes["num_vertexes"]
+        new_first_vertexes = np.searchsorted(kept_vertexes, first_vertexes)
+        model.meshes["first_vertex"] = new_first_vertexes
+        model.meshes["num_vertexes"] = np.searchsorted(kept_vertexes, end_vertexes) - new_first_vertexes
+
+    model.triangles = vertex_remap[model.triangles].astype(TRIANGLE_DTYPE)
+    model.num_vertexes = len(kept_vertexes)
+    if model.adjacency is not None:
+        model.adjacency = build_adjacency(model.triangles)
+    return vertex_count - model.num_vertexes
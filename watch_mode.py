@@ -0,0 +1,332 @@
+import os
+import tempfile
+import time
+import bpy
+from bpy.app.handlers import persistent
+from . import output_staging
+from .action_items_ui_list import parse_animation_specs
+from .batch_export import (
+    WorkerProcess,
+    find_export_collections,
+    group_shared_jobs,
+    resolve_worker_count,
+    save_snapshot,
+    skip_up_to_date_jobs,
+)
+from .iqm_export_pipeline import build_animation_specs, build_export_jobs, find_limit_problems, finish_export, run_export_job
+from .validation_cache import validate_collection
+
+# How long to wait after the last edit before exporting, so a burst of edits (such as a sculpt stroke or dragging a
+# slider) is exported once.
+DEBOUNCE_SECONDS: float = 0.5
+
+# How often running exports are checked on, in seconds.
+POLL_INTERVAL: float = 0.1
+
+# Export collections with edits that haven't been exported yet, by name.
+_pending_collections: set[str] = set()
+
+# When the pending collections are exported, unless they're edited again first (in time.monotonic() seconds).
+_export_time: float = 0.0
+
+# The frame of the last update, to tell frame changes (which re-evaluate animated objects) apart from edits.
+_last_frame: int | None = None
+
+# The export that's running, if any.
+_running_export = None
+
+# The outcome of the latest export, shown in the panel.
+_status: str = ""
+
+
+def get_status() -> str:
+    return _status
+
+
+def _set_status(status: str):
+    global _status
+    _status = status
+
+    # The panel doesn't redraw on its own when nothing in the scene changed.
+    window_manager = bpy.context.window_manager
+    if window_manager is None:
+        return
+
+    for window in window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == "PROPERTIES":
+                area.tag_redraw()
+
+
+def get_watched_collections(settings) -> list:
+    """The export collection of settings, and every collection that has been given an IQM file name."""
+
+    collections = find_export_collections()
+    if settings.export_collection and settings.export_collection not in collections:
+        collections.append(settings.export_collection)
+
+    return collections
+
+
+def is_collection_affected(settings, collection, changed_ids: list) -> bool:
+    """Check if any of changed_ids (original IDs of objects, object data, actions or collections) affects the files
+    exported from collection.
+    """
+
+    action_names = None
+    # Compare the objects themselves, as linked objects can share a name with local ones.
+    collection_objects = collection.all_objects.values()
+
+    for changed_id in changed_ids:
+        if isinstance(changed_id, bpy.types.Object):
+            if changed_id in collection_objects:
+                return True
+
+        elif isinstance(changed_id, bpy.types.Action):
+            if action_names is None:
+                try:
+                    action_names = {spec.name for spec in parse_animation_specs(build_animation_specs(settings, collection))}
+                except (AttributeError, ValueError):
+                    # An action item without an action, or a malformed animation list, so the collection can't be
+                    # exported anyway.
+                    action_names = set()
+            if changed_id.name in action_names:
+                return True
+
+        elif isinstance(changed_id, bpy.types.Collection):
+            # Linking objects to a nested collection updates that collection, not the exported one.
+            if changed_id == collection or changed_id in collection.children_recursive:
+                return True
+
+        elif any(obj.data == changed_id for obj in collection_objects):
+            return True
+
+    return False
+
+
+def is_animated(obj) -> bool:
+    """Check if changing frames can move or deform obj, because it, one of its parents or one of its armatures has an
+    action or drivers.
+    """
+
+    while obj:
+        animation_data = obj.animation_data
+        if animation_data and (animation_data.action or len(animation_data.drivers)):
+            return True
+
+        for modifier in obj.modifiers:
+            if modifier.type == "ARMATURE" and modifier.object and modifier.object != obj and is_animated(modifier.object):
+                return True
+
+        obj = obj.parent
+
+    return False
+
+
+class WatchExport:
+    """Exports a set of collections in background workers, polled by the watch mode timer."""
+
+    def __init__(self, settings, collection_names: set[str]):
+        self.start_time = time.perf_counter()
+        self.jobs = []
+        for collection_name in sorted(collection_names):
+            collection = bpy.data.collections.get(collection_name)
+            if not collection or not validate_collection(settings, collection).exportable:
+                continue
+
+            collection_jobs = build_export_jobs(settings, collection)
+            problems = find_limit_problems(settings, collection, collection_jobs)
+            if problems:
+                # Leave the last good files in place until the problems are fixed, which is another edit.
+                StatusReporter().report({"ERROR"}, f"{collection.name}: {problems[0]}")
+                continue
+
+            self.jobs += collection_jobs
+
+        # Split animation files of untouched actions are usually up to date, so only the edited parts are exported.
+        self.results, pending_jobs = skip_up_to_date_jobs(self.jobs)
+        self.pending_groups = []
+        self.workers: list[WorkerProcess] = []
+        self.snapshot_directory = None
+
+        if len(pending_jobs) == 1:
+            # Most edits change a single file. Like run_export_jobs, that job runs in this process, which is faster
+            # than saving a snapshot of the whole file and starting a background Blender to read it.
+            self.results.append(run_export_job(bpy.context, pending_jobs[0]))
+            # The export blocks the main thread, so the updates it made (such as changing frames) aren't edits.
+            _pending_collections.clear()
+
+        elif pending_jobs:
+            self.pending_groups = group_shared_jobs(pending_jobs)
+            # Workers read a snapshot of the file, so edits made while exporting are picked up by the next export.
+            self.snapshot_directory = tempfile.TemporaryDirectory(prefix="iqm_export_pipeline_")
+            self.snapshot_filepath = save_snapshot(self.snapshot_directory.name)
+            self.worker_count = resolve_worker_count(settings.batch_worker_count, len(self.pending_groups))
+            self.start_workers()
+
+    def start_workers(self):
+        while self.pending_groups and len(self.workers) < self.worker_count:
+            self.workers.append(WorkerProcess(self.snapshot_filepath, self.pending_groups.pop(0)))
+
+    def poll(self) -> bool:
+        """Collect the results of finished workers and start more. Returns whether the export is still running."""
+
+        for worker in list(self.workers):
+            if not worker.is_running:
+                worker.wait()
+                self.results += worker.get_results()
+                self.workers.remove(worker)
+
+        self.start_workers()
+        return bool(self.workers)
+
+    def finish(self, settings):
+        self.cleanup()
+
+        if not self.jobs:
+            return
+
+        exported_names = [os.path.basename(result.filepath) for result in self.results if result.status == "exported"]
+        if exported_names:
+            _set_status(f"Exported {', '.join(exported_names)} ({time.perf_counter() - self.start_time:.1f}s)")
+        else:
+            _set_status("Everything is up to date")
+
+        finish_export(StatusReporter(), settings, self.jobs, self.results)
+
+    def cancel(self):
+        """Kill the running workers and roll back their unfinished files."""
+
+        for worker in self.workers:
+            worker.cancel()
+            for job in worker.jobs:
+                output_staging.remove_staging_files(job.filepath)
+
+        self.workers.clear()
+        self.pending_groups.clear()
+        self.cleanup()
+
+    def cleanup(self):
+        if self.snapshot_directory:
+            self.snapshot_directory.cleanup()
+            self.snapshot_directory = None
+
+
+class StatusReporter:
+    """Stands in for an operator in finish_export. Reports are printed, and errors replace the status in the panel."""
+
+    def report(self, report_type: set[str], message: str):
+        print(f"Watch mode: {message}")
+
+        if "ERROR" in report_type:
+            _set_status(f"Failed: {message}")
+
+
+def _tick():
+    """Timer that waits out the debounce window, then exports the pending collections and polls the export."""
+
+    global _running_export
+
+    settings = bpy.context.scene.iqm_export_pipeline_settings
+
+    if _running_export:
+        if _running_export.poll():
+            return POLL_INTERVAL
+        _running_export.finish(settings)
+        _running_export = None
+
+    if not _pending_collections:
+        return None
+
+    remaining_seconds = _export_time - time.monotonic()
+    if remaining_seconds > 0.0:
+        return remaining_seconds
+
+    collection_names = set(_pending_collections)
+    _pending_collections.clear()
+    _running_export = WatchExport(settings, collection_names)
+    return POLL_INTERVAL
+
+
+@persistent
+def _depsgraph_update_post(scene, depsgraph):
+    global _export_time, _last_frame
+
+    frame_changed = scene.frame_current != _last_frame
+    _last_frame = scene.frame_current
+
+    changed_ids = []
+    for update in depsgraph.updates:
+        changed_id = update.id.original
+        if isinstance(changed_id, bpy.types.Object):
+            # Selecting objects updates them without moving or changing them.
+            if not (update.is_updated_transform or update.is_updated_geometry):
+                continue
+            # Changing frames re-evaluates every animated object, which isn't an edit.
+            if frame_changed and is_animated(changed_id):
+                continue
+            changed_ids.append(changed_id)
+        elif isinstance(changed_id, (bpy.types.Mesh, bpy.types.Armature, bpy.types.Action, bpy.types.Collection)):
+            changed_ids.append(changed_id)
+
+    if not changed_ids:
+        return
+
+    settings = scene.iqm_export_pipeline_settings
+    for collection in get_watched_collections(settings):
+        if collection.name not in _pending_collections and is_collection_affected(settings, collection, changed_ids):
+            _pending_collections.add(collection.name)
+
+    if not _pending_collections:
+        return
+
+    # Every edit restarts the debounce window.
+    _export_time = time.monotonic() + DEBOUNCE_SECONDS
+    if not bpy.app.timers.is_registered(_tick):
+        bpy.app.timers.register(_tick, first_interval=DEBOUNCE_SECONDS)
+
+
+def is_enabled() -> bool:
+    return _depsgraph_update_post in bpy.app.handlers.depsgraph_update_post
+
+
+def set_enabled(enabled: bool):
+    """Start or stop watching for edits. Stopping cancels the running export."""
+
+    global _running_export, _last_frame
+
+    if enabled == is_enabled():
+        return
+
+    if enabled:
+        _last_frame = bpy.context.scene.frame_current
+        bpy.app.handlers.depsgraph_update_post.append(_depsgraph_update_post)
+        _set_status("Watching for edits")
+        return
+
+    bpy.app.handlers.depsgraph_update_post.remove(_depsgraph_update_post)
+    if bpy.app.timers.is_registered(_tick):
+        bpy.app.timers.unregister(_tick)
+    if _running_export:
+        _running_export.cancel()
+        _running_export = None
+    _pending_collections.clear()
+    _set_status("")
+
+
+@persistent
+def _load_post(*args):
+    # Watch mode is saved with the scene, resume or stop watching to match the loaded file.
+    set_enabled(False)
+    set_enabled(bpy.context.scene.iqm_export_pipeline_settings.use_watch_mode)
+
+
+def register():
+    bpy.app.handlers.load_post.append(_load_post)
+
+
+def unregister():
+    if _load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_load_post)
+
+    set_enabled(False)